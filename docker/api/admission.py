@@ -0,0 +1,164 @@
+# admission.py
+#
+# Load shedding for the sync endpoints. Every def route and dependency runs on
+# AnyIO's default threadpool (THREADPOOL_TOKENS threads per worker); when all
+# threads are busy, requests wait for one with no signal except latency.
+#
+#   - AdmissionMiddleware registers each request on arrival
+#   - record_queue_wait, a sync dependency attached to every router, runs as
+#     the request's first threadpool call, records how long it waited for a
+#     thread (arrival -> first thread; includes reading the request body) and
+#     unregisters it
+#   - the age of the oldest request still registered is the current queue
+#     wait. While it is over ADMISSION_MAX_QUEUE_WAIT_SECONDS and requests are
+#     queued for threads, new requests are answered 503 + Retry-After before
+#     routing, which drains the queue instead of growing it
+#   - requests under ADMISSION_PRIORITY_PATHS (auth, health) are never shed
+#
+# The measured wait is returned as "Server-Timing: queue;dur=<ms>" and the
+# controller's state is served by GET /health, which needs no thread.
+
+import math
+import threading
+import time
+from typing import Iterable
+import anyio.to_thread
+from fastapi import Request
+from .config.settings import ADMISSION_MAX_QUEUE_WAIT_SECONDS, ADMISSION_PRIORITY_PATHS
+
+# Weight of the newest sample in the moving average
+EWMA_WEIGHT = 0.2
+
+SCOPE_KEY = "admission.key"
+SCOPE_RECEIVED_AT = "admission.received_at"
+SCOPE_QUEUE_WAIT = "admission.queue_wait"
+
+
+class AdmissionController:
+    def __init__(self, max_queue_wait: float, priority_paths: Iterable[str] = ()):
+        self.max_queue_wait = max_queue_wait
+        self.priority_paths = tuple(path.rstrip("/") or "/" for path in priority_paths)
+        # Requests that have not reached a thread yet, oldest first: key -> arrival
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pending.clear()
+        self.average_wait = 0.0  # Moving average of measured waits, seconds
+        self.max_wait = 0.0
+        self.samples = 0
+        self.shed = 0
+
+    def is_priority(self, path: str) -> bool:
+        return any(
+            path == prefix or (prefix != "/" and path.startswith(prefix + "/"))
+            for prefix in self.priority_paths
+        )
+
+    def arrived(self, key) -> float:
+        received_at = time.monotonic()
+        with self._lock:
+            self._pending[key] = received_at
+        return received_at
+
+    def done(self, key) -> None:
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def started(self, key, received_at: float) -> float:
+        wait = time.monotonic() - received_at
+        self.done(key)
+        # Unlocked: a lost update only skews the statistics a little
+        self.average_wait += EWMA_WEIGHT * (wait - self.average_wait)
+        self.max_wait = max(self.max_wait, wait)
+        self.samples += 1
+        return wait
+
+    def current_wait(self) -> float:
+        """How long the oldest request still waiting for a thread has waited."""
+        with self._lock:
+            oldest = next(iter(self._pending.values()), None)
+        return 0.0 if oldest is None else time.monotonic() - oldest
+
+    def should_shed(self, path: str) -> bool:
+        if self.is_priority(path) or self.current_wait() <= self.max_queue_wait:
+            return False
+        # Waiting on something other than threads (e.g. a slow upload) is not overload
+        return threadpool_statistics()["waiting"] > 0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.current_wait()))
+
+    def stats(self) -> dict:
+        return {
+            "queue_wait_ms": round(self.current_wait() * 1000, 1),
+            "average_queue_wait_ms": round(self.average_wait * 1000, 1),
+            "max_queue_wait_ms": round(self.max_wait * 1000, 1),
+            "threshold_ms": round(self.max_queue_wait * 1000, 1),
+            "samples": self.samples,
+            "shed": self.shed,
+            **threadpool_statistics(),
+        }
+
+
+# Helper function to read the default threadpool's occupancy (event loop thread only)
+def threadpool_statistics() -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    return {
+        "threads": int(limiter.total_tokens),
+        "busy": statistics.borrowed_tokens,
+        "waiting": statistics.tasks_waiting,
+    }
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if self.controller.should_shed(scope["path"]):
+            self.controller.shed += 1
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"retry-after", str(self.controller.retry_after()).encode()),
+                    (b"content-type", b"application/json"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b'{"detail":"Server overloaded, retry shortly"}'})
+            return
+
+        key = scope[SCOPE_KEY] = id(scope)
+        scope[SCOPE_RECEIVED_AT] = self.controller.arrived(key)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and SCOPE_QUEUE_WAIT in scope:
+                timing = f"queue;dur={scope[SCOPE_QUEUE_WAIT] * 1000:.1f}"
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Routes without record_queue_wait (404s, /health) and errors
+            self.controller.done(key)
+
+
+# Sync on purpose: it must run on the threadpool to measure the wait for it
+def record_queue_wait(request: Request):
+    received_at = request.scope.get(SCOPE_RECEIVED_AT)
+    if received_at is None or SCOPE_QUEUE_WAIT in request.scope:
+        return
+    request.scope[SCOPE_QUEUE_WAIT] = admission_controller.started(request.scope[SCOPE_KEY], received_at)
+
+
+admission_controller = AdmissionController(ADMISSION_MAX_QUEUE_WAIT_SECONDS, ADMISSION_PRIORITY_PATHS)
@@ -0,0 +1,296 @@
+# audit.py
+#
+# Append-only audit trail for campaigns and projects. Nothing here runs in the
+# request's write path beyond building a dict:
+#
+#   1. after_flush collects field-level before/after values of every audited
+#      row the flush inserted, updated or deleted into session.info
+#   2. after_commit hands them to audit_writer's in-memory queue (a rollback
+#      discards them, so only committed changes are recorded)
+#   3. a background thread drains the queue and inserts up to AUDIT_BATCH_SIZE
+#      rows per statement into audit_log on the primary database
+#
+# Request handlers attach a reason with set_audit_reason(); get_tenant_db
+# records who made the change with set_audit_actor(). Bulk query.update()/
+# query.delete() statements bypass the ORM and are not audited - the batched
+# purge in deletion.py is covered by the "delete" entry written when the
+# project's deleted_at is stamped.
+
+import atexit
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from .config.settings import AUDIT_BATCH_SIZE, AUDIT_FLUSH_SECONDS, AUDIT_QUEUE_SIZE
+from .database import engine, in_memory
+from .models import AuditLog, Campaign, Project
+
+AUDITED_MODELS = {Campaign: "campaign", Project: "project"}
+
+# Maintained by the database - recording them would turn every update into noise
+IGNORED_FIELDS = {"created_at", "updated_at"}
+
+# Attempts per batch before it is dropped (the database is down for longer)
+WRITE_ATTEMPTS = 3
+
+
+def set_audit_reason(db: Session, reason):
+    """Attach a reason to the changes committed by db's current transaction."""
+    db.info["audit_reason"] = reason
+
+
+def set_audit_actor(db: Session, user_id: int):
+    db.info["audit_actor_id"] = user_id
+
+
+# Helper function to make column values JSON-serialisable
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _changes(obj, action: str) -> dict:
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in IGNORED_FIELDS:
+            continue
+        if action == "update":
+            # No SQL: history of an unloaded attribute is simply empty
+            history = state.attrs[key].history
+            if not history.has_changes():
+                continue
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before == after:
+                continue
+        elif action == "create":
+            before, after = None, state.dict.get(key)
+            if after is None:
+                continue
+        else:
+            before, after = state.dict.get(key), None
+        changes[key] = [_json_value(before), _json_value(after)]
+    return changes
+
+
+def _entry(session: Session, obj, action: str, changes: dict) -> dict:
+    return {
+        "resource_type": AUDITED_MODELS[type(obj)],
+        "resource_id": obj.id,
+        "action": action,
+        "changes": changes,
+        "reason": session.info.get("audit_reason"),
+        "user_id": session.info.get("audit_actor_id"),
+        "created_at": datetime.utcnow(),
+    }
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    # new/dirty/deleted and attribute history still show the pre-flush state here
+    pending = session.info.setdefault("audit_pending", [])
+    for obj in session.new:
+        if type(obj) in AUDITED_MODELS:
+            pending.append(_entry(session, obj, "create", _changes(obj, "create")))
+    for obj in session.dirty:
+        if type(obj) not in AUDITED_MODELS or not session.is_modified(obj, include_collections=False):
+            continue
+        changes = _changes(obj, "update")
+        if not changes:
+            continue
+        # Projects are soft-deleted first (see deletion.py)
+        deleted_at = changes.get("deleted_at")
+        action = "delete" if deleted_at and deleted_at[0] is None else "update"
+        pending.append(_entry(session, obj, action, changes))
+    for obj in session.deleted:
+        if type(obj) in AUDITED_MODELS:
+            pending.append(_entry(session, obj, "delete", _changes(obj, "delete")))
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_changes(session):
+    entries = session.info.pop("audit_pending", None)
+    session.info.pop("audit_reason", None)
+    if entries:
+        audit_writer.submit(entries)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("audit_pending", None)
+    session.info.pop("audit_reason", None)
+
+
+class AuditWriter:
+    """Batches audit entries from an in-memory queue into audit_log.
+
+    The thread starts on the first submit in each process (gunicorn preloads
+    the app in the master, and threads don't survive fork). If the queue is
+    full the entry is written inline instead of being lost - the request pays
+    the insert only while the writer is behind.
+
+    synchronous=True writes each commit's entries inline instead; used for an
+    in-memory SQLite database, whose single connection a second thread can't
+    safely share (see database.make_engine).
+    """
+
+    def __init__(self, engine, batch_size=AUDIT_BATCH_SIZE, flush_seconds=AUDIT_FLUSH_SECONDS,
+                 max_queue=AUDIT_QUEUE_SIZE, synchronous=False):
+        self.engine = engine
+        self.synchronous = synchronous
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_queue = max_queue
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        self.reset()
+
+    def reset(self):
+        """Forget the queue and thread (post-fork: they belong to the parent)."""
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = None
+        self._pid = os.getpid()
+
+    def submit(self, entries):
+        if self.synchronous:
+            self._write(entries)
+            return
+        self._ensure_started()
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                self._write([entry])
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            self.reset()
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                if not self._atexit_registered:
+                    atexit.register(self.stop)
+                    self._atexit_registered = True
+
+    def _next_batch(self):
+        """Block for the first entry, then take more until the batch is full
+        or flush_seconds have passed. Returns (batch, stop_requested)."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(AuditLog.__table__.insert(), batch)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                error = e
+                time.sleep(0.5 * 2 ** attempt)
+        self.dropped += len(batch)
+        print(f"audit: dropped {len(batch)} entries: {error}", file=sys.stderr)
+
+    def stop(self, timeout=10):
+        """Write everything still queued, then stop the thread (shutdown/exit)."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        # Sentinel goes behind the queued entries; blocks if the queue is full
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+
+audit_writer = AuditWriter(engine, synchronous=in_memory)
+
+
+def _created_value(db: Session, resource_type: str, resource_id: int, field: str):
+    """field's value in the resource's "create" entry, None without one."""
+    entry = (
+        db.query(AuditLog.changes)
+        .filter(
+            AuditLog.resource_type == resource_type,
+            AuditLog.resource_id == resource_id,
+            AuditLog.action == "create",
+        )
+        .first()
+    )
+    if entry is None or field not in entry.changes:
+        return None
+    return entry.changes[field][1]
+
+
+def resource_owner_id(db: Session, tenant_db: Session, resource_type: str, resource_id: int) -> int | None:
+    """The user owning a project, or a campaign's project, None if unknown.
+
+    Looked up on tenant_db while the resource still exists (soft-deleted
+    projects included). After the purge, only the "create" entry in the
+    history on db still records it.
+    """
+    if resource_type == "project":
+        owner = tenant_db.query(Project.user_id).filter(Project.id == resource_id).scalar()
+        return owner if owner is not None else _created_value(db, "project", resource_id, "user_id")
+    owner = (
+        tenant_db.query(Project.user_id)
+        .join(Campaign, Campaign.project_id == Project.id)
+        .filter(Campaign.id == resource_id)
+        .scalar()
+    )
+    if owner is not None:
+        return owner
+    project_id = _created_value(db, "campaign", resource_id, "project_id")
+    return None if project_id is None else resource_owner_id(db, tenant_db, "project", project_id)
+
+
+def read_history(db: Session, resource_type: str, resource_id: int,
+                 before_id: int | None = None, limit: int = 50):
+    """A resource's audit entries by every actor, newest first, keyset-paginated by id.
+
+    The caller checks the resource belongs to the user (resource_owner_id).
+    """
+    query = db.query(AuditLog).filter(
+        AuditLog.resource_type == resource_type,
+        AuditLog.resource_id == resource_id,
+    )
+    if before_id is not None:
+        query = query.filter(AuditLog.id < before_id)
+    return query.order_by(AuditLog.id.desc()).limit(limit).all()
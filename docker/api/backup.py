@@ -0,0 +1,574 @@
+# backup.py
+#
+# Online logical backups of the MariaDB database. Nothing is stopped: the
+# application keeps reading and writing while a backup or an incremental runs.
+#
+#   python -m api.backup full             consistent dump, BACKUP_WORKERS parallel streams
+#   python -m api.backup incremental      binlog events since the previous backup
+#   python -m api.backup restore [name]   parallel restore of the full backup behind
+#                                         <name> (default: latest), then every
+#                                         incremental up to and including <name>
+#   python -m api.backup list | latest
+#
+# Full backups: a coordinator connection holds FLUSH TABLES WITH READ LOCK only
+# while every worker connection runs START TRANSACTION WITH CONSISTENT SNAPSHOT
+# and the binlog position is read (milliseconds; lock_wait_timeout bounds the
+# wait behind long queries). All workers then read the same InnoDB snapshot.
+# Tables with an integer primary key are split into key ranges of
+# BACKUP_CHUNK_ROWS rows so a big table is streamed by several workers at once; each
+# range goes through an unbuffered cursor into its own gzip file of multi-row
+# INSERT statements, one statement per line.
+#
+# Incrementals need log_bin on the server. They rotate the binlog and fetch
+# the complete files since the previous backup's position with
+# mariadb-binlog --read-from-remote-server; restores replay them with the
+# mariadb client, so both binaries must be installed (see Dockerfile).
+
+import gzip
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+import pymysql
+from pymysql.cursors import SSCursor
+from sqlalchemy.engine import make_url
+from .config.settings import (
+    BACKUP_CHUNK_ROWS,
+    BACKUP_COMPRESSION_LEVEL,
+    BACKUP_DATABASE_URL,
+    BACKUP_DIR,
+    BACKUP_WORKERS,
+    DATABASE_URL,
+    SHARD_DATABASE_URLS,
+)
+
+# Rows / bytes per INSERT statement in dump files (well under max_allowed_packet)
+INSERT_BATCH_ROWS = 500
+INSERT_MAX_BYTES = 1 << 20
+
+# Give up on the snapshot lock rather than stall writers behind a long query
+SNAPSHOT_LOCK_WAIT_SECONDS = 10
+
+COPY_BUFFER_BYTES = 1 << 20
+
+INTEGER_TYPES = {"tinyint", "smallint", "mediumint", "int", "bigint"}
+
+
+def database_url(shard: int = 0) -> str:
+    if shard == 0:
+        return BACKUP_DATABASE_URL or DATABASE_URL
+    return list(SHARD_DATABASE_URLS)[shard - 1]
+
+
+def shard_backup_dir(backup_dir: str, shard: int = 0) -> str:
+    return backup_dir if shard == 0 else os.path.join(backup_dir, f"shard-{shard}")
+
+
+def connect(url: str):
+    parsed = make_url(url)
+    return pymysql.connect(
+        host=parsed.host or "localhost",
+        port=parsed.port or 3306,
+        user=parsed.username,
+        password=parsed.password or "",
+        database=parsed.database,
+        charset="utf8mb4",
+    )
+
+
+class Throughput:
+    """Running totals shared by the worker threads."""
+
+    def __init__(self):
+        self.rows = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, rows: int, raw_bytes: int, stored_bytes: int) -> None:
+        with self._lock:
+            self.rows += rows
+            self.raw_bytes += raw_bytes
+            self.stored_bytes += stored_bytes
+
+    @property
+    def seconds(self) -> float:
+        return max(time.monotonic() - self.started, 1e-6)
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows} rows, {self.raw_bytes / 1e6:.1f} MB raw / {self.stored_bytes / 1e6:.1f} MB stored "
+            f"in {self.seconds:.1f}s ({self.raw_bytes / 1e6 / self.seconds:.1f} MB/s, "
+            f"{self.rows / self.seconds:.0f} rows/s)"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def _run_workers(connections, units, handle) -> None:
+    """Drain units from a shared queue with one thread per connection."""
+    work = queue.Queue()
+    for unit in units:
+        work.put(unit)
+    errors = []
+
+    def worker(connection):
+        while not errors:
+            try:
+                unit = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                handle(connection, unit)
+            except Exception as exc:
+                errors.append(exc)
+                return
+
+    threads = [threading.Thread(target=worker, args=(connection,)) for connection in connections]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+# Manifests - manifest.json is written last, so only complete backups have one
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_manifest(backup_dir: str, name: str) -> dict:
+    with open(os.path.join(backup_dir, name, "manifest.json")) as f:
+        return json.load(f)
+
+
+def list_backups(backup_dir: str) -> List[dict]:
+    if not os.path.isdir(backup_dir):
+        return []
+    return [
+        load_manifest(backup_dir, name)
+        for name in sorted(os.listdir(backup_dir))
+        if os.path.isfile(os.path.join(backup_dir, name, "manifest.json"))
+    ]
+
+
+def backup_chain(backup_dir: str, name: Optional[str] = None) -> List[dict]:
+    """The full backup behind name followed by its incrementals, oldest first."""
+    if name is None:
+        backups = list_backups(backup_dir)
+        if not backups:
+            raise RuntimeError(f"No backups in {backup_dir}")
+        chain = [backups[-1]]
+    else:
+        chain = [load_manifest(backup_dir, name)]
+    while chain[-1]["type"] == "incremental":
+        chain.append(load_manifest(backup_dir, chain[-1]["parent"]))
+    return list(reversed(chain))
+
+
+def _new_backup_dir(backup_dir: str, kind: str) -> str:
+    name = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{kind}"
+    os.makedirs(os.path.join(backup_dir, name))
+    return name
+
+
+# Full backups
+
+@dataclass(frozen=True)
+class DumpChunk:
+    table: str
+    index: int
+    key: Optional[str] = None
+    low: Optional[int] = None
+    high: Optional[int] = None  # exclusive
+
+    @property
+    def filename(self) -> str:
+        return f"{self.table}.{self.index:05d}.sql.gz"
+
+
+def _binlog_position(cursor) -> Optional[dict]:
+    cursor.execute("SHOW MASTER STATUS")
+    row = cursor.fetchone()
+    return {"file": row[0], "position": int(row[1])} if row else None  # None: log_bin is off
+
+
+def _integer_primary_key(cursor, table: str) -> Optional[str]:
+    cursor.execute(
+        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_KEY = 'PRI'",
+        (table,),
+    )
+    rows = cursor.fetchall()
+    if len(rows) == 1 and rows[0][1] in INTEGER_TYPES:
+        return rows[0][0]
+    return None
+
+
+def _plan_chunks(cursor, table: str, chunk_rows: int) -> List[DumpChunk]:
+    key = _integer_primary_key(cursor, table)
+    if key is None:
+        return [DumpChunk(table, 0)]
+    cursor.execute(f"SELECT MIN(`{key}`), MAX(`{key}`) FROM `{table}`")
+    low, high = cursor.fetchone()
+    if low is None:
+        return []  # Empty table - the CREATE TABLE in the manifest is enough
+    # A boundary every chunk_rows rows rather than every chunk_rows key values:
+    # keys can be sparse (deleted rows, SHARD_ID_STRIDE-interleaved ids)
+    boundaries = [low]
+    while True:
+        cursor.execute(
+            f"SELECT `{key}` FROM `{table}` WHERE `{key}` >= %s ORDER BY `{key}` LIMIT 1 OFFSET %s",
+            (boundaries[-1], chunk_rows),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            break
+        boundaries.append(row[0])
+    boundaries.append(high + 1)
+    return [
+        DumpChunk(table, index, key, start, end)
+        for index, (start, end) in enumerate(zip(boundaries, boundaries[1:]))
+    ]
+
+
+def _dump_chunk(connection, chunk: DumpChunk, directory: str, compression_level: int):
+    """Stream one chunk into a gzip file. Returns (rows, raw bytes, stored bytes)."""
+    query = f"SELECT * FROM `{chunk.table}`"
+    params = None
+    if chunk.key is not None:
+        query += f" WHERE `{chunk.key}` >= %s AND `{chunk.key}` < %s"
+        params = (chunk.low, chunk.high)
+
+    path = os.path.join(directory, chunk.filename)
+    rows = raw_bytes = 0
+    with connection.cursor(SSCursor) as cursor, gzip.open(
+        path, "wt", compresslevel=compression_level, encoding="utf-8"
+    ) as out:
+        cursor.execute(query, params)
+        columns = ", ".join(f"`{column[0]}`" for column in cursor.description)
+        prefix = f"INSERT INTO `{chunk.table}` ({columns}) VALUES "
+        values, values_bytes = [], 0
+
+        def write_statement():
+            # escape() quotes every value, newlines included, so one statement is one line
+            line = prefix + ",".join(values) + ";\n"
+            out.write(line)
+            values.clear()
+            return len(line)
+
+        while True:
+            batch = cursor.fetchmany(INSERT_BATCH_ROWS)
+            if not batch:
+                break
+            for row in batch:
+                value = connection.escape(row)
+                values.append(value)
+                values_bytes += len(value)
+                if len(values) >= INSERT_BATCH_ROWS or values_bytes >= INSERT_MAX_BYTES:
+                    raw_bytes += write_statement()
+                    values_bytes = 0
+            rows += len(batch)
+        if values:
+            raw_bytes += write_statement()
+    return rows, raw_bytes, os.path.getsize(path)
+
+
+def full_backup(
+    url: str,
+    backup_dir: str = BACKUP_DIR,
+    workers: int = BACKUP_WORKERS,
+    compression_level: int = BACKUP_COMPRESSION_LEVEL,
+    chunk_rows: int = BACKUP_CHUNK_ROWS,
+    log=print,
+) -> str:
+    """Take a consistent online dump. Returns the backup name."""
+    name = _new_backup_dir(backup_dir, "full")
+    directory = os.path.join(backup_dir, name)
+    coordinator = connect(url)
+    connections = [connect(url) for _ in range(workers)]
+    try:
+        with coordinator.cursor() as cursor:
+            cursor.execute(f"SET SESSION lock_wait_timeout = {SNAPSHOT_LOCK_WAIT_SECONDS}")
+            locked = time.monotonic()
+            cursor.execute("FLUSH TABLES WITH READ LOCK")
+            try:
+                for connection in [coordinator] + connections:
+                    with connection.cursor() as snapshot:
+                        snapshot.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                        snapshot.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                binlog = _binlog_position(cursor)
+            finally:
+                cursor.execute("UNLOCK TABLES")
+            log(f"Snapshot taken, writes blocked for {(time.monotonic() - locked) * 1000:.0f}ms, binlog {binlog}")
+
+            cursor.execute("SHOW FULL TABLES WHERE Table_type = 'BASE TABLE'")
+            table_names = [row[0] for row in cursor.fetchall()]
+            tables = {}
+            chunks = []
+            for table in table_names:
+                cursor.execute(f"SHOW CREATE TABLE `{table}`")
+                tables[table] = {"create": cursor.fetchone()[1], "rows": 0, "files": []}
+                chunks.extend(_plan_chunks(cursor, table, chunk_rows))
+            coordinator.commit()
+
+        totals = Throughput()
+        tables_lock = threading.Lock()
+
+        def handle(connection, chunk):
+            started = time.monotonic()
+            rows, raw_bytes, stored_bytes = _dump_chunk(connection, chunk, directory, compression_level)
+            totals.add(rows, raw_bytes, stored_bytes)
+            with tables_lock:
+                tables[chunk.table]["rows"] += rows
+                tables[chunk.table]["files"].append(chunk.filename)
+            elapsed = max(time.monotonic() - started, 1e-6)
+            log(f"  {chunk.filename}: {rows} rows, {raw_bytes / 1e6:.1f} MB in {elapsed:.2f}s "
+                f"({raw_bytes / 1e6 / elapsed:.1f} MB/s)")
+
+        # Tables split into the most chunks first, so the largest doesn't start last
+        chunk_counts = {}
+        for chunk in chunks:
+            chunk_counts[chunk.table] = chunk_counts.get(chunk.table, 0) + 1
+        chunks.sort(key=lambda chunk: (-chunk_counts[chunk.table], chunk.table, chunk.index))
+        _run_workers(connections, chunks, handle)
+        for details in tables.values():
+            details["files"].sort()
+
+        _write_manifest(directory, {
+            "type": "full",
+            "name": name,
+            "database": make_url(url).database,
+            "created_at": datetime.utcnow().isoformat(),
+            "binlog": binlog,
+            "tables": tables,
+            "throughput": totals.as_dict(),
+        })
+        log(f"Full backup {name}: {totals.summary()}")
+        return name
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    finally:
+        for connection in [coordinator] + connections:
+            connection.close()
+
+
+# Incremental (binlog) backups
+
+def _binary(*names: str) -> str:
+    for name in names:
+        path = shutil.which(name)
+        if path:
+            return path
+    raise RuntimeError(f"None of {', '.join(names)} is installed (apt-get install mariadb-client)")
+
+
+def _client_args(url: str) -> List[str]:
+    parsed = make_url(url)
+    return [f"--host={parsed.host or 'localhost'}", f"--port={parsed.port or 3306}", f"--user={parsed.username}"]
+
+
+def _client_env(url: str) -> dict:
+    # Keeps the password off the command line
+    return dict(os.environ, MYSQL_PWD=make_url(url).password or "")
+
+
+def incremental_backup(
+    url: str,
+    backup_dir: str = BACKUP_DIR,
+    compression_level: int = BACKUP_COMPRESSION_LEVEL,
+    log=print,
+) -> str:
+    """Save the binlog since the previous backup. Returns the backup name."""
+    backups = list_backups(backup_dir)
+    if not backups:
+        raise RuntimeError("No previous backup - take a full backup first")
+    previous = backups[-1]
+    start = previous["binlog"]
+    if start is None:
+        raise RuntimeError(f"{previous['name']} has no binlog position - is log_bin enabled?")
+
+    connection = connect(url)
+    try:
+        with connection.cursor() as cursor:
+            # Close the current binlog so the delta ends on a file boundary
+            cursor.execute("FLUSH BINARY LOGS")
+            end = _binlog_position(cursor)
+            cursor.execute("SHOW BINARY LOGS")
+            available = [row[0] for row in cursor.fetchall()]
+    finally:
+        connection.close()
+    if start["file"] not in available:
+        raise RuntimeError(f"Binlog {start['file']} has been purged - take a full backup")
+    files = available[available.index(start["file"]):available.index(end["file"])]
+
+    name = _new_backup_dir(backup_dir, "incremental")
+    directory = os.path.join(backup_dir, name)
+    totals = Throughput()
+    try:
+        command = [
+            _binary("mariadb-binlog", "mysqlbinlog"),
+            "--read-from-remote-server",
+            *_client_args(url),
+            f"--database={make_url(url).database}",
+            f"--start-position={start['position']}",
+            *files,
+        ]
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, env=_client_env(url))
+        raw_bytes = 0
+        path = os.path.join(directory, "delta.sql.gz")
+        with gzip.open(path, "wb", compresslevel=compression_level) as out:
+            while True:
+                block = process.stdout.read(COPY_BUFFER_BYTES)
+                if not block:
+                    break
+                out.write(block)
+                raw_bytes += len(block)
+        if process.wait() != 0:
+            raise RuntimeError(f"{command[0]} exited with {process.returncode}")
+        totals.add(0, raw_bytes, os.path.getsize(path))
+
+        _write_manifest(directory, {
+            "type": "incremental",
+            "name": name,
+            "parent": previous["name"],
+            "database": make_url(url).database,
+            "created_at": datetime.utcnow().isoformat(),
+            "binlog_start": start,
+            "binlog": end,
+            "binlog_files": files,
+            "throughput": totals.as_dict(),
+        })
+        log(f"Incremental backup {name} ({', '.join(files)}): {totals.summary()}")
+        return name
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+# Restore
+
+def _restore_full(url: str, directory: str, manifest: dict, workers: int, log) -> None:
+    connections = [connect(url) for _ in range(workers)]
+    try:
+        for connection in connections:
+            with connection.cursor() as cursor:
+                cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        with connections[0].cursor() as cursor:
+            for table, details in manifest["tables"].items():
+                cursor.execute(f"DROP TABLE IF EXISTS `{table}`")
+                cursor.execute(details["create"])
+
+        files = [filename for details in manifest["tables"].values() for filename in details["files"]]
+        files.sort(key=lambda filename: os.path.getsize(os.path.join(directory, filename)), reverse=True)
+        totals = Throughput()
+
+        def handle(connection, filename):
+            path = os.path.join(directory, filename)
+            rows = raw_bytes = 0
+            with gzip.open(path, "rt", encoding="utf-8") as dump, connection.cursor() as cursor:
+                for statement in dump:
+                    cursor.execute(statement.rstrip("\n").rstrip(";"))
+                    rows += cursor.rowcount
+                    raw_bytes += len(statement)
+            connection.commit()
+            totals.add(rows, raw_bytes, os.path.getsize(path))
+
+        _run_workers(connections, files, handle)
+        log(f"Restored {manifest['name']}: {totals.summary()}")
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _apply_incremental(url: str, directory: str, manifest: dict, log) -> None:
+    command = [_binary("mariadb", "mysql"), *_client_args(url), make_url(url).database]
+    totals = Throughput()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, env=_client_env(url))
+    path = os.path.join(directory, "delta.sql.gz")
+    with gzip.open(path, "rb") as delta:
+        while True:
+            block = delta.read(COPY_BUFFER_BYTES)
+            if not block:
+                break
+            process.stdin.write(block)
+            totals.add(0, len(block), 0)
+    process.stdin.close()
+    if process.wait() != 0:
+        raise RuntimeError(f"{command[0]} exited with {process.returncode} replaying {manifest['name']}")
+    log(f"Replayed {manifest['name']}: {totals.summary()}")
+
+
+def restore(
+    url: str,
+    name: Optional[str] = None,
+    backup_dir: str = BACKUP_DIR,
+    workers: int = BACKUP_WORKERS,
+    full_only: bool = False,
+    log=print,
+) -> None:
+    """Restore the full backup behind name, then replay its incrementals in order."""
+    chain = backup_chain(backup_dir, name)
+    full, incrementals = chain[0], ([] if full_only else chain[1:])
+    if full["database"] != make_url(url).database and incrementals:
+        raise RuntimeError("Binlog deltas replay into the database they came from - restore into "
+                           f"{full['database']} or restore the full backup only")
+    _restore_full(url, os.path.join(backup_dir, full["name"]), full, workers, log)
+    for manifest in incrementals:
+        _apply_incremental(url, os.path.join(backup_dir, manifest["name"]), manifest, log)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Online MariaDB backups")
+    parser.add_argument("--shard", type=int, default=0, help="Back up / restore tenant shard N")
+    parser.add_argument("--url", help="Database URL (default: BACKUP_DATABASE_URL or DATABASE_URL)")
+    parser.add_argument("--backup-dir", default=BACKUP_DIR)
+    parser.add_argument("--workers", type=int, default=BACKUP_WORKERS)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("full", help="Consistent parallel dump")
+    subparsers.add_parser("incremental", help="Binlog since the previous backup")
+    restore_parser = subparsers.add_parser("restore", help="Restore a backup chain")
+    restore_parser.add_argument("name", nargs="?", help="Backup to restore up to (default: latest)")
+    restore_parser.add_argument("--full-only", action="store_true",
+                                help="Skip the binlog deltas (e.g. restoring into another database)")
+    subparsers.add_parser("list", help="Show backups")
+    subparsers.add_parser("latest", help="Print the name of the latest backup")
+    args = parser.parse_args()
+
+    url = args.url or database_url(args.shard)
+    backup_dir = shard_backup_dir(args.backup_dir, args.shard)
+    if args.command == "full":
+        full_backup(url, backup_dir, workers=args.workers)
+    elif args.command == "incremental":
+        incremental_backup(url, backup_dir)
+    elif args.command == "restore":
+        restore(url, args.name, backup_dir, workers=args.workers, full_only=args.full_only)
+    elif args.command == "latest":
+        backups = list_backups(backup_dir)
+        if backups:
+            print(backups[-1]["name"])
+    else:
+        for manifest in list_backups(backup_dir):
+            stats = manifest["throughput"]
+            parent = f" (after {manifest['parent']})" if manifest["type"] == "incremental" else ""
+            print(f"{manifest['name']}{parent}: {stats['rows']} rows, {stats['stored_bytes'] / 1e6:.1f} MB, "
+                  f"{stats['raw_bytes'] / 1e6 / max(stats['seconds'], 1e-6):.1f} MB/s")
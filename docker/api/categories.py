@@ -0,0 +1,261 @@
+# categories.py
+#
+# Category tagging for campaigns and creators, with facet counts kept
+# incrementally instead of a GROUP BY per search request.
+#
+#   - campaign_categories / creator_categories are the many-to-many links.
+#     Campaign links live with the campaign on the tenant's shard; creator
+#     links, like creators and categories, live on the primary
+#   - campaign_category_counts holds, per tenant and category, how many of
+#     the tenant's live campaigns carry the category. It is adjusted in the
+#     same transaction as the links: tagging, untagging, deleting a campaign
+#     and hiding a project (deletion.start_project_deletion)
+#   - categories.creator_count is the same for creators, across all users
+#     (creators are browsed by every brand)
+#
+# Facets are the counts for the whole set being browsed, not narrowed by the
+# other filters of the request - that would need the GROUP BY again.
+#
+#   python -m api.categories reconcile
+#
+# recomputes every count from the links, in case they ever drift.
+
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import case, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import (
+    Campaign,
+    CampaignCategory,
+    CampaignCategoryCount,
+    Category,
+    CreatorCategory,
+    Project,
+)
+
+# Most categories a single campaign or creator can carry
+MAX_CATEGORIES_PER_ITEM = 20
+
+
+def adjust_campaign_category_count(db: Session, user_id: int, category_id: int, delta: int) -> None:
+    """Add delta to a tenant's campaign count for a category (does not commit)."""
+    if delta == 0:
+        return
+    column = CampaignCategoryCount.campaign_count
+    # Single atomic UPDATE so concurrent writers don't lose increments
+    updated = (
+        db.query(CampaignCategoryCount)
+        .filter(CampaignCategoryCount.user_id == user_id, CampaignCategoryCount.category_id == category_id)
+        .update({column: case((column + delta < 0, 0), else_=column + delta)}, synchronize_session=False)
+    )
+    if updated:
+        return
+    try:
+        # First campaign of this tenant in the category - create the row
+        with db.begin_nested():
+            db.execute(insert(CampaignCategoryCount).values(
+                user_id=user_id, category_id=category_id, campaign_count=max(delta, 0),
+            ))
+    except IntegrityError:
+        # Another request created it first
+        adjust_campaign_category_count(db, user_id, category_id, delta)
+
+
+def adjust_creator_count(db: Session, category_id: int, delta: int) -> None:
+    """Add delta to a category's creator count (does not commit)."""
+    if delta == 0:
+        return
+    column = Category.creator_count
+    (
+        db.query(Category)
+        .filter(Category.id == category_id)
+        .update({column: case((column + delta < 0, 0), else_=column + delta)}, synchronize_session=False)
+    )
+
+
+def unknown_category_ids(db: Session, category_ids: Iterable[int]) -> List[int]:
+    """The ids in category_ids that are not categories (db is the primary)."""
+    wanted = set(category_ids)
+    if not wanted:
+        return []
+    found = {category_id for (category_id,) in db.query(Category.id).filter(Category.id.in_(wanted))}
+    return sorted(wanted - found)
+
+
+def campaign_category_ids(db: Session, campaign_ids: List[int]) -> Dict[int, List[int]]:
+    """{campaign_id: [category_id, ...]} for the given campaigns, in one query."""
+    tags = {campaign_id: [] for campaign_id in campaign_ids}
+    if campaign_ids:
+        rows = (
+            db.query(CampaignCategory.campaign_id, CampaignCategory.category_id)
+            .filter(CampaignCategory.campaign_id.in_(campaign_ids))
+            .order_by(CampaignCategory.campaign_id, CampaignCategory.category_id)
+        )
+        for campaign_id, category_id in rows:
+            tags[campaign_id].append(category_id)
+    return tags
+
+
+def creator_category_ids(db: Session, creator_ids: List[int]) -> Dict[int, List[int]]:
+    """{creator_id: [category_id, ...]} for the given creators, in one query."""
+    tags = {creator_id: [] for creator_id in creator_ids}
+    if creator_ids:
+        rows = (
+            db.query(CreatorCategory.creator_id, CreatorCategory.category_id)
+            .filter(CreatorCategory.creator_id.in_(creator_ids))
+            .order_by(CreatorCategory.creator_id, CreatorCategory.category_id)
+        )
+        for creator_id, category_id in rows:
+            tags[creator_id].append(category_id)
+    return tags
+
+
+def set_campaign_categories(db: Session, user_id: int, campaign_id: int, category_ids: Iterable[int]) -> List[int]:
+    """Replace a campaign's categories and adjust the tenant's counts (does not commit).
+
+    The campaign must be live and owned by user_id. Returns the new category ids.
+    """
+    wanted = set(category_ids)
+    current = set(campaign_category_ids(db, [campaign_id])[campaign_id])
+    added = sorted(wanted - current)
+    if added:
+        # A concurrent request adding the same link fails on uq_campaign_category
+        db.execute(insert(CampaignCategory), [
+            {"campaign_id": campaign_id, "category_id": category_id} for category_id in added
+        ])
+    for category_id in added:
+        adjust_campaign_category_count(db, user_id, category_id, 1)
+    for category_id in sorted(current - wanted):
+        # One statement per link so a concurrent removal isn't counted twice
+        removed = (
+            db.query(CampaignCategory)
+            .filter(CampaignCategory.campaign_id == campaign_id, CampaignCategory.category_id == category_id)
+            .delete(synchronize_session=False)
+        )
+        adjust_campaign_category_count(db, user_id, category_id, -removed)
+    return sorted(wanted)
+
+
+def set_creator_categories(db: Session, creator_id: int, category_ids: Iterable[int]) -> List[int]:
+    """Replace a creator's categories and adjust the creator counts (does not commit)."""
+    wanted = set(category_ids)
+    current = set(creator_category_ids(db, [creator_id])[creator_id])
+    added = sorted(wanted - current)
+    if added:
+        db.execute(insert(CreatorCategory), [
+            {"creator_id": creator_id, "category_id": category_id} for category_id in added
+        ])
+    for category_id in added:
+        adjust_creator_count(db, category_id, 1)
+    for category_id in sorted(current - wanted):
+        removed = (
+            db.query(CreatorCategory)
+            .filter(CreatorCategory.creator_id == creator_id, CreatorCategory.category_id == category_id)
+            .delete(synchronize_session=False)
+        )
+        adjust_creator_count(db, category_id, -removed)
+    return sorted(wanted)
+
+
+def _forget_campaigns(db: Session, user_id: int, condition) -> None:
+    rows = (
+        db.query(CampaignCategory.category_id, func.count(CampaignCategory.id))
+        .join(Campaign, Campaign.id == CampaignCategory.campaign_id)
+        .filter(condition)
+        .group_by(CampaignCategory.category_id)
+    )
+    for category_id, count in rows.all():
+        adjust_campaign_category_count(db, user_id, category_id, -count)
+
+
+# The links themselves go with the campaigns (ON DELETE CASCADE / project purge);
+# these only take the campaigns out of the counts, before they disappear
+
+def forget_campaign_categories(db: Session, user_id: int, campaign_id: int) -> None:
+    """Uncount a campaign that is about to be deleted (does not commit)."""
+    _forget_campaigns(db, user_id, Campaign.id == campaign_id)
+
+
+def forget_project_categories(db: Session, user_id: int, project_id: int) -> None:
+    """Uncount every campaign of a project that is being hidden (does not commit)."""
+    _forget_campaigns(db, user_id, Campaign.project_id == project_id)
+
+
+def campaign_facets(db: Session, user_id: int) -> Dict[int, int]:
+    """{category_id: live campaign count} for a tenant - one index range, no GROUP BY."""
+    rows = (
+        db.query(CampaignCategoryCount.category_id, CampaignCategoryCount.campaign_count)
+        .filter(CampaignCategoryCount.user_id == user_id, CampaignCategoryCount.campaign_count > 0)
+    )
+    return {category_id: count for category_id, count in rows}
+
+
+def reconcile_campaign_category_counts(db: Session, user_ids: Optional[List[int]] = None) -> int:
+    """Recompute campaign_category_counts on one shard (commits).
+
+    Returns the number of count rows that were corrected.
+    """
+    actual = (
+        db.query(Project.user_id, CampaignCategory.category_id, func.count(CampaignCategory.id))
+        .join(Campaign, Campaign.id == CampaignCategory.campaign_id)
+        .join(Project, Project.id == Campaign.project_id)
+        .filter(Project.deleted_at.is_(None))
+        .group_by(Project.user_id, CampaignCategory.category_id)
+    )
+    counter_query = db.query(CampaignCategoryCount)
+    if user_ids is not None:
+        actual = actual.filter(Project.user_id.in_(user_ids))
+        counter_query = counter_query.filter(CampaignCategoryCount.user_id.in_(user_ids))
+    expected = {(user_id, category_id): count for user_id, category_id, count in actual}
+
+    corrected = 0
+    for counter in counter_query:
+        count = expected.pop((counter.user_id, counter.category_id), 0)
+        if counter.campaign_count != count:
+            counter.campaign_count = count
+            corrected += 1
+    for (user_id, category_id), count in expected.items():
+        db.add(CampaignCategoryCount(user_id=user_id, category_id=category_id, campaign_count=count))
+        corrected += 1
+
+    db.commit()
+    return corrected
+
+
+def reconcile_creator_counts(db: Session) -> int:
+    """Recompute categories.creator_count on the primary (commits). Returns rows corrected."""
+    expected = dict(
+        db.query(CreatorCategory.category_id, func.count(CreatorCategory.id)).group_by(CreatorCategory.category_id)
+    )
+    corrected = 0
+    for category in db.query(Category):
+        count = expected.get(category.id, 0)
+        if category.creator_count != count:
+            category.creator_count = count
+            corrected += 1
+    db.commit()
+    return corrected
+
+
+if __name__ == "__main__":
+    # Reconciliation job, e.g. from cron: python -m api.categories reconcile
+    import argparse
+    from .database import SessionLocal
+    from .sharding import shard_sessions
+
+    parser = argparse.ArgumentParser(description="Category facet count maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("reconcile", help="Recompute facet counts from the category links")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"Primary: corrected {reconcile_creator_counts(db)} creator counts")
+    finally:
+        db.close()
+    for shard_id, session_factory in shard_sessions.items():
+        db = session_factory()
+        try:
+            print(f"Shard {shard_id}: corrected {reconcile_campaign_category_counts(db)} campaign counts")
+        finally:
+            db.close()
@@ -1,24 +1,138 @@
+from functools import lru_cache
 from starlette.config import Config
+from starlette.datastructures import CommaSeparatedStrings
 
 config = Config(".env")
 
-# OAuth2 provider configurations
-OAUTH_PROVIDERS = {
-    'google': {
-        'client_id': config("GOOGLE_CLIENT_ID"),
-        'client_secret': config("GOOGLE_CLIENT_SECRET"),
-        'authorize_url': 'https://accounts.google.com/o/oauth2/auth',
-        'access_token_url': 'https://accounts.google.com/o/oauth2/token',
-        'redirect_uri': 'http://localhost:8000/auth/google/callback',
-        'scope': 'openid profile email'
-    },
-    'facebook': {
-        'client_id': config("FACEBOOK_CLIENT_ID"),
-        'client_secret': config("FACEBOOK_CLIENT_SECRET"),
-        'authorize_url': 'https://www.facebook.com/dialog/oauth',
-        'access_token_url': 'https://graph.facebook.com/v10.0/oauth/access_token',
-        'redirect_uri': 'http://localhost:8000/auth/facebook/callback',
-        'scope': 'email public_profile'
-    },
-    # Add other providers here...
-}
+# OAuth2 provider configurations - built on first use so importing settings
+# doesn't require (or read) the provider secrets. Endpoint URLs can be
+# overridden from the environment, e.g. to point at a local fake provider.
+@lru_cache(maxsize=None)
+def get_oauth_providers():
+    return {
+        'google': {
+            'client_id': config("GOOGLE_CLIENT_ID"),
+            'client_secret': config("GOOGLE_CLIENT_SECRET"),
+            'authorize_url': config("GOOGLE_AUTHORIZE_URL", default='https://accounts.google.com/o/oauth2/auth'),
+            'access_token_url': config("GOOGLE_ACCESS_TOKEN_URL", default='https://accounts.google.com/o/oauth2/token'),
+            'userinfo_endpoint': config("GOOGLE_USERINFO_URL", default='https://openidconnect.googleapis.com/v1/userinfo'),
+            'redirect_uri': 'http://localhost:8000/auth/google/callback',
+            'scope': 'openid profile email'
+        },
+        'facebook': {
+            'client_id': config("FACEBOOK_CLIENT_ID"),
+            'client_secret': config("FACEBOOK_CLIENT_SECRET"),
+            'authorize_url': config("FACEBOOK_AUTHORIZE_URL", default='https://www.facebook.com/dialog/oauth'),
+            'access_token_url': config("FACEBOOK_ACCESS_TOKEN_URL", default='https://graph.facebook.com/v10.0/oauth/access_token'),
+            'userinfo_endpoint': config(
+                "FACEBOOK_USERINFO_URL",
+                default='https://graph.facebook.com/me?fields=id,email,first_name,last_name'
+            ),
+            'redirect_uri': 'http://localhost:8000/auth/facebook/callback',
+            'scope': 'email public_profile'
+        },
+        # Add other providers here...
+    }
+
+# Production server (gunicorn_conf.py) sizing
+# WEB_CONCURRENCY=0 means one worker per CPU core
+WEB_CONCURRENCY = config("WEB_CONCURRENCY", cast=int, default=0)
+# Size of AnyIO's threadpool used for sync (def) endpoints, per worker. Every
+# def route and dependency (get_db, get_current_user, ...) holds a thread while
+# it runs, so this caps concurrent requests per worker; requests beyond it
+# queue (see admission.py and GET /health)
+THREADPOOL_TOKENS = config("THREADPOOL_TOKENS", cast=int, default=40)
+# Seconds a worker gets to finish in-flight requests on shutdown/reload
+GRACEFUL_TIMEOUT = config("GRACEFUL_TIMEOUT", cast=int, default=30)
+WORKER_TIMEOUT = config("WORKER_TIMEOUT", cast=int, default=60)
+KEEPALIVE = config("KEEPALIVE", cast=int, default=5)
+# Recycle workers after this many requests (0 disables)
+MAX_REQUESTS = config("MAX_REQUESTS", cast=int, default=0)
+
+# Outbound HTTP (OAuth provider calls) - shared connection pool, see outbound.py
+OUTBOUND_TIMEOUT = config("OUTBOUND_TIMEOUT", cast=float, default=10.0)
+OUTBOUND_CONNECT_TIMEOUT = config("OUTBOUND_CONNECT_TIMEOUT", cast=float, default=3.0)
+OUTBOUND_MAX_CONNECTIONS = config("OUTBOUND_MAX_CONNECTIONS", cast=int, default=50)
+OUTBOUND_MAX_KEEPALIVE = config("OUTBOUND_MAX_KEEPALIVE", cast=int, default=20)
+
+# Database - primary plus an optional read replica (see database.py).
+# DATABASE_BACKEND=sqlite selects the embedded profile (see embedded.py): no
+# MariaDB needed, the schema is created from the models on startup. Its
+# database is SQLITE_PATH, in memory unless a file path is given.
+DATABASE_BACKEND = config("DATABASE_BACKEND", default="mariadb")
+SQLITE_PATH = config("SQLITE_PATH", default=":memory:")
+DATABASE_URL = config(
+    "DATABASE_URL",
+    default=(
+        f"sqlite:///{SQLITE_PATH}" if DATABASE_BACKEND == "sqlite"
+        else "mysql+pymysql://sramsay:Mystreamseedpassw0rd@ss_mariadb/streamseed"
+    )
+)
+# Load the demo fixtures from embedded.py into an empty SQLite database on startup
+SEED_FIXTURES = config("SEED_FIXTURES", cast=bool, default=False)
+REPLICA_DATABASE_URL = config("REPLICA_DATABASE_URL", default=None)
+# Replicas further behind than this are skipped in favour of the primary
+REPLICA_MAX_LAG_SECONDS = config("REPLICA_MAX_LAG_SECONDS", cast=float, default=5)
+REPLICA_HEALTH_CHECK_INTERVAL = config("REPLICA_HEALTH_CHECK_INTERVAL", cast=float, default=5)
+# After a write, the same client reads from the primary for this long (0 disables)
+READ_YOUR_WRITES_SECONDS = config("READ_YOUR_WRITES_SECONDS", cast=float, default=5)
+
+# Tenant sharding (see sharding.py). Shard 0 is always DATABASE_URL; these are
+# shards 1..N, comma separated.
+SHARD_DATABASE_URLS = config("SHARD_DATABASE_URLS", cast=CommaSeparatedStrings, default="")
+# How long workers may cache a tenant's shard assignment
+SHARD_DIRECTORY_TTL_SECONDS = config("SHARD_DIRECTORY_TTL_SECONDS", cast=float, default=30)
+# Most shards (primary included) the id scheme leaves room for: shard N hands
+# out AUTO_INCREMENT ids N+1, N+1+stride, ... Changing it on a live
+# deployment needs every shard re-prepared (python -m api.sharding prepare)
+SHARD_ID_STRIDE = config("SHARD_ID_STRIDE", cast=int, default=16)
+
+# Rate limiting (see ratelimit.py). Each rule is
+# "<METHOD> <path>=<requests>/<seconds>:<ip|user>", "*" matches any method/path.
+RATE_LIMIT_ENABLED = config("RATE_LIMIT_ENABLED", cast=bool, default=True)
+RATE_LIMITS = config(
+    "RATE_LIMITS",
+    cast=CommaSeparatedStrings,
+    default=(
+        "POST /token=10/60:ip,"
+        "POST /token/refresh=30/60:ip,"
+        "POST /register=5/60:ip,"
+        "* *=1200/60:user"
+    ),
+)
+# Take the client IP from X-Forwarded-For (only behind a trusted proxy)
+RATE_LIMIT_TRUST_FORWARDED = config("RATE_LIMIT_TRUST_FORWARDED", cast=bool, default=False)
+# Optional shared bucket store so limits hold across workers/containers
+RATE_LIMIT_REDIS_URL = config("RATE_LIMIT_REDIS_URL", default=None)
+
+# Online backups (see backup.py)
+BACKUP_DIR = config("BACKUP_DIR", default="/backups")
+# Backups need RELOAD, BINLOG MONITOR and REPLICATION SLAVE on top of what the
+# application user has; defaults to DATABASE_URL
+BACKUP_DATABASE_URL = config("BACKUP_DATABASE_URL", default=None)
+# Parallel dump/restore streams - each holds one database connection
+BACKUP_WORKERS = config("BACKUP_WORKERS", cast=int, default=4)
+# gzip level for dump files (1 = fastest, 9 = smallest)
+BACKUP_COMPRESSION_LEVEL = config("BACKUP_COMPRESSION_LEVEL", cast=int, default=6)
+# Rows per dump chunk; tables with an integer primary key are split into
+# primary-key ranges holding this many rows so one big table is dumped in parallel
+BACKUP_CHUNK_ROWS = config("BACKUP_CHUNK_ROWS", cast=int, default=50000)
+
+
+# Audit log (see audit.py). Entries are queued in memory and inserted in
+# batches of up to AUDIT_BATCH_SIZE, at most AUDIT_FLUSH_SECONDS after commit.
+AUDIT_BATCH_SIZE = config("AUDIT_BATCH_SIZE", cast=int, default=200)
+AUDIT_FLUSH_SECONDS = config("AUDIT_FLUSH_SECONDS", cast=float, default=1.0)
+# Queued entries per worker before new ones are written inline
+AUDIT_QUEUE_SIZE = config("AUDIT_QUEUE_SIZE", cast=int, default=10000)
+
+# Load shedding (see admission.py). Once requests wait longer than this on
+# average for a threadpool thread, new ones get 503 + Retry-After
+ADMISSION_ENABLED = config("ADMISSION_ENABLED", cast=bool, default=True)
+ADMISSION_MAX_QUEUE_WAIT_SECONDS = config("ADMISSION_MAX_QUEUE_WAIT_SECONDS", cast=float, default=0.5)
+# Path prefixes that are never shed, so logins and health checks keep working
+ADMISSION_PRIORITY_PATHS = config(
+    "ADMISSION_PRIORITY_PATHS",
+    cast=CommaSeparatedStrings,
+    default="/health,/token,/register,/auth",
+)
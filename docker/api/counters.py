@@ -0,0 +1,134 @@
+# counters.py
+#
+# Per-user unread counters for messages and notifications. The counters are
+# adjusted in the same transaction as the row they describe, so a badge read is
+# a single primary-key lookup on user_counters. reconcile_unread_counters()
+# recomputes them from the source tables in case they ever drift.
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import Message, Notification, UserCounter
+
+# Number of rows touched per statement/commit by the bulk "mark all read" helpers
+MARK_READ_CHUNK_SIZE = 500
+
+COUNTER_COLUMNS = {
+    "messages": UserCounter.unread_messages,
+    "notifications": UserCounter.unread_notifications,
+}
+
+
+def adjust_unread(db: Session, user_id: int, kind: str, delta: int) -> None:
+    """Add delta to one of a user's unread counters (does not commit)."""
+    if delta == 0:
+        return
+    column = COUNTER_COLUMNS[kind]
+    # Single atomic UPDATE so concurrent writers don't lose increments
+    updated = (
+        db.query(UserCounter)
+        .filter(UserCounter.user_id == user_id)
+        .update(
+            {column: case((column + delta < 0, 0), else_=column + delta)},
+            synchronize_session=False,
+        )
+    )
+    if updated:
+        return
+    values = {"user_id": user_id, "unread_messages": 0, "unread_notifications": 0}
+    values[column.key] = max(delta, 0)
+    try:
+        # First counter change for this user - create the row
+        with db.begin_nested():
+            db.execute(insert(UserCounter).values(**values))
+    except IntegrityError:
+        # Another request created it first
+        adjust_unread(db, user_id, kind, delta)
+
+
+def get_unread_counts(db: Session, user_id: int) -> dict:
+    counter = db.get(UserCounter, user_id)
+    if counter is None:
+        return {"unread_messages": 0, "unread_notifications": 0}
+    return {
+        "unread_messages": counter.unread_messages,
+        "unread_notifications": counter.unread_notifications,
+    }
+
+
+def _unread_filter(kind: str, user_id: int):
+    if kind == "messages":
+        return Message, (Message.receiver_id == user_id, Message.status == "unread")
+    return Notification, (Notification.user_id == user_id, Notification.status == "unread")
+
+
+def mark_all_read(db: Session, user_id: int, kind: str, chunk_size: int = MARK_READ_CHUNK_SIZE) -> int:
+    """Mark every unread message/notification of a user as read.
+
+    Rows are updated in chunks of chunk_size, each in its own short transaction,
+    so a user with a huge backlog never holds long row locks. Returns the number
+    of rows that changed.
+    """
+    model, conditions = _unread_filter(kind, user_id)
+    total = 0
+    while True:
+        ids = [row_id for (row_id,) in db.query(model.id).filter(*conditions).limit(chunk_size).all()]
+        if not ids:
+            break
+        changed = (
+            db.query(model)
+            .filter(model.id.in_(ids), model.status == "unread")
+            .update({model.status: "read"}, synchronize_session=False)
+        )
+        adjust_unread(db, user_id, kind, -changed)
+        db.commit()
+        total += changed
+        if len(ids) < chunk_size:
+            break
+    return total
+
+
+def reconcile_unread_counters(db: Session, user_ids=None) -> int:
+    """Recompute unread counters from the source tables.
+
+    Meant to be run periodically (see __main__ below) to repair any drift.
+    Returns the number of counter rows that were corrected.
+    """
+    message_query = db.query(Message.receiver_id, func.count(Message.id)).filter(Message.status == "unread")
+    notification_query = db.query(Notification.user_id, func.count(Notification.id)).filter(Notification.status == "unread")
+    counter_query = db.query(UserCounter)
+    if user_ids is not None:
+        message_query = message_query.filter(Message.receiver_id.in_(user_ids))
+        notification_query = notification_query.filter(Notification.user_id.in_(user_ids))
+        counter_query = counter_query.filter(UserCounter.user_id.in_(user_ids))
+
+    expected = {}
+    for user_id, count in message_query.group_by(Message.receiver_id):
+        expected.setdefault(user_id, [0, 0])[0] = count
+    for user_id, count in notification_query.group_by(Notification.user_id):
+        expected.setdefault(user_id, [0, 0])[1] = count
+
+    corrected = 0
+    for counter in counter_query:
+        messages, notifications = expected.pop(counter.user_id, (0, 0))
+        if counter.unread_messages != messages or counter.unread_notifications != notifications:
+            counter.unread_messages = messages
+            counter.unread_notifications = notifications
+            corrected += 1
+    for user_id, (messages, notifications) in expected.items():
+        db.add(UserCounter(user_id=user_id, unread_messages=messages, unread_notifications=notifications))
+        corrected += 1
+
+    db.commit()
+    return corrected
+
+
+if __name__ == "__main__":
+    # Reconciliation job, e.g. from cron: python -m api.counters
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"Corrected {reconcile_unread_counters(db)} unread counter rows")
+    finally:
+        db.close()
@@ -0,0 +1,73 @@
+# dashboard.py
+#
+# Per-user cache of the dashboard summary (routes/dashboard.py). A summary is
+# rebuilt at most once per DASHBOARD_TTL_SECONDS per worker, and immediately
+# after the user writes a project or campaign through this worker - the write
+# endpoints call dashboard_cache.invalidate(). Writes handled by other workers
+# show up when the TTL runs out, so keep it short.
+#
+# Each user has a generation number that invalidate() bumps. A summary is only
+# stored if the generation did not change while it was being built, so a build
+# that raced with a write can't put pre-write data back into the cache.
+#
+# At most once per TTL, get() drops the expired summaries and every
+# generation, so both dicts only hold the users seen in the last TTL or two.
+# Dropping the generations bumps the epoch, so builds in flight are not kept.
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+DASHBOARD_TTL_SECONDS = 15
+
+
+class DashboardCache:
+    def __init__(self, ttl_seconds: float = DASHBOARD_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[float, object]] = {}
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # Bumped by invalidate() without a user and by _prune()
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def _prune(self, now: float) -> None:
+        # Called with the lock held
+        if now - self._pruned_at < self.ttl_seconds:
+            return
+        self._pruned_at = now
+        self._entries = {
+            user_id: entry for user_id, entry in self._entries.items() if now - entry[0] < self.ttl_seconds
+        }
+        if self._generations:
+            self._generations.clear()
+            self._epoch += 1
+
+    def get(self, user_id: int, loader: Callable[[], object]):
+        """Return (summary, cache_hit), building the summary with loader() on a miss."""
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                return entry[1], True
+            generation = self._generation(user_id)
+        summary = loader()
+        with self._lock:
+            if self._generation(user_id) == generation:
+                self._entries[user_id] = (time.monotonic(), summary)
+        return summary, False
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._epoch += 1
+            else:
+                self._entries.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+dashboard_cache = DashboardCache()
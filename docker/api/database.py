@@ -1,17 +1,244 @@
-from sqlalchemy import create_engine
+import math
+import threading
+import time
+from fastapi import HTTPException, Request
+from starlette.datastructures import MutableHeaders
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError, OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from .config.settings import (
+    DATABASE_URL,
+    REPLICA_DATABASE_URL,
+    REPLICA_MAX_LAG_SECONDS,
+    REPLICA_HEALTH_CHECK_INTERVAL,
+    READ_YOUR_WRITES_SECONDS,
+)
 
-DATABASE_URL = "mysql+pymysql://sramsay:Mystreamseedpassw0rd@ss_mariadb/streamseed"
 
-engine = create_engine(DATABASE_URL)
+# Helper function to tell whether a URL is an in-memory SQLite database
+def is_sqlite_memory(url) -> bool:
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"
+    )
+
+
+# Helper function to tell a duplicate key on one unique constraint apart from
+# other integrity errors (foreign keys, NOT NULL, other unique keys)
+def is_unique_violation(error: IntegrityError, table, constraint_name: str) -> bool:
+    message = str(error.orig)
+    # MariaDB: Duplicate entry '1-2' for key 'uq_name' (or 'table.uq_name')
+    if "Duplicate entry" in message:
+        return f"'{constraint_name}'" in message or f".{constraint_name}'" in message
+    # SQLite names the columns instead: UNIQUE constraint failed: table.a, table.b
+    for constraint in table.constraints:
+        if constraint.name == constraint_name:
+            columns = ", ".join(f"{table.name}.{column.name}" for column in constraint.columns)
+            return message == f"UNIQUE constraint failed: {columns}"
+    return False
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+# Engine factory for the primary, replica and shards. MariaDB URLs are passed
+# through; SQLite URLs (the embedded profile, see embedded.py) are set up so
+# the threadpool can share them: an in-memory database is one connection that
+# every thread uses (StaticPool) - fine for tests and single-client
+# benchmarks, use a file for concurrent load.
+def make_engine(url, foreign_keys=True, **options):
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(url, **options)
+    options["connect_args"] = {"check_same_thread": False, **options.get("connect_args", {})}
+    if is_sqlite_memory(url):
+        options["poolclass"] = StaticPool
+    sqlite_engine = create_engine(url, **options)
+    event.listen(sqlite_engine, "connect", _sqlite_pragmas)
+    if foreign_keys:
+        # MariaDB enforces foreign keys (and their ON DELETE CASCADE); SQLite
+        # only does when asked, per connection
+        event.listen(sqlite_engine, "connect", _sqlite_foreign_keys)
+    return sqlite_engine
+
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The one StaticPool connection *is* the database - never dispose it
+in_memory = is_sqlite_memory(DATABASE_URL)
+
+# Optional read replica. GET/HEAD requests read from it when it is healthy and
+# not lagging; everything else (and any fallback) goes to the primary.
+replica_engine = make_engine(REPLICA_DATABASE_URL, pool_pre_ping=True) if REPLICA_DATABASE_URL else None
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine else None
+)
 
 Base = declarative_base()
 
-def get_db():
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReplicaMonitor:
+    """Tracks replica health and replication lag.
+
+    The check runs inline, at most once per interval, in whichever request
+    thread finds the last result stale; concurrent requests don't wait for it
+    and use the previous result.
+    """
+
+    def __init__(self, replica_engine, max_lag_seconds, check_interval):
+        self.engine = replica_engine
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval = check_interval
+        self.healthy = False
+        self.lag_seconds = None
+        self._checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def replication_lag(self, connection):
+        """Seconds the replica is behind the primary; None if it isn't replicating."""
+        status = connection.execute(text("SHOW SLAVE STATUS")).mappings().first()
+        # Seconds_Behind_Master is NULL when replication is stopped/broken
+        return status["Seconds_Behind_Master"] if status else None
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                lag = self.replication_lag(connection)
+            self.lag_seconds = lag
+            self.healthy = lag is not None and lag <= self.max_lag_seconds
+        except OperationalError:
+            self.lag_seconds = None
+            self.healthy = False
+        self._checked_at = time.monotonic()
+
+    def is_usable(self):
+        if time.monotonic() - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self.check()
+            finally:
+                self._lock.release()
+        return self.healthy
+
+    def mark_unhealthy(self):
+        self.healthy = False
+        self._checked_at = time.monotonic()
+
+
+replica_monitor = (
+    ReplicaMonitor(replica_engine, REPLICA_MAX_LAG_SECONDS, REPLICA_HEALTH_CHECK_INTERVAL)
+    if replica_engine else None
+)
+
+# Read-your-writes: after a successful write the client is handed the time of
+# the write (cookie, and X-Last-Write for clients that don't keep cookies) and
+# reads the primary until READ_YOUR_WRITES_SECONDS later. The marker travels
+# with the client, so it holds whichever worker or container serves the read.
+# A client can only use it to send its own reads to the primary.
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "x-last-write"
+
+
+def wrote_recently(request: Request):
+    marker = request.cookies.get(LAST_WRITE_COOKIE) or request.headers.get(LAST_WRITE_HEADER)
+    try:
+        age = time.time() - float(marker)
+    except (TypeError, ValueError):
+        return False
+    # Negative ages allow for clock skew between the servers
+    return -READ_YOUR_WRITES_SECONDS < age < READ_YOUR_WRITES_SECONDS
+
+
+class ReadYourWritesMiddleware:
+    """Stamps successful non-read responses with the read-your-writes marker."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_marker(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                written_at = f"{time.time():.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append(LAST_WRITE_HEADER, written_at)
+                headers.append(
+                    "set-cookie",
+                    f"{LAST_WRITE_COOKIE}={written_at}; Max-Age={int(math.ceil(READ_YOUR_WRITES_SECONDS))}; "
+                    "Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_marker)
+
+
+def use_replica(request: Request):
+    return (
+        replica_monitor is not None
+        and request.method in READ_METHODS
+        and not wrote_recently(request)
+        and replica_monitor.is_usable()
+    )
+
+
+def get_db(request: Request):
+    if use_replica(request):
+        db = ReplicaSessionLocal()
+        try:
+            # Check out the connection up front (pool_pre_ping tests it), so a
+            # replica that is already gone costs a fallback, not an error
+            db.connection()
+        except OperationalError:
+            db.close()
+            replica_monitor.mark_unhealthy()
+        else:
+            try:
+                yield db
+            except OperationalError:
+                # Replica went away mid-request. The handler can't be re-run, so
+                # ask for a retry - it will read from the primary
+                replica_monitor.mark_unhealthy()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Read replica unavailable, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            finally:
+                db.close()
+            return
+
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# For GET handlers that write (e.g. the OAuth callback)
+def get_primary_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def dispose_engines(close=True):
+    if not in_memory:
+        engine.dispose(close=close)
+    if replica_engine is not None:
+        replica_engine.dispose(close=close)
@@ -0,0 +1,241 @@
+# deletion.py
+#
+# Asynchronous project deletion. Deleting a big project in one transaction
+# cascades over campaigns, campaign_creators, campaign_analytics and ratings
+# and holds row locks long enough to stall other writers. Instead:
+#
+#   1. start_project_deletion() stamps projects.deleted_at (every read filters
+#      on it, so the project disappears immediately) and records a
+#      project_deletions row, in one short transaction
+#   2. purge_project() runs after the response on deletion_worker's thread
+#      (not the request threadpool) and deletes the children DELETE_BATCH_SIZE
+#      rows at a time, one commit per batch, updating the progress row as it
+#      goes; the project row goes last
+#
+# Deletions interrupted by a restart are picked up again by
+# python -m api.deletion, which resumes every unfinished deletion on every shard.
+
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from .categories import forget_project_categories
+from .database import SessionLocal, in_memory
+from .models import (
+    Project,
+    ProjectDeletion,
+    Campaign,
+    CampaignCreator,
+    CampaignInvitationCount,
+    CampaignAnalytics,
+    CampaignMetricTotal,
+    CampaignCategory,
+    Rating,
+)
+from .sharding import shard_sessions, tenant_session
+
+# Rows removed per DELETE statement/commit
+DELETE_BATCH_SIZE = 500
+
+# Per-campaign child tables, removed before the campaigns themselves
+PROJECT_CHILD_TABLES = [
+    CampaignCreator,
+    CampaignInvitationCount,
+    CampaignAnalytics,
+    CampaignMetricTotal,
+    CampaignCategory,
+    Rating,
+]
+
+# A "running" deletion that has not reported progress for this long is
+# assumed to belong to a dead worker and may be resumed
+STALE_AFTER_SECONDS = 300
+
+
+def start_project_deletion(db: Session, project: Project) -> ProjectDeletion:
+    """Hide a project and record a pending deletion (commits)."""
+    project.deleted_at = datetime.utcnow()
+    # Hidden campaigns leave the category facets now, not when they are purged
+    forget_project_categories(db, project.user_id, project.id)
+    deletion = ProjectDeletion(
+        project_id=project.id,
+        user_id=project.user_id,
+        status="pending",
+        campaigns_total=db.query(Campaign.id).filter(Campaign.project_id == project.id).count(),
+    )
+    db.add(deletion)
+    db.commit()
+    db.refresh(deletion)
+    return deletion
+
+
+def _delete_in_batches(db: Session, model, condition, deletion: ProjectDeletion, batch_size: int) -> None:
+    while True:
+        ids = [row_id for (row_id,) in db.query(model.id).filter(condition).limit(batch_size)]
+        if not ids:
+            return
+        deletion.rows_deleted += (
+            db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+        )
+        db.commit()
+        if len(ids) < batch_size:
+            return
+
+
+def run_deletion(db: Session, deletion: ProjectDeletion, batch_size: int = DELETE_BATCH_SIZE) -> ProjectDeletion:
+    """Delete a hidden project's rows in bounded batches, recording progress on deletion."""
+    project_id = deletion.project_id
+    deletion.status = "running"
+    deletion.error = None
+    db.commit()
+    try:
+        while True:
+            campaign_ids = [
+                campaign_id
+                for (campaign_id,) in db.query(Campaign.id).filter(Campaign.project_id == project_id).limit(batch_size)
+            ]
+            if not campaign_ids:
+                break
+            for model in PROJECT_CHILD_TABLES:
+                _delete_in_batches(db, model, model.campaign_id.in_(campaign_ids), deletion, batch_size)
+            deleted = db.query(Campaign).filter(Campaign.id.in_(campaign_ids)).delete(synchronize_session=False)
+            deletion.campaigns_deleted += deleted
+            deletion.rows_deleted += deleted
+            db.commit()
+
+        deletion.rows_deleted += (
+            db.query(Project).filter(Project.id == project_id).delete(synchronize_session=False)
+        )
+        deletion.status = "done"
+        deletion.finished_at = datetime.utcnow()
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        # Batches already committed stay deleted; a resume continues from here
+        deletion.status = "failed"
+        deletion.error = str(exc)[:1000]
+        db.commit()
+    return deletion
+
+
+def purge_project(user_id: int, deletion_id: int, batch_size: int = DELETE_BATCH_SIZE) -> None:
+    """deletion_worker's entry point - opens its own session on the tenant's shard."""
+    primary = SessionLocal()
+    try:
+        db = tenant_session(primary, user_id)
+    finally:
+        primary.close()
+    try:
+        deletion = db.get(ProjectDeletion, deletion_id)
+        if deletion is not None and deletion.status in ("pending", "running"):
+            run_deletion(db, deletion, batch_size)
+    finally:
+        db.close()
+
+
+class DeletionWorker:
+    """Runs purge_project() for queued deletions, one at a time, on its own thread.
+
+    A purge can take minutes; on the request threadpool it would hold one of
+    the THREADPOOL_TOKENS threads throughout and count as load. The thread
+    starts on the first submit in each process (threads don't survive fork).
+    Deletions it hasn't finished at shutdown stay pending/running and are
+    resumed by python -m api.deletion.
+
+    synchronous=True purges inline instead; used for an in-memory SQLite
+    database, whose single connection a second thread can't safely share.
+    """
+
+    def __init__(self, synchronous=False):
+        self.synchronous = synchronous
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the queue and thread (post-fork: they belong to the parent)."""
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def submit(self, user_id: int, deletion_id: int) -> None:
+        if self.synchronous:
+            purge_project(user_id, deletion_id)
+            return
+        self._ensure_started()
+        self._queue.put((user_id, deletion_id))
+
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            self.reset()
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="project-deletion", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                purge_project(*job)
+            except Exception as e:
+                # run_deletion records its own failures; this is e.g. the shard being down
+                print(f"deletion: purge of deletion {job[1]} failed: {e}", file=sys.stderr)
+
+    def stop(self, timeout=5):
+        """Stop after the queued purges, waiting at most timeout seconds (shutdown)."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+
+deletion_worker = DeletionWorker(synchronous=in_memory)
+
+
+def resume_deletions(stale_after: float = STALE_AFTER_SECONDS, log=print) -> int:
+    """Finish pending, failed and stalled deletions on every shard. Returns how many ran."""
+    stale_before = datetime.utcnow() - timedelta(seconds=stale_after)
+    resumed = 0
+    for shard_id, session_factory in shard_sessions.items():
+        db = session_factory()
+        try:
+            unfinished = (
+                db.query(ProjectDeletion)
+                .filter(
+                    (ProjectDeletion.status.in_(["pending", "failed"]))
+                    | ((ProjectDeletion.status == "running") & (ProjectDeletion.updated_at < stale_before))
+                )
+                .order_by(ProjectDeletion.id)
+                .all()
+            )
+            for deletion in unfinished:
+                started = time.monotonic()
+                run_deletion(db, deletion)
+                resumed += 1
+                log(
+                    f"shard {shard_id}: project {deletion.project_id} {deletion.status}, "
+                    f"{deletion.rows_deleted} rows in {time.monotonic() - started:.2f}s"
+                )
+        finally:
+            db.close()
+    return resumed
+
+
+if __name__ == "__main__":
+    # Resume interrupted deletions, e.g. from cron or after a deploy: python -m api.deletion
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resume unfinished project deletions")
+    parser.add_argument("--stale-after", type=float, default=STALE_AFTER_SECONDS,
+                        help="Seconds without progress before a running deletion is taken over")
+    args = parser.parse_args()
+    print(f"Resumed {resume_deletions(args.stale_after)} project deletions")
@@ -0,0 +1,261 @@
+# embedded.py
+#
+# Embedded SQLite profile for tests and benchmarks - runs the whole API with no
+# MariaDB (DATABASE_BACKEND=sqlite, optionally SQLITE_PATH=/tmp/streamseed.db).
+#
+#   - main.py calls prepare_embedded_database() on import when the primary is
+#     SQLite: the schema comes from models.Base.metadata (create_all, not the
+#     MariaDB-only migrations), on every shard; with SEED_FIXTURES=true an
+#     empty database also gets the demo fixtures below
+#   - count_queries() counts the statements a block of code sends to the
+#     databases, for query-count regression checks
+#
+#   python -m api.embedded seed [--users N ...]   seed a SQLite file for a
+#                                                 benchmark (SQLITE_PATH)
+#
+# An in-memory database exists once per process, so run one worker (uvicorn or
+# TestClient); use a file for concurrent load or several workers.
+
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from .categories import reconcile_campaign_category_counts, reconcile_creator_counts
+from .counters import reconcile_unread_counters
+from .invitations import reconcile_funnels
+from .leaderboard import rebuild_rollups
+from .models import (
+    Base,
+    User,
+    Project,
+    Campaign,
+    Creator,
+    CampaignCreator,
+    CampaignAnalytics,
+    Rating,
+    Message,
+    Notification,
+    Category,
+    CampaignCategory,
+    CreatorCategory,
+)
+
+# Every fixture user logs in with this password (user1@example.com, ...)
+FIXTURE_PASSWORD = "password"
+FIXTURE_USERS = 3
+FIXTURE_PROJECTS_PER_USER = 4
+FIXTURE_CAMPAIGNS_PER_PROJECT = 5
+FIXTURE_ANALYTICS_PER_CAMPAIGN = 12
+
+METRIC_TYPES = ("views", "clicks", "likes", "shares", "conversions")
+CATEGORY_NAMES = ("Gaming", "Beauty", "Fitness", "Food", "Travel", "Tech")
+
+
+def create_schema(engines) -> None:
+    for engine in engines:
+        Base.metadata.create_all(engine)
+
+
+def seed_fixtures(
+    db: Session,
+    users: int = FIXTURE_USERS,
+    projects_per_user: int = FIXTURE_PROJECTS_PER_USER,
+    campaigns_per_project: int = FIXTURE_CAMPAIGNS_PER_PROJECT,
+    analytics_per_campaign: int = FIXTURE_ANALYTICS_PER_CAMPAIGN,
+    seed: int = 0,
+) -> dict:
+    """Insert deterministic demo data (commits). Returns the rows added per table."""
+    from .routes.auth import hash_password
+
+    rng = random.Random(seed)
+    today = date.today()
+    password_hash = hash_password(FIXTURE_PASSWORD)  # bcrypt once, not per user
+    offset = db.query(User).count()
+
+    user_rows = [
+        User(
+            email=f"user{offset + n}@example.com",
+            password_hash=password_hash,
+            first_name=f"User{offset + n}",
+            last_name="Fixture",
+        )
+        for n in range(1, users + 1)
+    ]
+    db.add_all(user_rows)
+    db.flush()
+
+    creators = [Creator(user_id=user.id, bio=f"{user.first_name}'s channel", social_links={}, rating=0) for user in user_rows]
+    db.add_all(creators)
+    if not db.query(Category.id).first():
+        db.add_all(Category(name=name, description=f"{name} campaigns") for name in CATEGORY_NAMES)
+
+    projects = [
+        Project(user_id=user.id, name=f"{user.first_name} project {n}", description=f"Fixture project {n}")
+        for user in user_rows
+        for n in range(1, projects_per_user + 1)
+    ]
+    db.add_all(projects)
+    db.flush()
+
+    campaigns = []
+    for project in projects:
+        for n in range(1, campaigns_per_project + 1):
+            # Spread over past, live and upcoming so every computed status occurs
+            start_date = today + timedelta(days=rng.randint(-120, 60))
+            campaigns.append(Campaign(
+                project_id=project.id,
+                name=f"{project.name} campaign {n}",
+                description="Fixture campaign " * rng.randint(1, 20),
+                requirements="Post twice a week",
+                start_date=start_date,
+                end_date=start_date + timedelta(days=rng.randint(7, 90)),
+            ))
+    db.add_all(campaigns)
+    db.flush()
+
+    analytics, campaign_creators, ratings = [], [], []
+    for campaign in campaigns:
+        for n in range(analytics_per_campaign):
+            analytics.append(CampaignAnalytics(
+                campaign_id=campaign.id,
+                metric_type=METRIC_TYPES[n % len(METRIC_TYPES)],
+                value=rng.randint(0, 10000),
+            ))
+        for creator in rng.sample(creators, min(2, len(creators))):
+            campaign_creators.append(CampaignCreator(
+                campaign_id=campaign.id,
+                creator_id=creator.id,
+                status=rng.choice(("invited", "accepted", "rejected")),
+            ))
+            ratings.append(Rating(campaign_id=campaign.id, creator_id=creator.id, rating=rng.randint(1, 5)))
+    db.add_all(analytics + campaign_creators + ratings)
+
+    messages, notifications = [], []
+    for user in user_rows:
+        for other in user_rows:
+            if other is not user:
+                messages.append(Message(sender_id=other.id, receiver_id=user.id, content=f"Hi from {other.first_name}",
+                                        status=rng.choice(("read", "unread"))))
+        notifications.append(Notification(user_id=user.id, content="Welcome to Streamseed", status="unread"))
+    db.add_all(messages + notifications)
+
+    category_ids = [category_id for (category_id,) in db.query(Category.id).order_by(Category.id)]
+    creator_categories = [
+        CreatorCategory(creator_id=creator.id, category_id=category_id)
+        for creator in creators
+        for category_id in rng.sample(category_ids, min(2, len(category_ids)))
+    ]
+    campaign_categories = [
+        CampaignCategory(campaign_id=campaign.id, category_id=category_id)
+        for campaign in campaigns
+        for category_id in rng.sample(category_ids, rng.randint(0, min(3, len(category_ids))))
+    ]
+    db.add_all(creator_categories + campaign_categories)
+    db.flush()
+
+    # Unread badges, category facets and invitation funnels are maintained
+    # counters - derive them from what was inserted (each reconcile commits)
+    reconcile_unread_counters(db, [user.id for user in user_rows])
+    reconcile_funnels(db, [campaign.id for campaign in campaigns])
+    reconcile_campaign_category_counts(db, [user.id for user in user_rows])
+    reconcile_creator_counts(db)
+    # So are the leaderboard rollups (commits)
+    rollups = rebuild_rollups(db, [campaign.id for campaign in campaigns])
+    return {
+        "users": len(user_rows),
+        "projects": len(projects),
+        "campaigns": len(campaigns),
+        "campaign_analytics": len(analytics),
+        "campaign_metric_totals": rollups,
+        "campaign_creators": len(campaign_creators),
+        "ratings": len(ratings),
+        "campaign_categories": len(campaign_categories),
+        "creator_categories": len(creator_categories),
+        "messages": len(messages),
+        "notifications": len(notifications),
+    }
+
+
+def prepare_embedded_database(seed: bool = False, log=print) -> None:
+    from .database import SessionLocal
+    from .sharding import shard_engines
+
+    create_schema(shard_engines.values())
+    if not seed:
+        return
+    db = SessionLocal()
+    try:
+        if db.query(User.id).first() is None:
+            counts = seed_fixtures(db)
+            log("Seeded fixtures: " + ", ".join(f"{count} {table}" for table, count in counts.items()))
+    finally:
+        db.close()
+
+
+class QueryCount:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engines=None):
+    """Count the statements sent to the databases inside the block.
+
+        with count_queries() as queries:
+            client.get("/dashboard", headers=headers)
+        assert queries.count <= 7
+    """
+    if engines is None:
+        from .sharding import shard_engines
+        engines = shard_engines.values()
+    engines = list(engines)
+    queries = QueryCount()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        queries.statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield queries
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+
+
+if __name__ == "__main__":
+    import argparse
+    from .database import SessionLocal, engine, in_memory
+    from .sharding import shard_engines
+
+    parser = argparse.ArgumentParser(description="Embedded SQLite profile")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    seed_parser = subparsers.add_parser("seed", help="Create the schema and add fixture data (SQLITE_PATH)")
+    seed_parser.add_argument("--users", type=int, default=FIXTURE_USERS)
+    seed_parser.add_argument("--projects-per-user", type=int, default=FIXTURE_PROJECTS_PER_USER)
+    seed_parser.add_argument("--campaigns-per-project", type=int, default=FIXTURE_CAMPAIGNS_PER_PROJECT)
+    seed_parser.add_argument("--analytics-per-campaign", type=int, default=FIXTURE_ANALYTICS_PER_CAMPAIGN)
+    seed_parser.add_argument("--seed", type=int, default=0, help="Random seed for dates and metric values")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "sqlite" or in_memory:
+        parser.error("Needs a SQLite file - set DATABASE_BACKEND=sqlite and SQLITE_PATH")
+    create_schema(shard_engines.values())
+    db = SessionLocal()
+    try:
+        counts = seed_fixtures(
+            db,
+            users=args.users,
+            projects_per_user=args.projects_per_user,
+            campaigns_per_project=args.campaigns_per_project,
+            analytics_per_campaign=args.analytics_per_campaign,
+            seed=args.seed,
+        )
+    finally:
+        db.close()
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
@@ -0,0 +1,174 @@
+# invitations.py
+#
+# Creator invitations (campaign_creators rows) in bulk. Agencies invite and
+# update hundreds of creators per campaign, so every operation costs a fixed
+# number of statements whatever the number of creators:
+#
+#   - invite_creators() reads which of the requested creators are already
+#     invited (one query on uq_campaign_creator) and inserts the rest in one
+#     multi-row INSERT. A concurrent invite of the same creator fails on the
+#     unique key; the route retries once, and the retry skips it
+#   - transition_invitations() is one conditional UPDATE ... WHERE campaign_id
+#     AND creator_id IN (...) AND status = from_status. Rows in any other
+#     status are left alone, and since every changed row came from one status
+#     the rowcount is the exact change to the funnel
+#   - campaign_invitation_counts holds the per-campaign funnel (invited /
+#     accepted / rejected) and is adjusted in the same transaction, so reading
+#     it is one row instead of a GROUP BY over campaign_creators
+#
+#   python -m api.invitations reconcile
+#
+# recomputes the funnels from campaign_creators, in case they ever drift.
+
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import case, func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import CampaignCreator, CampaignInvitationCount
+
+INVITATION_STATUSES = ("invited", "accepted", "rejected")
+
+# Most creator ids accepted by one bulk request
+MAX_INVITATION_BATCH = 500
+
+FUNNEL_COLUMNS = {status: getattr(CampaignInvitationCount, status) for status in INVITATION_STATUSES}
+
+
+def adjust_funnel(db: Session, campaign_id: int, deltas: Dict[str, int]) -> None:
+    """Add deltas ({status: delta}) to a campaign's funnel (does not commit)."""
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Single atomic UPDATE so concurrent writers don't lose increments
+    updated = (
+        db.query(CampaignInvitationCount)
+        .filter(CampaignInvitationCount.campaign_id == campaign_id)
+        .update(
+            {
+                FUNNEL_COLUMNS[status]: case(
+                    (FUNNEL_COLUMNS[status] + delta < 0, 0), else_=FUNNEL_COLUMNS[status] + delta
+                )
+                for status, delta in deltas.items()
+            },
+            synchronize_session=False,
+        )
+    )
+    if updated:
+        return
+    try:
+        # First invitation of this campaign - create the row
+        with db.begin_nested():
+            db.execute(insert(CampaignInvitationCount).values(
+                campaign_id=campaign_id,
+                **{status: max(deltas.get(status, 0), 0) for status in INVITATION_STATUSES},
+            ))
+    except IntegrityError:
+        # Another request created it first
+        adjust_funnel(db, campaign_id, deltas)
+
+
+def get_funnel(db: Session, campaign_id: int) -> Dict[str, int]:
+    counter = (
+        db.query(CampaignInvitationCount)
+        .filter(CampaignInvitationCount.campaign_id == campaign_id)
+        .first()
+    )
+    return {status: getattr(counter, status) if counter else 0 for status in INVITATION_STATUSES}
+
+
+def invite_creators(db: Session, campaign_id: int, creator_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """Invite creators to a campaign, skipping those already on it (does not commit).
+
+    The creator ids must exist. Returns {"invited": [...], "already_invited": [...]}.
+    """
+    requested = list(dict.fromkeys(creator_ids))
+    if not requested:
+        return {"invited": [], "already_invited": []}
+    existing = {
+        creator_id
+        for (creator_id,) in db.query(CampaignCreator.creator_id).filter(
+            CampaignCreator.campaign_id == campaign_id, CampaignCreator.creator_id.in_(requested)
+        )
+    }
+    new_ids = [creator_id for creator_id in requested if creator_id not in existing]
+    if new_ids:
+        db.execute(insert(CampaignCreator), [
+            {"campaign_id": campaign_id, "creator_id": creator_id, "status": "invited"} for creator_id in new_ids
+        ])
+        adjust_funnel(db, campaign_id, {"invited": len(new_ids)})
+    return {
+        "invited": new_ids,
+        "already_invited": [creator_id for creator_id in requested if creator_id in existing],
+    }
+
+
+def transition_invitations(
+    db: Session, campaign_id: int, creator_ids: Iterable[int], from_status: str, to_status: str
+) -> int:
+    """Move the given creators' invitations from from_status to to_status (does not commit).
+
+    Invitations in any other status (or missing) are not touched. Returns how many moved.
+    """
+    moved = (
+        db.query(CampaignCreator)
+        .filter(
+            CampaignCreator.campaign_id == campaign_id,
+            CampaignCreator.creator_id.in_(list(creator_ids)),
+            CampaignCreator.status == from_status,
+        )
+        .update({CampaignCreator.status: to_status}, synchronize_session=False)
+    )
+    adjust_funnel(db, campaign_id, {from_status: -moved, to_status: moved})
+    return moved
+
+
+def reconcile_funnels(db: Session, campaign_ids: Optional[List[int]] = None) -> int:
+    """Recompute campaign_invitation_counts on one shard (commits).
+
+    Returns the number of funnel rows that were corrected.
+    """
+    actual = (
+        db.query(CampaignCreator.campaign_id, CampaignCreator.status, func.count(CampaignCreator.id))
+        .filter(CampaignCreator.status.in_(INVITATION_STATUSES))
+        .group_by(CampaignCreator.campaign_id, CampaignCreator.status)
+    )
+    counter_query = db.query(CampaignInvitationCount)
+    if campaign_ids is not None:
+        actual = actual.filter(CampaignCreator.campaign_id.in_(campaign_ids))
+        counter_query = counter_query.filter(CampaignInvitationCount.campaign_id.in_(campaign_ids))
+
+    expected = {}
+    for campaign_id, status, count in actual:
+        expected.setdefault(campaign_id, dict.fromkeys(INVITATION_STATUSES, 0))[status] = count
+
+    corrected = 0
+    for counter in counter_query:
+        counts = expected.pop(counter.campaign_id, dict.fromkeys(INVITATION_STATUSES, 0))
+        if any(getattr(counter, status) != count for status, count in counts.items()):
+            for status, count in counts.items():
+                setattr(counter, status, count)
+            corrected += 1
+    for campaign_id, counts in expected.items():
+        db.add(CampaignInvitationCount(campaign_id=campaign_id, **counts))
+        corrected += 1
+
+    db.commit()
+    return corrected
+
+
+if __name__ == "__main__":
+    # Reconciliation job, e.g. from cron: python -m api.invitations reconcile
+    import argparse
+    from .sharding import shard_sessions
+
+    parser = argparse.ArgumentParser(description="Invitation funnel maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("reconcile", help="Recompute invitation funnels from campaign_creators")
+    args = parser.parse_args()
+
+    for shard_id, session_factory in shard_sessions.items():
+        db = session_factory()
+        try:
+            print(f"Shard {shard_id}: corrected {reconcile_funnels(db)} funnels")
+        finally:
+            db.close()
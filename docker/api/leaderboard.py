@@ -0,0 +1,346 @@
+# leaderboard.py
+#
+# Live "top campaigns by metric" per tenant without ORDER BY SUM(value) over
+# campaign_analytics on every refresh.
+#
+#   - campaign_metric_totals holds SUM(value) per (campaign, metric). The
+#     analytics ingest (record_analytics) bulk-inserts the events and adds
+#     their values to the rollup in the same transaction
+#   - every worker keeps, per tenant and metric, the LEADERBOARD_SIZE largest
+#     totals as a sorted array (TopK). Ingest offers the campaign's new total
+#     after commit; totals only grow, so a campaign that drops out of the top
+#     k can only come back through an offer and the array stays exact. A read
+#     is a slice - O(k)
+#   - arrays are built from the rollup (one ROW_NUMBER() query) for every
+#     tenant on startup, and again for a tenant LEADERBOARD_TTL_SECONDS after
+#     its last load (so ingest handled by other workers shows up) or after a
+#     change that can lower or rename an entry (campaign edited/deleted,
+#     project deleted)
+#   - at most once per TTL, top() drops the expired boards and every
+#     generation (bumping the epoch, so loads in flight are not kept), so a
+#     worker only holds the tenants read or warmed in the last TTL or two
+#
+#   python -m api.leaderboard rebuild-rollups [--shard N]
+#
+# recomputes campaign_metric_totals from campaign_analytics, in case they ever
+# drift (e.g. after rows were edited by hand).
+
+import bisect
+import sys
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+from .models import Campaign, CampaignAnalytics, CampaignMetricTotal, Project
+
+# Entries kept per tenant and metric (the most a read can ask for)
+LEADERBOARD_SIZE = 25
+LEADERBOARD_TTL_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    campaign_id: int
+    campaign_name: str
+    project_id: int
+    total: int
+
+    @property
+    def sort_key(self) -> Tuple[int, int]:
+        return (-self.total, self.campaign_id)
+
+
+class TopK:
+    """The k entries with the largest totals, sorted descending (ties by campaign id)."""
+
+    def __init__(self, k: int, entries: Iterable[LeaderboardEntry] = ()):
+        self.k = k
+        self._entries: List[LeaderboardEntry] = sorted(entries, key=lambda entry: entry.sort_key)[:k]
+        self._keys = [entry.sort_key for entry in self._entries]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def offer(self, entry: LeaderboardEntry) -> None:
+        """Add or update a campaign whose total has grown to entry.total.
+
+        Totals only grow, so an offer not above the total already held is a
+        stale one (e.g. from an ingest that committed earlier) and is ignored.
+        """
+        for position, current in enumerate(self._entries):
+            if current.campaign_id == entry.campaign_id:
+                if entry.total <= current.total:
+                    return
+                del self._entries[position]
+                del self._keys[position]
+                break
+        key = entry.sort_key
+        if len(self._entries) >= self.k and key >= self._keys[-1]:
+            return
+        position = bisect.bisect_left(self._keys, key)
+        self._entries.insert(position, entry)
+        self._keys.insert(position, key)
+        if len(self._entries) > self.k:
+            self._entries.pop()
+            self._keys.pop()
+
+    def top(self, limit: int) -> List[LeaderboardEntry]:
+        return self._entries[:limit]
+
+
+# Helper function to load the top k campaigns per (tenant, metric) from the rollup
+def load_top_campaigns(db: Session, k: int = LEADERBOARD_SIZE, user_id: Optional[int] = None):
+    """Rows of (user_id, metric_type, LeaderboardEntry); all tenants if user_id is None."""
+    rank = func.row_number().over(
+        partition_by=(CampaignMetricTotal.user_id, CampaignMetricTotal.metric_type),
+        order_by=(CampaignMetricTotal.total.desc(), CampaignMetricTotal.campaign_id),
+    ).label("rank")
+    query = (
+        db.query(
+            CampaignMetricTotal.user_id,
+            CampaignMetricTotal.metric_type,
+            CampaignMetricTotal.total,
+            Campaign.id.label("campaign_id"),
+            Campaign.name,
+            Campaign.project_id,
+            rank,
+        )
+        .join(Campaign, Campaign.id == CampaignMetricTotal.campaign_id)
+        .join(Project, Project.id == Campaign.project_id)
+        .filter(Project.deleted_at.is_(None))
+    )
+    if user_id is not None:
+        query = query.filter(CampaignMetricTotal.user_id == user_id)
+    ranked = query.subquery()
+    rows = db.query(ranked).filter(ranked.c.rank <= k)
+    return [
+        (row.user_id, row.metric_type, LeaderboardEntry(row.campaign_id, row.name, row.project_id, int(row.total)))
+        for row in rows
+    ]
+
+
+class Leaderboards:
+    """Per-tenant {metric_type: TopK} registry, loaded lazily or by warm()."""
+
+    def __init__(self, k: int = LEADERBOARD_SIZE, ttl_seconds: float = LEADERBOARD_TTL_SECONDS):
+        self.k = k
+        self.ttl_seconds = ttl_seconds
+        self._boards: Dict[int, Tuple[float, Dict[str, TopK]]] = {}
+        # Bumped when a tenant's boards change while not loaded (or expired), so
+        # a load that raced with an ingest or invalidate() is used but not kept
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # Bumped by invalidate() without a user and by _prune()
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def _prune(self) -> None:
+        # Called with the lock held
+        now = time.monotonic()
+        if now - self._pruned_at < self.ttl_seconds:
+            return
+        self._pruned_at = now
+        self._boards = {user_id: board for user_id, board in self._boards.items() if self._fresh(board)}
+        if self._generations:
+            self._generations.clear()
+            self._epoch += 1
+
+    def _fresh(self, board) -> bool:
+        return board is not None and time.monotonic() - board[0] < self.ttl_seconds
+
+    def _build(self, rows) -> Dict[int, Dict[str, TopK]]:
+        grouped = defaultdict(lambda: defaultdict(list))
+        for user_id, metric_type, entry in rows:
+            grouped[user_id][metric_type].append(entry)
+        return {
+            user_id: {metric_type: TopK(self.k, entries) for metric_type, entries in metrics.items()}
+            for user_id, metrics in grouped.items()
+        }
+
+    def warm(self, rows) -> int:
+        """Install boards for every tenant in rows (startup). Returns the tenant count."""
+        boards = self._build(rows)
+        now = time.monotonic()
+        with self._lock:
+            for user_id, metrics in boards.items():
+                self._boards[user_id] = (now, metrics)
+        return len(boards)
+
+    def top(self, user_id: int, metric_type: str, limit: int, loader: Callable[[], list]) -> List[LeaderboardEntry]:
+        with self._lock:
+            self._prune()
+            board = self._boards.get(user_id)
+            if self._fresh(board):
+                metric = board[1].get(metric_type)
+                return metric.top(limit) if metric is not None else []
+            generation = self._generation(user_id)
+        metrics = self._build(loader()).get(user_id, {})
+        with self._lock:
+            if self._generation(user_id) == generation:
+                self._boards[user_id] = (time.monotonic(), metrics)
+        metric = metrics.get(metric_type)
+        return metric.top(limit) if metric is not None else []
+
+    def record(self, user_id: int, totals: Iterable[Tuple[str, LeaderboardEntry]]) -> None:
+        """Offer new totals after an ingest commits (no-op if the tenant is not loaded)."""
+        with self._lock:
+            board = self._boards.get(user_id)
+            if not self._fresh(board):
+                # A reload may be reading the rollup from before this ingest
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if board is None:
+                return
+            for metric_type, entry in totals:
+                metric = board[1].get(metric_type)
+                if metric is None:
+                    # Loaded boards cover every metric in the rollup - this one is new
+                    metric = board[1][metric_type] = TopK(self.k)
+                metric.offer(entry)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._boards.clear()
+                self._epoch += 1
+            else:
+                self._boards.pop(user_id, None)
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+leaderboards = Leaderboards()
+
+
+def warm_leaderboards() -> int:
+    """Build every tenant's boards from the rollups on every shard (startup)."""
+    from .sharding import shard_sessions
+
+    tenants = 0
+    for shard_id, session_factory in shard_sessions.items():
+        db = session_factory()
+        try:
+            tenants += leaderboards.warm(load_top_campaigns(db, leaderboards.k))
+        except SQLAlchemyError as e:
+            # Not fatal - tenants are loaded on their first read instead
+            print(f"leaderboard: could not warm shard {shard_id}: {e}", file=sys.stderr)
+        finally:
+            db.close()
+    return tenants
+
+
+# Rollup maintenance
+
+def _add_to_total(db: Session, user_id: int, campaign_id: int, metric_type: str, delta: int) -> None:
+    # Single atomic UPDATE so concurrent ingests don't lose increments
+    updated = (
+        db.query(CampaignMetricTotal)
+        .filter(CampaignMetricTotal.campaign_id == campaign_id, CampaignMetricTotal.metric_type == metric_type)
+        .update({CampaignMetricTotal.total: CampaignMetricTotal.total + delta}, synchronize_session=False)
+    )
+    if updated:
+        return
+    try:
+        # First event for this campaign/metric - create the row
+        with db.begin_nested():
+            db.execute(insert(CampaignMetricTotal).values(
+                campaign_id=campaign_id, metric_type=metric_type, user_id=user_id, total=delta,
+            ))
+    except IntegrityError:
+        # Another ingest created it first
+        _add_to_total(db, user_id, campaign_id, metric_type, delta)
+
+
+def record_analytics(db: Session, user_id: int, events: List[dict]) -> Dict[Tuple[int, str], int]:
+    """Insert analytics events and add them to the rollup (does not commit).
+
+    events are dicts with campaign_id, metric_type, value and optionally
+    recorded_at; the campaigns must belong to user_id. Returns the new total
+    of every (campaign_id, metric_type) touched.
+    """
+    now = datetime.utcnow()
+    db.execute(insert(CampaignAnalytics), [
+        {
+            "campaign_id": event["campaign_id"],
+            "metric_type": event["metric_type"],
+            "value": event["value"],
+            "recorded_at": event.get("recorded_at") or now,
+        }
+        for event in events
+    ])
+
+    deltas = defaultdict(int)
+    for event in events:
+        deltas[(event["campaign_id"], event["metric_type"])] += event["value"]
+    # Fixed order so concurrent ingests lock rollup rows in the same order
+    for (campaign_id, metric_type), delta in sorted(deltas.items()):
+        _add_to_total(db, user_id, campaign_id, metric_type, delta)
+
+    rows = (
+        db.query(CampaignMetricTotal.campaign_id, CampaignMetricTotal.metric_type, CampaignMetricTotal.total)
+        .filter(
+            CampaignMetricTotal.campaign_id.in_({campaign_id for campaign_id, _ in deltas}),
+            CampaignMetricTotal.metric_type.in_({metric_type for _, metric_type in deltas}),
+        )
+    )
+    return {
+        (campaign_id, metric_type): int(total)
+        for campaign_id, metric_type, total in rows
+        if (campaign_id, metric_type) in deltas
+    }
+
+
+def rebuild_rollups(db: Session, campaign_ids: Optional[List[int]] = None) -> int:
+    """Recompute campaign_metric_totals from campaign_analytics (commits).
+
+    Returns the number of rollup rows written.
+    """
+    sums = (
+        db.query(
+            CampaignAnalytics.campaign_id,
+            CampaignAnalytics.metric_type,
+            Project.user_id,
+            func.sum(CampaignAnalytics.value),
+        )
+        .join(Campaign, Campaign.id == CampaignAnalytics.campaign_id)
+        .join(Project, Project.id == Campaign.project_id)
+        .group_by(CampaignAnalytics.campaign_id, CampaignAnalytics.metric_type, Project.user_id)
+    )
+    totals = db.query(CampaignMetricTotal)
+    if campaign_ids is not None:
+        sums = sums.filter(CampaignAnalytics.campaign_id.in_(campaign_ids))
+        totals = totals.filter(CampaignMetricTotal.campaign_id.in_(campaign_ids))
+    rows = [
+        {"campaign_id": campaign_id, "metric_type": metric_type, "user_id": user_id, "total": int(total or 0)}
+        for campaign_id, metric_type, user_id, total in sums
+    ]
+    totals.delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(CampaignMetricTotal), rows)
+    db.commit()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+    from .sharding import shard_sessions
+
+    parser = argparse.ArgumentParser(description="Leaderboard rollup maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild-rollups", help="Recompute campaign_metric_totals")
+    rebuild_parser.add_argument("--shard", type=int, help="Only this shard (default: all)")
+    args = parser.parse_args()
+
+    for shard_id, session_factory in shard_sessions.items():
+        if args.shard is not None and shard_id != args.shard:
+            continue
+        db = session_factory()
+        try:
+            print(f"Shard {shard_id}: {rebuild_rollups(db)} rollup rows")
+        finally:
+            db.close()
@@ -1,8 +1,32 @@
-from fastapi import FastAPI
-from .routes import auth, projects, campaigns, tests
-from authlib.integrations.starlette_client import OAuth
+import anyio.to_thread
+from fastapi import Depends, FastAPI
+from .config.settings import (
+    THREADPOOL_TOKENS,
+    ADMISSION_ENABLED,
+    SEED_FIXTURES,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMITS,
+    RATE_LIMIT_TRUST_FORWARDED,
+    RATE_LIMIT_REDIS_URL,
+    READ_YOUR_WRITES_SECONDS,
+)
+from .ratelimit import RateLimitMiddleware, RedisBucketStore, parse_rules
+from .admission import AdmissionMiddleware, admission_controller, record_queue_wait
+from .database import ReadYourWritesMiddleware, dispose_engines, engine, replica_engine
+from .sharding import dispose_shard_engines, shard_directory
+from .timeline import timeline_cache
+from .dashboard import dashboard_cache
+from .leaderboard import leaderboards, warm_leaderboards
+from .audit import audit_writer
+from .deletion import deletion_worker
+from .routes import auth, projects, campaigns, tests, inbox, timeline, audit, dashboard, analytics, categories, invitations
 from starlette.middleware.sessions import SessionMiddleware
 
+# Embedded SQLite profile (see embedded.py): build the schema before any request
+if engine.dialect.name == "sqlite":
+    from .embedded import prepare_embedded_database
+
+    prepare_embedded_database(seed=SEED_FIXTURES)
 
 app = FastAPI(
     title="Streamseed API",
@@ -14,13 +38,80 @@ app = FastAPI(
 
 # Add middleware
 app.add_middleware(SessionMiddleware, secret_key="your_secret_key")
+# Only needed when GETs can go to a lagging replica
+if replica_engine is not None and READ_YOUR_WRITES_SECONDS > 0:
+    app.add_middleware(ReadYourWritesMiddleware)
+# Added last so it runs first - over-limit requests never reach routing, the DB or bcrypt
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=parse_rules(RATE_LIMITS),
+        store=RedisBucketStore(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else None,
+        trust_forwarded=RATE_LIMIT_TRUST_FORWARDED,
+        verify_token=auth.verified_user_id,
+    )
+# Outermost: while the threadpool is overloaded, shed before doing any work
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
+# Include the routers from the auth and campaigns modules. record_queue_wait
+# runs first on every route to measure the wait for a threadpool thread.
+queue_wait = [Depends(record_queue_wait)]
+app.include_router(auth.router, dependencies=queue_wait)
+app.include_router(projects.router, dependencies=queue_wait)
+app.include_router(campaigns.router, dependencies=queue_wait)
+app.include_router(tests.router, dependencies=queue_wait)
+app.include_router(inbox.router, dependencies=queue_wait)
+app.include_router(timeline.router, dependencies=queue_wait)
+app.include_router(audit.router, dependencies=queue_wait)
+app.include_router(dashboard.router, dependencies=queue_wait)
+app.include_router(analytics.router, dependencies=queue_wait)
+app.include_router(categories.router, dependencies=queue_wait)
+app.include_router(invitations.router, dependencies=queue_wait)
+
+@app.on_event("startup")
+async def configure_threadpool():
+    # Sync endpoints run on AnyIO's default threadpool - size it from config
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TOKENS
+
+@app.on_event("startup")
+async def load_leaderboards():
+    # Every tenant's top-k from the rollups, so the first reads are served from memory
+    await anyio.to_thread.run_sync(warm_leaderboards)
 
-# Include the routers from the auth and campaigns modules
-app.include_router(auth.router)
-app.include_router(projects.router)
-app.include_router(campaigns.router)
-app.include_router(tests.router)
+@app.on_event("shutdown")
+async def close_connections():
+    from .outbound import close_outbound_transport
+
+    await close_outbound_transport()
+    audit_writer.stop()  # Write out queued audit entries before the engines go
+    deletion_worker.stop()  # Unfinished purges are resumed by python -m api.deletion
+    dispose_shard_engines()
+    dispose_engines()
+
+# Called by gunicorn's post_fork hook (gunicorn_conf.py). The app is preloaded in
+# the master, so drop anything a worker must not share with its siblings.
+def reset_after_fork():
+    from .outbound import reset_outbound_transport
+
+    dispose_engines(close=False)  # Never reuse the parent's pooled sockets
+    dispose_shard_engines(close=False)
+    shard_directory.invalidate()
+    timeline_cache.invalidate()
+    dashboard_cache.invalidate()
+    leaderboards.invalidate()
+    admission_controller.reset()
+    audit_writer.reset()
+    deletion_worker.reset()
+    auth.reset_oauth()
+    reset_outbound_transport()
 
 @app.get("/")
 def read_root():
-    return {"message": "Hello World"}   
+    return {"message": "Hello World"}
+
+# Endpoint for load balancer / container health checks. async so it never
+# waits for a threadpool thread; reports this worker's queueing
+@app.get("/health")
+async def read_health():
+    return {"status": "ok", "admission": admission_controller.stats()}   
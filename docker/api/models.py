@@ -3,7 +3,9 @@
 from sqlalchemy import (
     Column,
     Integer,
+    BigInteger,
     String,
+    CHAR,
     Boolean,
     Enum,
     TIMESTAMP,
@@ -15,6 +17,7 @@ from sqlalchemy import (
     Date,
     JSON,
     Float,
+    Index,
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -54,8 +57,8 @@ class Session(Base):
     __tablename__ = "users_sessions"
     
     session_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    session_token = Column(String(255), unique=True, index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    session_token = Column(String(255), unique=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)
     platform = Column(String(50), nullable=False)
@@ -65,17 +68,53 @@ class Session(Base):
     user = relationship("User", back_populates="sessions")
 
 
+class TenantShard(Base):
+    __tablename__ = "tenant_shards"
+
+    # Directory of which shard holds a user's projects/campaigns. Lives on the
+    # primary; users without a row are on shard 0 (the primary itself).
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    shard_id = Column(Integer, nullable=False, default=0)
+    migrating = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    # Only a SHA-256 of the token is stored. Tokens rotate on every use; all
+    # tokens issued from one login share a family_id so reuse of an already
+    # rotated token can revoke the whole family.
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(CHAR(64), unique=True, nullable=False)
+    family_id = Column(CHAR(32), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+    user = relationship("User")
+
+
 class Project(Base):
     __tablename__ = "projects"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(255), nullable=False)
     description = Column(Text)
     # Removed the status column
     # status = Column(Enum('active', 'inactive', 'completed'), default='active')
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    # Set when an asynchronous delete starts; the project is hidden from reads
+    # from then on while api/deletion.py removes its children in batches
+    deleted_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_user_deleted', 'user_id', 'deleted_at'),
+    )
     
     # Relationship with campaigns
     campaigns = relationship("Campaign", back_populates="project")
@@ -84,11 +123,52 @@ class Project(Base):
     user = relationship("User", back_populates="projects")
 
 
+class ProjectDeletion(Base):
+    __tablename__ = "project_deletions"
+
+    # Progress of an asynchronous project delete. Lives on the tenant's shard
+    # next to the project and outlives it, so clients can poll until "done".
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    status = Column(Enum('pending', 'running', 'done', 'failed'), nullable=False, default='pending', index=True)
+    campaigns_total = Column(Integer, nullable=False, default=0)
+    campaigns_deleted = Column(Integer, nullable=False, default=0)
+    rows_deleted = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+
+    # Append-only history of campaign/project changes, written in batches by
+    # api/audit.py. Global (primary database) like users: rows outlive the
+    # resources they describe and don't move with a tenant between shards.
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    resource_type = Column(Enum('campaign', 'project'), nullable=False)
+    resource_id = Column(Integer, nullable=False)
+    action = Column(Enum('create', 'update', 'delete'), nullable=False)
+    # {field: [before, after]}
+    changes = Column(JSON, nullable=False)
+    reason = Column(Text)
+    user_id = Column(Integer, nullable=True)
+    # When the change was committed, not when the batch was written
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # History reads: one resource, newest first, keyset-paginated by id
+        Index('idx_audit_resource', 'resource_type', 'resource_id', 'id'),
+    )
+
+
 class Campaign(Base):
     __tablename__ = "campaigns"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"), nullable=False)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
     name = Column(String(255), nullable=False)
     description = Column(Text)
     requirements = Column(Text)
@@ -99,17 +179,24 @@ class Campaign(Base):
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
-    # Relationships
+    __table_args__ = (
+        # Backs the computed-status filters (date-range predicates per project)
+        Index('idx_project_dates', 'project_id', 'start_date', 'end_date'),
+        Index('idx_project_end_date', 'project_id', 'end_date'),
+    )
+
+    # Relationships. Child rows go with the campaign through ON DELETE CASCADE;
+    # passive_deletes stops the ORM from nulling their campaign_id first
     project = relationship("Project", back_populates="campaigns")
-    campaign_creators = relationship("CampaignCreator", back_populates="campaign")
-    analytics = relationship("CampaignAnalytics", back_populates="campaign")
+    campaign_creators = relationship("CampaignCreator", back_populates="campaign", passive_deletes=True)
+    analytics = relationship("CampaignAnalytics", back_populates="campaign", passive_deletes=True)
 
 
 class Creator(Base):
     __tablename__ = "creators"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     bio = Column(Text)
     social_links = Column(JSON)
     rating = Column(Float, default=0)
@@ -124,40 +211,86 @@ class CampaignCreator(Base):
     __tablename__ = "campaign_creators"
 
     id = Column(Integer, primary_key=True, index=True)
-    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=False)
-    creator_id = Column(Integer, ForeignKey("creators.id"), nullable=False)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False, index=True)
+    creator_id = Column(Integer, ForeignKey("creators.id", ondelete="CASCADE"), nullable=False, index=True)
     status = Column(Enum('invited', 'accepted', 'rejected'), default='invited')
     created_at = Column(TIMESTAMP, server_default=func.now())
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # A creator is invited to a campaign once (duplicate invitations are skipped)
+        UniqueConstraint('campaign_id', 'creator_id', name='uq_campaign_creator'),
+    )
+
     # Relationships
     campaign = relationship("Campaign", back_populates="campaign_creators")
     creator = relationship("Creator", back_populates="campaign_creators")
 
 
+class CampaignInvitationCount(Base):
+    __tablename__ = "campaign_invitation_counts"
+
+    # Invitation funnel of a campaign: campaign_creators rows per status, kept
+    # in step by invitations.py so the funnel is one row instead of a GROUP BY
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False, unique=True)
+    invited = Column(Integer, nullable=False, default=0)
+    accepted = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
 class CampaignAnalytics(Base):
     __tablename__ = "campaign_analytics"
 
     id = Column(Integer, primary_key=True, index=True)
-    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=False)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
     metric_type = Column(String(255), nullable=False)
     value = Column(Integer, nullable=False)
     recorded_at = Column(TIMESTAMP, server_default=func.now())
 
+    __table_args__ = (
+        # Per-campaign metric series: filter by campaign + metric, range/sort on time
+        Index('idx_campaign_metric_time', 'campaign_id', 'metric_type', 'recorded_at'),
+    )
+
     # Relationship
     campaign = relationship("Campaign", back_populates="analytics")
 
 
+class CampaignMetricTotal(Base):
+    __tablename__ = "campaign_metric_totals"
+
+    # Rollup of SUM(campaign_analytics.value) per campaign and metric, kept in
+    # step by the analytics ingest (see leaderboard.py). user_id is the
+    # campaign's owner, copied here so a tenant's leaderboard is one index range.
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
+    metric_type = Column(String(255), nullable=False)
+    user_id = Column(Integer, nullable=False)
+    total = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'metric_type', name='uq_campaign_metric'),
+        Index('idx_user_metric_total', 'user_id', 'metric_type', 'total'),
+    )
+
+
 class Message(Base):
     __tablename__ = "messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    receiver_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    sender_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    receiver_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
     status = Column(Enum('read', 'unread'), default='unread')
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    __table_args__ = (
+        Index('idx_receiver_status', 'receiver_id', 'status'),
+    )
+
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
@@ -167,21 +300,36 @@ class Notification(Base):
     __tablename__ = "notifications"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
     status = Column(Enum('read', 'unread'), default='unread')
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    __table_args__ = (
+        Index('idx_user_status', 'user_id', 'status'),
+    )
+
     # Relationship
     user = relationship("User", back_populates="notifications")
 
 
+class UserCounter(Base):
+    __tablename__ = "user_counters"
+
+    # One row per user, kept in step with messages/notifications so badge
+    # counts are a primary-key lookup instead of a COUNT(*) per page load
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    unread_messages = Column(Integer, nullable=False, default=0)
+    unread_notifications = Column(Integer, nullable=False, default=0)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
 class Rating(Base):
     __tablename__ = "ratings"
 
     id = Column(Integer, primary_key=True, index=True)
-    campaign_id = Column(Integer, ForeignKey("campaigns.id"), nullable=False)
-    creator_id = Column(Integer, ForeignKey("creators.id"), nullable=False)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False, index=True)
+    creator_id = Column(Integer, ForeignKey("creators.id", ondelete="CASCADE"), nullable=False, index=True)
     rating = Column(Float, nullable=False)
     comment = Column(Text)
     created_at = Column(TIMESTAMP, server_default=func.now())
@@ -197,5 +345,50 @@ class Category(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)
     description = Column(Text)
+    # Number of creators tagged with the category, kept in step by categories.py
+    creator_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+
+class CampaignCategory(Base):
+    __tablename__ = "campaign_categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    campaign_id = Column(Integer, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=False)
+    # No foreign key: categories live on the primary, this table on the
+    # tenant's shard. Routes validate the ids against the primary
+    category_id = Column(Integer, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'category_id', name='uq_campaign_category'),
+        # Category filter: campaign ids for a category
+        Index('idx_category_campaign', 'category_id', 'campaign_id'),
+    )
+
+
+class CreatorCategory(Base):
+    __tablename__ = "creator_categories"
+
+    id = Column(Integer, primary_key=True, index=True)
+    creator_id = Column(Integer, ForeignKey("creators.id", ondelete="CASCADE"), nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('creator_id', 'category_id', name='uq_creator_category'),
+        Index('idx_category_creator', 'category_id', 'creator_id'),
+    )
+
+
+class CampaignCategoryCount(Base):
+    __tablename__ = "campaign_category_counts"
+
+    # Facet counts for a tenant's campaign browsing: live campaigns (not in a
+    # deleted project) per category, kept in step by categories.py so facets
+    # are one index range instead of a GROUP BY per request
+    user_id = Column(Integer, primary_key=True)
+    category_id = Column(Integer, primary_key=True)  # On the primary, like user_id - no foreign key
+    campaign_count = Column(Integer, nullable=False, default=0)
     updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,77 @@
+# outbound.py
+#
+# Shared, pooled HTTP transport for outbound calls (OAuth token exchange and
+# userinfo). authlib opens and closes a fresh httpx client for every call; by
+# handing each of those clients the same transport, connections to the
+# providers are kept alive and reused instead of re-handshaking TLS per login.
+
+import threading
+
+import httpx
+
+from .config.settings import (
+    OUTBOUND_CONNECT_TIMEOUT,
+    OUTBOUND_TIMEOUT,
+    OUTBOUND_MAX_CONNECTIONS,
+    OUTBOUND_MAX_KEEPALIVE,
+)
+
+
+class SharedAsyncTransport(httpx.AsyncBaseTransport):
+    """Connection pool that survives the clients using it.
+
+    Wraps the transport that does the work (normally an AsyncHTTPTransport
+    pool; tests pass an httpx.MockTransport). httpx closes a client's
+    transport when the client is closed; this wrapper ignores that so the pool
+    outlives each short-lived client. The pool itself is closed by
+    close_outbound_transport() on shutdown.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self.transport.handle_async_request(request)
+
+    async def __aexit__(self, exc_type=None, exc_value=None, traceback=None):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def close_pool(self):
+        await self.transport.aclose()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+OUTBOUND_TIMEOUTS = httpx.Timeout(OUTBOUND_TIMEOUT, connect=OUTBOUND_CONNECT_TIMEOUT)
+
+
+def get_outbound_transport() -> SharedAsyncTransport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = SharedAsyncTransport(httpx.AsyncHTTPTransport(
+                    limits=httpx.Limits(
+                        max_connections=OUTBOUND_MAX_CONNECTIONS,
+                        max_keepalive_connections=OUTBOUND_MAX_KEEPALIVE,
+                    ),
+                    retries=1,
+                ))
+    return _transport
+
+
+async def close_outbound_transport():
+    global _transport
+    transport, _transport = _transport, None
+    if transport is not None:
+        await transport.close_pool()
+
+
+def reset_outbound_transport():
+    """Forget the inherited pool after fork; each worker opens its own."""
+    global _transport
+    _transport = None
@@ -0,0 +1,219 @@
+# ratelimit.py
+#
+# Token-bucket rate limiting as plain ASGI middleware. Requests over the limit
+# are answered with 429 before routing, so no DB query or password hashing
+# happens for them. Buckets live in-process by default (a dict lookup and a
+# few float operations per check); RATE_LIMIT_REDIS_URL switches to a shared
+# Redis store so limits hold across workers and containers.
+#
+# "user" rules key on the uid claim of a verified access token, so every token
+# a user holds shares one bucket and a forged or expired token can't open a
+# fresh one; requests without a valid token fall back to the client IP.
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    method: str
+    path: str
+    capacity: int  # burst size / requests per period
+    period: float  # seconds to refill the bucket completely
+    principal: str  # "ip" or "user"
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period
+
+
+def parse_rules(specs) -> List[RateLimitRule]:
+    """Parse "<METHOD> <path>=<requests>/<seconds>:<ip|user>" strings."""
+    rules = []
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
+            continue
+        target, _, limit = spec.partition("=")
+        method, _, path = target.strip().partition(" ")
+        amount, _, principal = limit.partition(":")
+        requests, _, seconds = amount.partition("/")
+        principal = principal.strip() or "ip"
+        if principal not in ("ip", "user"):
+            raise ValueError(f"Invalid rate limit principal in {spec!r}")
+        rules.append(RateLimitRule(method.upper(), path.strip(), int(requests), float(seconds), principal))
+    return rules
+
+
+class InMemoryBucketStore:
+    """Per-process token buckets: key -> [tokens, last_refill], least recently used first."""
+
+    is_async = False
+    MAX_KEYS = 100000
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def take(self, key: str, capacity: int, refill_per_second: float, now: float) -> Tuple[bool, float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                # The least recently used bucket is the likeliest to have refilled
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = [capacity, now]
+        else:
+            self._buckets.move_to_end(key)
+        tokens = bucket[0] + (now - bucket[1]) * refill_per_second
+        if tokens > capacity:
+            tokens = capacity
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True, tokens - 1
+        bucket[0] = tokens
+        return False, tokens
+
+
+class RedisBucketStore:
+    """Token buckets shared through Redis (requires the optional redis package)."""
+
+    is_async = True
+
+    # KEYS[1] bucket key; ARGV capacity, refill/s, now. Returns {allowed, tokens*1000}
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local capacity = tonumber(ARGV[1])
+    local refill = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - last) * refill)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+    return {allowed, math.floor(tokens * 1000)}
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def take(self, key: str, capacity: int, refill_per_second: float, now: float) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[f"ratelimit:{key}"], args=[capacity, refill_per_second, now])
+        return bool(allowed), tokens / 1000
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app,
+        rules: List[RateLimitRule],
+        store=None,
+        trust_forwarded: bool = False,
+        verify_token: Optional[Callable[[str], Optional[int]]] = None,
+    ):
+        self.app = app
+        self.store = store or InMemoryBucketStore()
+        self.trust_forwarded = trust_forwarded
+        # Bearer token -> user id, or None when the token doesn't verify
+        self.verify_token = verify_token
+        # Exact (method, path) rules are a dict hit; wildcard rules are few
+        self.exact: Dict[Tuple[str, str], List[RateLimitRule]] = {}
+        self.wildcard: List[RateLimitRule] = []
+        for rule in rules:
+            if rule.method == "*" or rule.path == "*":
+                self.wildcard.append(rule)
+            else:
+                self.exact.setdefault((rule.method, rule.path), []).append(rule)
+
+    def _matching_rules(self, method: str, path: str) -> List[RateLimitRule]:
+        rules = self.exact.get((method, path), [])
+        if self.wildcard:
+            rules = rules + [
+                rule for rule in self.wildcard
+                if rule.method in ("*", method) and rule.path in ("*", path)
+            ]
+        return rules
+
+    def _user_id(self, headers) -> Optional[int]:
+        authorization = headers.get(b"authorization")
+        if not authorization or self.verify_token is None:
+            return None
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return self.verify_token(token.strip())
+
+    def _principal(self, scope, headers, rule: RateLimitRule, user_id: Optional[int]) -> Optional[str]:
+        if rule.principal == "user" and user_id is not None:
+            return f"user:{user_id}"
+        if self.trust_forwarded and b"x-forwarded-for" in headers:
+            return "ip:" + headers[b"x-forwarded-for"].split(b",")[0].strip().decode("latin-1")
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rules = self._matching_rules(scope["method"], scope["path"])
+        if not rules:
+            await self.app(scope, receive, send)
+            return
+
+        now = time.time()
+        request_headers = dict(scope["headers"])
+        # The most constrained matching rule decides the response headers
+        limit_headers = None
+        user_id = self._user_id(request_headers) if any(rule.principal == "user" for rule in rules) else None
+        for rule in rules:
+            principal = self._principal(scope, request_headers, rule, user_id)
+            if principal is None:
+                continue
+            key = f"{rule.method} {rule.path}|{principal}"
+            if self.store.is_async:
+                allowed, tokens = await self.store.take(key, rule.capacity, rule.refill_per_second, now)
+            else:
+                allowed, tokens = self.store.take(key, rule.capacity, rule.refill_per_second, now)
+            reset = math.ceil((rule.capacity - tokens) / rule.refill_per_second)
+            headers = [
+                (b"ratelimit-limit", str(rule.capacity).encode()),
+                (b"ratelimit-remaining", str(int(tokens)).encode()),
+                (b"ratelimit-reset", str(reset).encode()),
+            ]
+            if not allowed:
+                retry_after = max(1, math.ceil((1 - tokens) / rule.refill_per_second))
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": headers + [
+                        (b"retry-after", str(retry_after).encode()),
+                        (b"content-type", b"application/json"),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": b'{"detail":"Too many requests"}'})
+                return
+            if limit_headers is None or tokens < limit_headers[0]:
+                limit_headers = (tokens, headers)
+
+        if limit_headers is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + limit_headers[1]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,100 @@
+# routes/analytics.py
+
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+from ..dashboard import dashboard_cache
+from ..leaderboard import LEADERBOARD_SIZE, LeaderboardEntry, leaderboards, load_top_campaigns, record_analytics
+from ..models import Campaign, Project, User
+from .auth import get_current_user, get_tenant_db
+
+router = APIRouter()
+
+# Maximum number of events accepted by one ingest request
+MAX_ANALYTICS_EVENTS = 1000
+
+# Pydantic models for request and response validation
+
+class AnalyticsEvent(BaseModel):
+    campaign_id: int
+    metric_type: str = Field(..., min_length=1, max_length=255, example="views")
+    value: int = Field(..., ge=0)  # Totals only grow - the leaderboard relies on it
+    recorded_at: Optional[datetime] = None
+
+class AnalyticsIngestRequest(BaseModel):
+    events: List[AnalyticsEvent] = Field(..., min_length=1, max_length=MAX_ANALYTICS_EVENTS)
+
+class AnalyticsIngestResponse(BaseModel):
+    recorded: int
+
+class LeaderboardEntryResponse(BaseModel):
+    rank: int
+    campaign_id: int
+    campaign_name: str
+    project_id: int
+    total: int
+
+class LeaderboardResponse(BaseModel):
+    metric_type: str
+    entries: List[LeaderboardEntryResponse]
+
+# Endpoint to record analytics events for the user's campaigns
+@router.post("/analytics", response_model=AnalyticsIngestResponse, tags=["analytics"])
+def ingest_analytics(
+    payload: AnalyticsIngestRequest,
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    campaign_ids = {event.campaign_id for event in payload.events}
+    campaigns = {
+        campaign_id: (name, project_id)
+        for campaign_id, name, project_id in (
+            db.query(Campaign.id, Campaign.name, Campaign.project_id)
+            .join(Project)
+            .filter(Campaign.id.in_(campaign_ids), Project.user_id == current_user.id, Project.deleted_at.is_(None))
+        )
+    }
+    missing = sorted(campaign_ids - campaigns.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Campaigns not found: {missing}")
+
+    totals = record_analytics(db, current_user.id, [event.model_dump() for event in payload.events])
+    db.commit()
+
+    leaderboards.record(current_user.id, [
+        (metric_type, LeaderboardEntry(campaign_id, *campaigns[campaign_id], total))
+        for (campaign_id, metric_type), total in totals.items()
+    ])
+    dashboard_cache.invalidate(current_user.id)
+    return AnalyticsIngestResponse(recorded=len(payload.events))
+
+# Endpoint to get the user's campaigns with the largest totals for a metric.
+# Served from the worker's in-memory top-k; see leaderboard.py
+@router.get("/leaderboard", response_model=LeaderboardResponse, tags=["analytics"])
+def read_leaderboard(
+    metric: str = Query(..., min_length=1, max_length=255),
+    limit: int = Query(10, ge=1, le=LEADERBOARD_SIZE),
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    entries = leaderboards.top(
+        current_user.id,
+        metric,
+        limit,
+        lambda: load_top_campaigns(db, leaderboards.k, current_user.id),
+    )
+    return LeaderboardResponse(
+        metric_type=metric,
+        entries=[
+            LeaderboardEntryResponse(
+                rank=rank,
+                campaign_id=entry.campaign_id,
+                campaign_name=entry.campaign_name,
+                project_id=entry.project_id,
+                total=entry.total,
+            )
+            for rank, entry in enumerate(entries, start=1)
+        ],
+    )
@@ -0,0 +1,68 @@
+# routes/audit.py
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from ..audit import read_history, resource_owner_id
+from ..database import get_db
+from ..models import User
+from .auth import get_current_user, get_tenant_db
+
+router = APIRouter()
+
+MAX_HISTORY_PAGE = 200
+
+# Pydantic models for response validation
+
+class AuditEntryResponse(BaseModel):
+    id: int
+    resource_type: str
+    resource_id: int
+    action: str
+    # {field: [before, after]}
+    changes: Dict[str, List[Any]]
+    reason: Optional[str] = None
+    user_id: Optional[int] = None
+    created_at: datetime
+
+    model_config = {
+        "from_attributes": True  # Updated for Pydantic v2
+    }
+
+# Entries are written asynchronously, so a change shows up here within
+# AUDIT_FLUSH_SECONDS of its commit. History is kept after the resource is
+# deleted; pass the smallest id of a page as before_id to get the next one.
+# The owner of a project (or of a campaign's project) sees every change to it,
+# whoever made it.
+
+def owned_history(db: Session, tenant_db: Session, user_id: int, resource_type: str, resource_id: int,
+                  before_id: Optional[int], limit: int):
+    if resource_owner_id(db, tenant_db, resource_type, resource_id) != user_id:
+        raise HTTPException(status_code=404, detail=f"{resource_type.capitalize()} not found")
+    return read_history(db, resource_type, resource_id, before_id, limit)
+
+# Endpoint to get the change history of a campaign, newest first
+@router.get("/campaigns/{campaign_id}/history", response_model=List[AuditEntryResponse], tags=["campaigns"])
+def read_campaign_history(
+    campaign_id: int,
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    db: Session = Depends(get_db),
+    tenant_db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    return owned_history(db, tenant_db, current_user.id, "campaign", campaign_id, before_id, limit)
+
+# Endpoint to get the change history of a project, newest first
+@router.get("/projects/{project_id}/history", response_model=List[AuditEntryResponse], tags=["projects"])
+def read_project_history(
+    project_id: int,
+    before_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=MAX_HISTORY_PAGE),
+    db: Session = Depends(get_db),
+    tenant_db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    return owned_history(db, tenant_db, current_user.id, "project", project_id, before_id, limit)
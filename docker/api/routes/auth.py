@@ -1,22 +1,34 @@
+import hashlib
 import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
+from urllib.parse import urlencode
 from fastapi import APIRouter, HTTPException, Depends, Request, status
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from ..models import User
-from ..database import get_db
+from ..models import User, RefreshToken
+from ..database import READ_METHODS, get_db, get_primary_db
+from ..sharding import shard_directory, shard_sessions
+from ..audit import set_audit_actor
 from pydantic import BaseModel
-from authlib.integrations.starlette_client import OAuth
-from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import RedirectResponse
-from ..config.settings import OAUTH_PROVIDERS
+from ..config.settings import get_oauth_providers
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+
+# passlib/bcrypt, python-jose, authlib and httpx are imported on first use rather than
+# at module import, so workers become ready without paying for them up front.
 
 # Secret key and JWT configuration
 SECRET_KEY = "your_secret_key_here"  # Replace with a secure key
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Access tokens are verified from signature and claims alone (no DB lookup),
+# so keep them short-lived and use refresh tokens for longer sessions
+ACCESS_TOKEN_EXPIRE_MINUTES = 15
+REFRESH_TOKEN_EXPIRE_DAYS = 30
 
 # Create a router with redirect_slashes set to False
 router = APIRouter(
@@ -29,13 +41,20 @@ router = APIRouter(
 #     password: str
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Helper functions
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def hash_password(password):
+    return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -44,49 +63,194 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    from jose import jwt
+
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_user_access_token(user: User):
+    # uid/name let get_current_user build the principal without a query
+    return create_access_token(
+        data={"sub": user.email, "uid": user.id, "name": user.first_name},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def issue_refresh_token(db: Session, user_id: int, family_id: str | None = None) -> str:
+    """Create and store (hashed) a refresh token. Caller commits."""
+    token = secrets.token_urlsafe(48)
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or secrets.token_hex(16),
+        expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+def revoke_refresh_family(db: Session, family_id: str):
+    db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: datetime.utcnow()}, synchronize_session=False)
+
+def token_response(db: Session, user: User, family_id: str | None = None):
+    refresh_token = issue_refresh_token(db, user.id, family_id)
+    db.commit()
+    return {
+        "access_token": create_user_access_token(user),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
 def authenticate_user(db: Session, email: str, password: str):
     user = db.query(User).filter(User.email == email).first()
-    if not user:
+    if not user or not user.password_hash:  # Social accounts have no local password
         return False
     if not verify_password(password, user.password_hash):
         return False
     return user
 
+# Principal built from access-token claims; carries what routes use from User
+@dataclass(frozen=True)
+class TokenUser:
+    id: int
+    email: str
+    first_name: str = ""
+
+class VerifiedTokenCache:
+    """Bounded LRU of access token -> verified claims.
+
+    The rate limiter and get_current_user both need a request's claims; with
+    this the HS256 check runs once per token per worker instead of twice per
+    request. Only tokens that verified are cached; once a token's exp has passed
+    it is decoded (and rejected) again, and its entry ages out of the LRU.
+    """
+
+    def __init__(self, max_tokens: int = 10000):
+        self.max_tokens = max_tokens
+        self._claims: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claims(self, token: str) -> dict | None:
+        # Hits take no lock: OrderedDict's C methods are atomic under the GIL
+        payload = self._claims.get(token)
+        if payload is not None and payload["exp"] > time.time():
+            try:
+                self._claims.move_to_end(token)
+            except KeyError:
+                pass  # Evicted meanwhile - still verified
+            return payload
+
+        from jose import JWTError, jwt
+
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        if isinstance(payload.get("exp"), (int, float)):
+            with self._lock:
+                self._claims[token] = payload
+                if len(self._claims) > self.max_tokens:
+                    self._claims.popitem(last=False)
+        return payload
+
+
+verified_tokens = VerifiedTokenCache()
+
+def verified_user_id(token: str) -> int | None:
+    """uid claim of a valid, unexpired access token; None otherwise. No queries."""
+    payload = verified_tokens.claims(token)
+    uid = payload.get("uid") if payload else None
+    return uid if isinstance(uid, int) else None
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+    payload = verified_tokens.claims(token)
+    if payload is None:
         raise credentials_exception
+    email: str = payload.get("sub")
+    if email is None:
+        raise credentials_exception
+    # Stateless path: no auth queries for tokens issued with a uid claim
+    if payload.get("uid") is not None:
+        return TokenUser(id=payload["uid"], email=email, first_name=payload.get("name") or "")
+    # Tokens issued before uid claims existed still resolve through the DB
     user = db.query(User).filter(User.email == email).first()
     if user is None:
         raise credentials_exception
     return user
 
-# Initialize OAuth
-oauth = OAuth()
-
-# Register each OAuth provider
-for name, details in OAUTH_PROVIDERS.items():
-    oauth.register(
-        name=name,
-        client_id=details['client_id'],
-        client_secret=details['client_secret'],
-        authorize_url=details['authorize_url'],
-        access_token_url=details['access_token_url'],
-        redirect_uri=details['redirect_uri'],
-        client_kwargs={'scope': details['scope']}
-    )
+# Session on the shard that holds the current user's projects/campaigns.
+# Shard 0 is the primary, so unsharded deployments keep using get_db's session
+# (and its read-replica routing).
+def get_tenant_db(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    assignment = shard_directory.lookup(db, current_user.id)
+    if assignment.migrating and request.method not in READ_METHODS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Account data is being migrated, please retry shortly",
+            headers={"Retry-After": "30"},
+        )
+    if assignment.shard_id == 0:
+        set_audit_actor(db, current_user.id)
+        yield db
+        return
+
+    tenant_db = shard_sessions[assignment.shard_id]()
+    set_audit_actor(tenant_db, current_user.id)
+    try:
+        yield tenant_db
+    finally:
+        tenant_db.close()
+
+# OAuth registry, built on first use by get_oauth()
+_oauth = None
+_oauth_lock = threading.Lock()
+
+def get_oauth():
+    global _oauth
+    if _oauth is None:
+        with _oauth_lock:
+            if _oauth is None:
+                from authlib.integrations.starlette_client import OAuth
+                from ..outbound import OUTBOUND_TIMEOUTS, get_outbound_transport
+
+                oauth = OAuth()
+                # Register each OAuth provider
+                for name, details in get_oauth_providers().items():
+                    oauth.register(
+                        name=name,
+                        client_id=details['client_id'],
+                        client_secret=details['client_secret'],
+                        authorize_url=details['authorize_url'],
+                        access_token_url=details['access_token_url'],
+                        userinfo_endpoint=details['userinfo_endpoint'],
+                        redirect_uri=details['redirect_uri'],
+                        client_kwargs={
+                            'scope': details['scope'],
+                            # Every provider call reuses one keep-alive pool
+                            'transport': get_outbound_transport(),
+                            'timeout': OUTBOUND_TIMEOUTS,
+                        }
+                    )
+                _oauth = oauth
+    return _oauth
+
+def reset_oauth():
+    """Forget the OAuth registry so it is rebuilt in this process (after fork)."""
+    global _oauth
+    _oauth = None
 
 # Pydantic model for registration
 class UserCreate(BaseModel):
@@ -108,7 +272,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered.")
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = hash_password(user.password)
     
     new_user = User(
         email=user.email,
@@ -136,11 +300,59 @@ def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2Passw
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    return token_response(db, user)
+
+# Pydantic model for refresh/revoke requests
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+# Exchange a refresh token for a new access token and a rotated refresh token
+@router.post("/token/refresh", tags=["auth"])
+def refresh_access_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    stored = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+        .with_for_update()
+        .first()
+    )
+    if stored is None:
+        raise credentials_exception
+
+    if stored.used_at is not None or stored.revoked_at is not None:
+        # Reuse of a rotated/revoked token: assume it leaked and kill the family
+        revoke_refresh_family(db, stored.family_id)
+        db.commit()
+        raise credentials_exception
+
+    if stored.expires_at < datetime.utcnow():
+        raise credentials_exception
+
+    user = db.query(User).filter(User.id == stored.user_id).first()
+    if user is None or not user.is_active:
+        revoke_refresh_family(db, stored.family_id)
+        db.commit()
+        raise credentials_exception
+
+    stored.used_at = datetime.utcnow()
+    return token_response(db, user, family_id=stored.family_id)
+
+# Log out: revoke the refresh token's whole family
+@router.post("/token/revoke", tags=["auth"])
+def revoke_refresh_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    stored = (
+        db.query(RefreshToken)
+        .filter(RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+        .first()
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    if stored is not None:
+        revoke_refresh_family(db, stored.family_id)
+        db.commit()
+    return {"success": True}
 
 ######## commented out as Body doesnt import for some reason - reverted the above logic
 # @router.post("/token", tags=["auth"])
@@ -173,37 +385,56 @@ def login_for_access_token(db: Session = Depends(get_db), form_data: OAuth2Passw
 #     )
 #     return {"access_token": access_token, "token_type": "bearer"}
 
-# OAuth login route
-@router.get('/auth/{provider}', tags=["auth"])
-async def oauth_login(request: Request, provider: str):
-    redirect_uri = request.url_for(f'{provider}_callback')
-    return await oauth.create_client(provider).authorize_redirect(request, redirect_uri)
+def get_oauth_client(provider: str):
+    client = get_oauth().create_client(provider)
+    if client is None:
+        raise HTTPException(status_code=404, detail="Unknown OAuth provider")
+    return client
 
-# OAuth callback route
-@router.route('/auth/{provider}/callback')
-async def oauth_callback(request: Request, provider: str, db: Session = Depends(get_db)):
-    client = oauth.create_client(provider)
-    token = await client.authorize_access_token(request)
-    user_info = await client.userinfo()
-
-    user = db.query(User).filter(User.social_id == user_info['id'], User.auth_provider == provider).first()
+# Runs in the threadpool - never call this directly from an async endpoint
+def get_or_create_social_user(db: Session, provider: str, user_info: dict) -> User:
+    # Google's OpenID userinfo uses "sub", Facebook's Graph API uses "id"
+    social_id = user_info.get('id') or user_info.get('sub')
+    if not social_id:
+        raise HTTPException(status_code=400, detail="OAuth provider did not return an account id")
+    social_id = str(social_id)
+    user = db.query(User).filter(User.social_id == social_id, User.auth_provider == provider).first()
 
     if not user:
         user = User(
             email=user_info.get('email'),
-            first_name=user_info.get('given_name', ''),
-            last_name=user_info.get('family_name', ''),
+            password_hash="",  # No local password for social accounts
+            first_name=user_info.get('given_name') or user_info.get('first_name', ''),
+            last_name=user_info.get('family_name') or user_info.get('last_name', ''),
             auth_provider=provider,
-            social_id=user_info['id'],
+            social_id=social_id,
             is_active=True,
         )
         db.add(user)
         db.commit()
         db.refresh(user)
+    return user
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
+# OAuth login route
+@router.get('/auth/{provider}', tags=["auth"])
+async def oauth_login(request: Request, provider: str):
+    client = get_oauth_client(provider)
+    redirect_uri = request.url_for('oauth_callback', provider=provider)
+    return await client.authorize_redirect(request, redirect_uri)
+
+# OAuth callback route
+@router.get('/auth/{provider}/callback', tags=["auth"], name="oauth_callback")
+async def oauth_callback(request: Request, provider: str, db: Session = Depends(get_primary_db)):
+    client = get_oauth_client(provider)
+    # Provider calls are awaited on the shared pool; the blocking DB work is
+    # pushed to the threadpool so it never stalls the event loop
+    token = await client.authorize_access_token(request)
+    user_info = await client.userinfo(token=token)
+
+    user = await run_in_threadpool(get_or_create_social_user, db, provider, dict(user_info))
+    # Same tokens as /token: an access token plus the first refresh token of a
+    # new family. They go in the fragment, which browsers never send to a
+    # server, so the long-lived refresh token stays out of access logs
+    tokens = await run_in_threadpool(token_response, db, user)
 
-    return RedirectResponse(url=f'/?token={access_token}')
+    return RedirectResponse(url=f'/#{urlencode(tokens)}')
@@ -2,20 +2,15 @@ import secrets
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Depends, Request
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from ..models import User, Session as SessionModel
 from ..database import get_db
 from pydantic import BaseModel
-from authlib.integrations.starlette_client import OAuth
-from starlette.middleware.sessions import SessionMiddleware
 from starlette.responses import RedirectResponse
-from ..config.settings import OAUTH_PROVIDERS
 from fastapi.security import OAuth2PasswordBearer
+from .auth import get_oauth, hash_password, verify_password
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -35,21 +30,6 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     
     return user
 
-# Initialize OAuth
-oauth = OAuth()
-
-# Register each OAuth provider
-for name, details in OAUTH_PROVIDERS.items():
-    oauth.register(
-        name=name,
-        client_id=details['client_id'],
-        client_secret=details['client_secret'],
-        authorize_url=details['authorize_url'],
-        access_token_url=details['access_token_url'],
-        redirect_uri=details['redirect_uri'],
-        client_kwargs={'scope': details['scope']}
-    )
-
 # Pydantic model for registration
 class UserCreate(BaseModel):
     email: str
@@ -71,7 +51,7 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Email already registered.")
 
     # Hash the password
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = hash_password(user.password)
     
     # Create a new user instance
     new_user = User(
@@ -97,7 +77,7 @@ def login_user(user: UserLogin, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="User does not exist.")
 
     # Verify the password
-    if not pwd_context.verify(user.password, existing_user.password_hash):
+    if not verify_password(user.password, existing_user.password_hash):
         raise HTTPException(status_code=400, detail="Incorrect password.")
     
     # Generate a unique session token
@@ -124,12 +104,12 @@ def login_user(user: UserLogin, db: Session = Depends(get_db)):
 @router.get('/auth/{provider}', tags=["auth"])
 async def oauth_login(request: Request, provider: str):
     redirect_uri = request.url_for(f'{provider}_callback')
-    return await oauth.create_client(provider).authorize_redirect(request, redirect_uri)
+    return await get_oauth().create_client(provider).authorize_redirect(request, redirect_uri)
 
 # OAuth callback route
 @router.route('/auth/{provider}/callback')
 async def oauth_callback(request: Request, provider: str, db: Session = Depends(get_db)):
-    client = oauth.create_client(provider)
+    client = get_oauth().create_client(provider)
     token = await client.authorize_access_token(request)
     user_info = await client.userinfo()
 
@@ -1,12 +1,19 @@
 # routes/campaigns.py
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from ..models import Campaign, User, Project
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import and_, case, func
+from ..models import Campaign, CampaignCategory, User, Project
+from ..timeline import timeline_cache
+from ..dashboard import dashboard_cache
+from ..leaderboard import leaderboards
+from ..audit import set_audit_reason
+from ..categories import campaign_facets, forget_campaign_categories
 from ..database import get_db
-from .auth import get_current_user
+from .auth import get_current_user, get_tenant_db
+from .categories import CategoryFacet, category_facets
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import date
 
 router = APIRouter()
@@ -21,16 +28,18 @@ class CampaignCreate(BaseModel):
     start_date: date
     end_date: date
 
+# Fields other than id are optional so endpoints can return sparse fieldsets
+# (?fields=...); unrequested fields are left unset and excluded from the JSON
 class CampaignResponse(BaseModel):
     id: int
-    name: str
-    description: str
-    project_id: int
-    project_name: str  # New field for Project Name
-    requirements: str
-    start_date: date
-    end_date: date
-    computed_status: str  # Dynamically computed status
+    name: Optional[str] = None
+    description: Optional[str] = None
+    project_id: Optional[int] = None
+    project_name: Optional[str] = None  # New field for Project Name
+    requirements: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    computed_status: Optional[str] = None  # Dynamically computed status
 
     model_config = {
         "from_attributes": True  # Updated for Pydantic v2
@@ -58,6 +67,27 @@ class DeleteCampaignResponse(BaseModel):
     success: bool
     reason: Optional[str] = None
 
+# Response model for batch reads - missing/foreign ids map to null
+class CampaignBatchResponse(BaseModel):
+    results: Dict[int, Optional[CampaignResponse]]
+    not_found: List[int]
+
+# Response model for search - facets count every live campaign of the user per
+# category, whatever the other filters
+class CampaignSearchResponse(BaseModel):
+    results: List[CampaignResponse]
+    facets: List[CategoryFacet]
+
+# Maximum number of ids accepted by the batch read endpoints
+MAX_BATCH_IDS = 100
+
+# Sparse fieldsets - large Text columns are left out of list views by default
+CAMPAIGN_FIELDS = tuple(CampaignResponse.model_fields)
+CAMPAIGN_LARGE_FIELDS = ("description", "requirements")
+CAMPAIGN_LIST_FIELDS = tuple(field for field in CAMPAIGN_FIELDS if field not in CAMPAIGN_LARGE_FIELDS)
+
+CAMPAIGN_STATUSES = ("Pending", "Live", "Completed")
+
 # Helper function to compute campaign status
 def compute_campaign_status(campaign: Campaign) -> str:
     current_date = date.today()
@@ -68,15 +98,99 @@ def compute_campaign_status(campaign: Campaign) -> str:
     else:
         return "Completed"
 
+# Helper function to express a computed status as SQL date-range predicates.
+# Mirrors compute_campaign_status so the filter can use the
+# (project_id, start_date, end_date) index instead of filtering in Python.
+def campaign_status_filter(status: str, current_date: Optional[date] = None):
+    current_date = current_date or date.today()
+    if status == "Pending":
+        return Campaign.start_date > current_date
+    elif status == "Live":
+        return and_(Campaign.start_date <= current_date, Campaign.end_date >= current_date)
+    elif status == "Completed":
+        return and_(Campaign.start_date <= current_date, Campaign.end_date < current_date)
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid status. Expected one of: {', '.join(CAMPAIGN_STATUSES)}"
+    )
+
+# Helper function to count campaigns per computed status in a single aggregate query
+def campaign_status_counts(query, current_date: Optional[date] = None) -> dict:
+    current_date = current_date or date.today()
+    row = query.with_entities(*[
+        func.coalesce(func.sum(case((campaign_status_filter(status, current_date), 1), else_=0)), 0)
+        for status in CAMPAIGN_STATUSES
+    ]).one()
+    return dict(zip(CAMPAIGN_STATUSES, (int(count) for count in row)))
+
+# Helper function to expose per-status counts alongside a list response
+def set_status_count_headers(response: Response, counts: dict) -> None:
+    for status, count in counts.items():
+        response.headers[f"X-Status-Count-{status}"] = str(count)
+
+# Helper function to de-duplicate and cap the ids of a batch read
+def validate_batch_ids(ids: List[int]) -> List[int]:
+    unique_ids = list(dict.fromkeys(ids))
+    if not unique_ids:
+        raise HTTPException(status_code=400, detail="At least one id is required")
+    if len(unique_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return unique_ids
+
+# Helper function to parse a ?fields=a,b,c parameter; id is always included
+def parse_fields(fields: Optional[str], allowed: tuple, default: tuple) -> set:
+    if fields is None:
+        return set(default)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Expected any of: {', '.join(allowed)}"
+        )
+    return requested | {"id"}
+
+# Helper function to load only the Campaign columns a fieldset needs
+def campaign_load_options(fields: set):
+    columns = {"id"} | {field for field in fields if field in Campaign.__table__.columns}
+    if "computed_status" in fields:
+        columns |= {"start_date", "end_date"}
+    return load_only(*[getattr(Campaign, column) for column in sorted(columns)])
+
+# Helper function to convert Campaign to CampaignResponse
+def campaign_to_response(campaign: Campaign, project_name: str, fields: Optional[set] = None) -> CampaignResponse:
+    if fields is None:
+        return CampaignResponse(
+            id=campaign.id,
+            name=campaign.name,
+            description=campaign.description,
+            project_id=campaign.project_id,
+            project_name=project_name,
+            requirements=campaign.requirements,
+            start_date=campaign.start_date,
+            end_date=campaign.end_date,
+            computed_status=compute_campaign_status(campaign)
+        )
+    # Only touch requested attributes - anything else was deferred by load_only
+    values = {}
+    for field in fields:
+        if field == "project_name":
+            values[field] = project_name
+        elif field == "computed_status":
+            values[field] = compute_campaign_status(campaign)
+        else:
+            values[field] = getattr(campaign, field)
+    return CampaignResponse(**values)
+
 # Endpoint to create a new campaign
 @router.post("/campaigns", response_model=CampaignResponse, tags=["campaigns"])
 def create_campaign(
     campaign: CampaignCreate, 
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
     # Verify that the project exists and belongs to the current user
-    project = db.query(Project).filter(Project.id == campaign.project_id, Project.user_id == current_user.id).first()
+    project = db.query(Project).filter(Project.id == campaign.project_id, Project.user_id == current_user.id, Project.deleted_at.is_(None)).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
@@ -96,102 +210,168 @@ def create_campaign(
     db.add(new_campaign)
     db.commit()
     db.refresh(new_campaign)
+    timeline_cache.upsert(current_user.id, new_campaign.id, new_campaign.start_date, new_campaign.end_date)
+    dashboard_cache.invalidate(current_user.id)
     
-    # Compute status
-    computed_status = compute_campaign_status(new_campaign)
-    
-    return CampaignResponse(
-        id=new_campaign.id,
-        name=new_campaign.name,
-        description=new_campaign.description,
-        project_id=new_campaign.project_id,
-        project_name=project.name,  # Assign Project Name in response
-        requirements=new_campaign.requirements,
-        start_date=new_campaign.start_date,
-        end_date=new_campaign.end_date,
-        computed_status=computed_status
-    )
+    return campaign_to_response(new_campaign, project.name)
 
 # Endpoint to get a list of all campaigns
-@router.get("/campaigns", response_model=List[CampaignResponse], tags=["campaigns"])
+@router.get(
+    "/campaigns",
+    response_model=List[CampaignResponse],
+    response_model_exclude_unset=True,
+    tags=["campaigns"]
+)
 def read_campaigns(
+    response: Response,
     skip: int = 0, 
     limit: int = 10, 
-    db: Session = Depends(get_db), 
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
+    selected_fields = parse_fields(fields, CAMPAIGN_FIELDS, CAMPAIGN_LIST_FIELDS)
+    current_date = date.today()
+    # Built first so an invalid status is a 400 before any query runs
+    status_filter = campaign_status_filter(status, current_date) if status is not None else None
+    base_query = db.query(Campaign).join(Project).filter(Project.user_id == current_user.id, Project.deleted_at.is_(None))
+
+    # Per-status counts for the whole (unfiltered) set, returned as headers
+    set_status_count_headers(response, campaign_status_counts(base_query, current_date))
+
+    query = base_query
+    if status_filter is not None:
+        query = query.filter(status_filter)
+
     campaigns = (
-        db.query(Campaign)
-        .join(Project)
-        .filter(Project.user_id == current_user.id)
+        query.add_columns(Project.name)
+        .options(campaign_load_options(selected_fields))
         .offset(skip)
         .limit(limit)
         .all()
     )
     return [
-        CampaignResponse(
-            id=campaign.id,
-            name=campaign.name,
-            description=campaign.description,
-            project_id=campaign.project_id,
-            project_name=campaign.project.name,  # Assign Project Name
-            requirements=campaign.requirements,
-            start_date=campaign.start_date,
-            end_date=campaign.end_date,
-            computed_status=compute_campaign_status(campaign)
-        )
-        for campaign in campaigns
+        campaign_to_response(campaign, project_name, selected_fields)
+        for campaign, project_name in campaigns
     ]
 
+# Endpoint to get many campaigns by ID in one query (?ids=1&ids=2...)
+@router.get("/campaigns/batch", response_model=CampaignBatchResponse, tags=["campaigns"])
+def read_campaigns_batch(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    campaign_ids = validate_batch_ids(ids)
+    rows = (
+        db.query(Campaign, Project.name)
+        .join(Project)
+        .filter(Campaign.id.in_(campaign_ids), Project.user_id == current_user.id, Project.deleted_at.is_(None))
+        .all()
+    )
+    found = {campaign.id: campaign_to_response(campaign, project_name) for campaign, project_name in rows}
+    return CampaignBatchResponse(
+        results={campaign_id: found.get(campaign_id) for campaign_id in campaign_ids},
+        not_found=[campaign_id for campaign_id in campaign_ids if campaign_id not in found]
+    )
+
+# Endpoint to search the user's campaigns by name and/or category
+# (?category_id=1&category_id=2 matches campaigns in any of them), with facet counts
+@router.get(
+    "/campaigns/search",
+    response_model=CampaignSearchResponse,
+    response_model_exclude_unset=True,
+    tags=["campaigns", "categories"]
+)
+def search_campaigns(
+    q: Optional[str] = Query(None, min_length=1, max_length=255),
+    category_id: List[int] = Query([]),
+    skip: int = 0,
+    limit: int = 10,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_tenant_db),
+    primary: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    selected_fields = parse_fields(fields, CAMPAIGN_FIELDS, CAMPAIGN_LIST_FIELDS)
+    query = db.query(Campaign).join(Project).filter(Project.user_id == current_user.id, Project.deleted_at.is_(None))
+    if q is not None:
+        query = query.filter(Campaign.name.contains(q, autoescape=True))
+    if category_id:
+        query = query.filter(
+            Campaign.id.in_(
+                db.query(CampaignCategory.campaign_id).filter(CampaignCategory.category_id.in_(category_id))
+            )
+        )
+
+    campaigns = (
+        query.add_columns(Project.name)
+        .options(campaign_load_options(selected_fields))
+        .order_by(Campaign.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return CampaignSearchResponse(
+        results=[
+            campaign_to_response(campaign, project_name, selected_fields)
+            for campaign, project_name in campaigns
+        ],
+        # Counts from the tenant's shard, category names from the primary
+        facets=category_facets(primary, campaign_facets(db, current_user.id)),
+    )
+
 # Endpoint to get a specific campaign by ID
-@router.get("/campaigns/{campaign_id}", response_model=CampaignResponse, tags=["campaigns"])
+@router.get(
+    "/campaigns/{campaign_id}",
+    response_model=CampaignResponse,
+    response_model_exclude_unset=True,
+    tags=["campaigns"]
+)
 def read_campaign(
     campaign_id: int, 
-    db: Session = Depends(get_db), 
+    fields: Optional[str] = None,
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
-    campaign = (
-        db.query(Campaign)
+    selected_fields = parse_fields(fields, CAMPAIGN_FIELDS, CAMPAIGN_FIELDS)
+    row = (
+        db.query(Campaign, Project.name)
         .join(Project)
-        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id)
+        .options(campaign_load_options(selected_fields))
+        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
         .first()
     )
-    if not campaign:
+    if not row:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    computed_status = compute_campaign_status(campaign)
-    
-    return CampaignResponse(
-        id=campaign.id,
-        name=campaign.name,
-        description=campaign.description,
-        project_id=campaign.project_id,
-        project_name=campaign.project.name,  # Assign Project Name
-        requirements=campaign.requirements,
-        start_date=campaign.start_date,
-        end_date=campaign.end_date,
-        computed_status=computed_status
-    )
+    campaign, project_name = row
+    return campaign_to_response(campaign, project_name, selected_fields)
 
 # Endpoint to delete a campaign
 @router.delete("/campaigns/{campaign_id}", response_model=DeleteCampaignResponse, tags=["campaigns"])
 def delete_campaign(
     campaign_id: int, 
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
     campaign = (
         db.query(Campaign)
         .join(Project)
-        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id)
+        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
         .first()
     )
     if not campaign:
         # Return a JSON response with success=False and a reason
         return DeleteCampaignResponse(success=False, reason="Campaign not found")
     
+    forget_campaign_categories(db, current_user.id, campaign_id)
     db.delete(campaign)
     db.commit()
+    timeline_cache.remove(current_user.id, campaign_id)
+    dashboard_cache.invalidate(current_user.id)
+    leaderboards.invalidate(current_user.id)
     
     # Return a JSON response with success=True
     return DeleteCampaignResponse(success=True)
@@ -201,14 +381,14 @@ def delete_campaign(
 def update_campaign(
     campaign_id: int,
     campaign_update: CampaignUpdateRequest,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_tenant_db),
     current_user: User = Depends(get_current_user)
 ):
     # Retrieve the campaign with associated project
     campaign = (
         db.query(Campaign)
         .join(Project)
-        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id)
+        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
         .first()
     )
     
@@ -220,7 +400,7 @@ def update_campaign(
     if campaign_update.project_id is not None and campaign_update.project_id != campaign.project_id:
         new_project = (
             db.query(Project)
-            .filter(Project.id == campaign_update.project_id, Project.user_id == current_user.id)
+            .filter(Project.id == campaign_update.project_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
             .first()
         )
         if not new_project:
@@ -229,8 +409,9 @@ def update_campaign(
     else:
         new_project = campaign.project  # Existing project
 
-    # Update fields if provided
+    # Update fields if provided. The reason is not a column - it goes to the audit log
     update_data = campaign_update.dict(exclude_unset=True)
+    set_audit_reason(db, update_data.pop("reason", None))
     for field, value in update_data.items():
         setattr(campaign, field, value)
     
@@ -241,6 +422,9 @@ def update_campaign(
     # Commit the changes
     db.commit()
     db.refresh(campaign)
+    timeline_cache.upsert(current_user.id, campaign.id, campaign.start_date, campaign.end_date)
+    dashboard_cache.invalidate(current_user.id)
+    leaderboards.invalidate(current_user.id)  # Name or project may have changed
     
     # Return success response
     return CampaignUpdateResponse(success=True)
\ No newline at end of file
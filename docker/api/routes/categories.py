@@ -0,0 +1,197 @@
+# routes/categories.py
+
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..categories import (
+    MAX_CATEGORIES_PER_ITEM,
+    creator_category_ids,
+    set_campaign_categories,
+    set_creator_categories,
+    unknown_category_ids,
+)
+from ..database import get_db, is_unique_violation
+from ..models import Campaign, CampaignCategory, Category, Creator, CreatorCategory, Project, User
+from .auth import get_current_user, get_tenant_db
+
+router = APIRouter()
+
+MAX_CREATOR_PAGE = 100
+
+# Pydantic models for request and response validation
+
+class CategoryResponse(BaseModel):
+    id: int
+    name: str
+    description: Optional[str] = None
+    creator_count: int
+
+    model_config = {
+        "from_attributes": True  # Updated for Pydantic v2
+    }
+
+class CategoryFacet(BaseModel):
+    category_id: int
+    name: str
+    count: int
+
+class CategoryAssignment(BaseModel):
+    category_ids: List[int] = Field(..., max_length=MAX_CATEGORIES_PER_ITEM, example=[1, 3])
+
+class CategoryAssignmentResponse(BaseModel):
+    category_ids: List[int]
+
+class CreatorSummary(BaseModel):
+    id: int
+    user_id: int
+    bio: Optional[str] = None
+    rating: Optional[float] = None
+    category_ids: List[int]
+
+class CreatorSearchResponse(BaseModel):
+    results: List[CreatorSummary]
+    facets: List[CategoryFacet]
+    # Pass as after_id for the next page; null on the last page
+    next_after_id: Optional[int] = None
+
+# Helper function to turn {category_id: count} into facets, largest first.
+# db is the primary, where the category names live
+def category_facets(db: Session, counts: Dict[int, int]) -> List[CategoryFacet]:
+    if not counts:
+        return []
+    names = dict(db.query(Category.id, Category.name).filter(Category.id.in_(counts)))
+    facets = [
+        CategoryFacet(category_id=category_id, name=names[category_id], count=count)
+        for category_id, count in counts.items()
+        if category_id in names
+    ]
+    facets.sort(key=lambda facet: (-facet.count, facet.name, facet.category_id))
+    return facets
+
+# Helper function to reject unknown category ids with a 400
+def validate_category_ids(db: Session, category_ids: List[int]) -> None:
+    unknown = unknown_category_ids(db, category_ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown category ids: {unknown}")
+
+# Endpoint to get all categories, with how many creators carry each
+@router.get("/categories", response_model=List[CategoryResponse], tags=["categories"])
+def read_categories(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return db.query(Category).order_by(Category.name, Category.id).all()
+
+# Endpoint to replace the categories of a campaign
+@router.put(
+    "/campaigns/{campaign_id}/categories",
+    response_model=CategoryAssignmentResponse,
+    tags=["campaigns", "categories"]
+)
+def update_campaign_categories(
+    campaign_id: int,
+    assignment: CategoryAssignment,
+    db: Session = Depends(get_tenant_db),
+    primary: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Categories live on the primary, the campaign on the tenant's shard
+    validate_category_ids(primary, assignment.category_ids)
+    campaign = (
+        db.query(Campaign.id)
+        .join(Project)
+        .filter(Campaign.id == campaign_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
+        .first()
+    )
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    try:
+        category_ids = set_campaign_categories(db, current_user.id, campaign_id, assignment.category_ids)
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        # Only a concurrent assignment of the same category is worth a retry
+        if not is_unique_violation(error, CampaignCategory.__table__, "uq_campaign_category"):
+            raise
+        raise HTTPException(status_code=409, detail="Categories were changed concurrently, please retry")
+    return CategoryAssignmentResponse(category_ids=category_ids)
+
+# Endpoint to replace the categories of the current user's creator profile
+@router.put(
+    "/creators/{creator_id}/categories",
+    response_model=CategoryAssignmentResponse,
+    tags=["creators", "categories"]
+)
+def update_creator_categories(
+    creator_id: int,
+    assignment: CategoryAssignment,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    validate_category_ids(db, assignment.category_ids)
+    creator = db.query(Creator.id).filter(Creator.id == creator_id, Creator.user_id == current_user.id).first()
+    if not creator:
+        raise HTTPException(status_code=404, detail="Creator not found")
+
+    try:
+        category_ids = set_creator_categories(db, creator_id, assignment.category_ids)
+        db.commit()
+    except IntegrityError as error:
+        db.rollback()
+        # Only a concurrent assignment of the same category is worth a retry
+        if not is_unique_violation(error, CreatorCategory.__table__, "uq_creator_category"):
+            raise
+        raise HTTPException(status_code=409, detail="Categories were changed concurrently, please retry")
+    return CategoryAssignmentResponse(category_ids=category_ids)
+
+# Endpoint to browse creators, optionally in any of the given categories
+# (?category_id=1&category_id=2), with the creator count of every category
+@router.get("/creators/search", response_model=CreatorSearchResponse, tags=["creators", "categories"])
+def search_creators(
+    category_id: List[int] = Query([]),
+    after_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=MAX_CREATOR_PAGE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = db.query(Creator)
+    if category_id:
+        query = query.filter(
+            Creator.id.in_(
+                db.query(CreatorCategory.creator_id).filter(CreatorCategory.category_id.in_(category_id))
+            )
+        )
+    if after_id is not None:
+        query = query.filter(Creator.id > after_id)
+    # One extra row tells whether there is a next page
+    creators = query.order_by(Creator.id).limit(limit + 1).all()
+    next_after_id = creators[limit - 1].id if len(creators) > limit else None
+    creators = creators[:limit]
+
+    tags = creator_category_ids(db, [creator.id for creator in creators])
+    # Facets are the maintained counts on the (small) categories table
+    facets = [
+        CategoryFacet(category_id=facet_id, name=name, count=count)
+        for facet_id, name, count in (
+            db.query(Category.id, Category.name, Category.creator_count)
+            .filter(Category.creator_count > 0)
+            .order_by(Category.creator_count.desc(), Category.name, Category.id)
+        )
+    ]
+    return CreatorSearchResponse(
+        results=[
+            CreatorSummary(
+                id=creator.id,
+                user_id=creator.user_id,
+                bio=creator.bio,
+                rating=creator.rating,
+                category_ids=tags[creator.id],
+            )
+            for creator in creators
+        ],
+        facets=facets,
+        next_after_id=next_after_id,
+    )
@@ -0,0 +1,153 @@
+# routes/dashboard.py
+
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+from fastapi import APIRouter, Depends, Response
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from ..dashboard import dashboard_cache
+from ..models import Campaign, CampaignMetricTotal, Project, User
+from .auth import get_current_user, get_tenant_db
+from .campaigns import campaign_status_counts
+from .projects import (
+    ProjectResponse,
+    project_load_options,
+    project_to_response,
+    PROJECT_LIST_FIELDS,
+    PROJECT_STATUSES,
+)
+
+router = APIRouter()
+
+# Campaign starts/ends within this many days count as upcoming
+UPCOMING_DAYS = 30
+UPCOMING_LIMIT = 10
+TOP_METRICS_LIMIT = 5
+
+# Pydantic models for response validation
+
+class UpcomingDate(BaseModel):
+    date: date
+    event: str  # "start" or "end"
+    campaign_id: int
+    campaign_name: str
+    project_id: int
+
+class MetricTotal(BaseModel):
+    metric_type: str
+    total: int
+    campaign_count: int
+
+class DashboardResponse(BaseModel):
+    projects: List[ProjectResponse]
+    project_status_counts: Dict[str, int]
+    campaign_status_counts: Dict[str, int]
+    upcoming: List[UpcomingDate]
+    top_metrics: List[MetricTotal]
+    generated_at: datetime
+
+# Helper function to get the user's campaigns whose start_date or end_date falls in the window.
+# One query per event type so each can walk its (project_id, date) index in order.
+def upcoming_dates(db: Session, user_id: int, current_date: date) -> List[UpcomingDate]:
+    horizon = current_date + timedelta(days=UPCOMING_DAYS)
+    events = []
+    for event, column in (("start", Campaign.start_date), ("end", Campaign.end_date)):
+        rows = (
+            db.query(column, Campaign.id, Campaign.name, Campaign.project_id)
+            .join(Project)
+            .filter(
+                Project.user_id == user_id,
+                Project.deleted_at.is_(None),
+                column >= current_date,
+                column <= horizon,
+            )
+            .order_by(column, Campaign.id)
+            .limit(UPCOMING_LIMIT)
+            .all()
+        )
+        events.extend(
+            UpcomingDate(date=day, event=event, campaign_id=campaign_id, campaign_name=name, project_id=project_id)
+            for day, campaign_id, name, project_id in rows
+        )
+    events.sort(key=lambda upcoming: (upcoming.date, upcoming.event != "start", upcoming.campaign_id))
+    return events[:UPCOMING_LIMIT]
+
+# Helper function to total each metric over all of the user's campaigns, largest first.
+# Reads the per-campaign rollup (campaign_metric_totals), not the raw events
+def top_metrics(db: Session, user_id: int) -> List[MetricTotal]:
+    rows = (
+        db.query(
+            CampaignMetricTotal.metric_type,
+            func.sum(CampaignMetricTotal.total).label("total"),
+            func.count(CampaignMetricTotal.campaign_id).label("campaign_count"),
+        )
+        .join(Campaign, Campaign.id == CampaignMetricTotal.campaign_id)
+        .join(Project)
+        .filter(CampaignMetricTotal.user_id == user_id, Project.deleted_at.is_(None))
+        .group_by(CampaignMetricTotal.metric_type)
+        .order_by(func.sum(CampaignMetricTotal.total).desc(), CampaignMetricTotal.metric_type)
+        .limit(TOP_METRICS_LIMIT)
+        .all()
+    )
+    return [
+        MetricTotal(metric_type=metric_type, total=int(total or 0), campaign_count=campaign_count)
+        for metric_type, total, campaign_count in rows
+    ]
+
+# Helper function to build the dashboard with a fixed number of queries (five),
+# however many projects and campaigns the user has
+def build_dashboard(db: Session, user_id: int) -> DashboardResponse:
+    current_date = date.today()
+    fields = set(PROJECT_LIST_FIELDS)
+    rollups = (
+        db.query(
+            Project,
+            func.count(Campaign.id),
+            func.min(Campaign.start_date),
+            func.max(Campaign.end_date)
+        )
+        .outerjoin(Campaign, Campaign.project_id == Project.id)
+        .filter(Project.user_id == user_id, Project.deleted_at.is_(None))
+        .group_by(Project.id)
+        .options(project_load_options(fields))
+        .order_by(Project.id)
+        .all()
+    )
+    projects = [
+        project_to_response(project, campaign_count, earliest_campaign_start, latest_campaign_end, fields)
+        for project, campaign_count, earliest_campaign_start, latest_campaign_end in rollups
+    ]
+    project_statuses = Counter(project.status for project in projects)
+
+    campaigns = (
+        db.query(Campaign)
+        .join(Project)
+        .filter(Project.user_id == user_id, Project.deleted_at.is_(None))
+    )
+
+    return DashboardResponse(
+        projects=projects,
+        project_status_counts={status: project_statuses[status] for status in PROJECT_STATUSES},
+        campaign_status_counts=campaign_status_counts(campaigns, current_date),
+        upcoming=upcoming_dates(db, user_id, current_date),
+        top_metrics=top_metrics(db, user_id),
+        generated_at=datetime.utcnow(),
+    )
+
+# Endpoint to get everything the dashboard shows in one request
+@router.get(
+    "/dashboard",
+    response_model=DashboardResponse,
+    response_model_exclude_unset=True,
+    tags=["dashboard"]
+)
+def read_dashboard(
+    response: Response,
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    summary, cache_hit = dashboard_cache.get(current_user.id, lambda: build_dashboard(db, current_user.id))
+    response.headers["X-Cache"] = "hit" if cache_hit else "miss"
+    return summary
@@ -0,0 +1,182 @@
+# routes/inbox.py
+
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from ..models import User, Message, Notification
+from ..database import get_db
+from ..counters import adjust_unread, get_unread_counts, mark_all_read
+from .auth import get_current_user
+from pydantic import BaseModel
+
+router = APIRouter()
+
+# Pydantic models for request and response validation
+
+class UnreadCountsResponse(BaseModel):
+    unread_messages: int
+    unread_notifications: int
+
+class MessageCreate(BaseModel):
+    receiver_id: int
+    content: str
+
+class MessageResponse(BaseModel):
+    id: int
+    sender_id: int
+    receiver_id: int
+    content: str
+    status: str
+    created_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class NotificationResponse(BaseModel):
+    id: int
+    content: str
+    status: str
+    created_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class MarkReadResponse(BaseModel):
+    success: bool
+    updated: int = 0
+    reason: Optional[str] = None
+
+# Helper for other modules that need to notify a user
+def create_notification(db: Session, user_id: int, content: str) -> Notification:
+    notification = Notification(user_id=user_id, content=content, status="unread")
+    db.add(notification)
+    adjust_unread(db, user_id, "notifications", 1)
+    return notification
+
+# Endpoint for badge counts - a single primary-key lookup
+@router.get("/inbox/unread-counts", response_model=UnreadCountsResponse, tags=["inbox"])
+def read_unread_counts(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return UnreadCountsResponse(**get_unread_counts(db, current_user.id))
+
+# Endpoint to send a message
+@router.post("/messages", response_model=MessageResponse, tags=["inbox"])
+def send_message(
+    message: MessageCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    receiver = db.query(User.id).filter(User.id == message.receiver_id).first()
+    if not receiver:
+        raise HTTPException(status_code=404, detail="Receiver not found")
+
+    new_message = Message(
+        sender_id=current_user.id,
+        receiver_id=message.receiver_id,
+        content=message.content,
+        status="unread"
+    )
+    db.add(new_message)
+    adjust_unread(db, message.receiver_id, "messages", 1)
+    db.commit()
+    db.refresh(new_message)
+
+    return new_message
+
+# Endpoint to list received messages
+@router.get("/messages", response_model=List[MessageResponse], tags=["inbox"])
+def read_messages(
+    skip: int = 0,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return (
+        db.query(Message)
+        .filter(Message.receiver_id == current_user.id)
+        .order_by(Message.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+# Endpoint to mark a single message as read
+@router.post("/messages/{message_id}/read", response_model=MarkReadResponse, tags=["inbox"])
+def mark_message_read(
+    message_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Conditional UPDATE - only an unread -> read transition moves the counter
+    changed = (
+        db.query(Message)
+        .filter(Message.id == message_id, Message.receiver_id == current_user.id, Message.status == "unread")
+        .update({Message.status: "read"}, synchronize_session=False)
+    )
+    if not changed and not db.query(Message.id).filter(Message.id == message_id, Message.receiver_id == current_user.id).first():
+        return MarkReadResponse(success=False, reason="Message not found")
+
+    adjust_unread(db, current_user.id, "messages", -changed)
+    db.commit()
+    return MarkReadResponse(success=True, updated=changed)
+
+# Endpoint to mark all messages as read (chunked)
+@router.post("/messages/read-all", response_model=MarkReadResponse, tags=["inbox"])
+def mark_all_messages_read(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return MarkReadResponse(success=True, updated=mark_all_read(db, current_user.id, "messages"))
+
+# Endpoint to list notifications
+@router.get("/notifications", response_model=List[NotificationResponse], tags=["inbox"])
+def read_notifications(
+    skip: int = 0,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return (
+        db.query(Notification)
+        .filter(Notification.user_id == current_user.id)
+        .order_by(Notification.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+# Endpoint to mark a single notification as read
+@router.post("/notifications/{notification_id}/read", response_model=MarkReadResponse, tags=["inbox"])
+def mark_notification_read(
+    notification_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    changed = (
+        db.query(Notification)
+        .filter(
+            Notification.id == notification_id,
+            Notification.user_id == current_user.id,
+            Notification.status == "unread"
+        )
+        .update({Notification.status: "read"}, synchronize_session=False)
+    )
+    if not changed and not db.query(Notification.id).filter(Notification.id == notification_id, Notification.user_id == current_user.id).first():
+        return MarkReadResponse(success=False, reason="Notification not found")
+
+    adjust_unread(db, current_user.id, "notifications", -changed)
+    db.commit()
+    return MarkReadResponse(success=True, updated=changed)
+
+# Endpoint to mark all notifications as read (chunked)
+@router.post("/notifications/read-all", response_model=MarkReadResponse, tags=["inbox"])
+def mark_all_notifications_read(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return MarkReadResponse(success=True, updated=mark_all_read(db, current_user.id, "notifications"))
@@ -0,0 +1,161 @@
+# routes/invitations.py
+
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..database import get_db, is_unique_violation
+from ..invitations import MAX_INVITATION_BATCH, get_funnel, invite_creators, transition_invitations
+from ..models import Campaign, CampaignCreator, Creator, Project, User
+from .auth import get_current_user, get_tenant_db
+
+router = APIRouter()
+
+MAX_INVITATION_PAGE = 200
+
+InvitationStatus = Literal["invited", "accepted", "rejected"]
+
+# Pydantic models for request and response validation
+
+class InvitationFunnel(BaseModel):
+    invited: int
+    accepted: int
+    rejected: int
+
+class InviteRequest(BaseModel):
+    creator_ids: List[int] = Field(..., min_length=1, max_length=MAX_INVITATION_BATCH)
+
+class InviteResponse(BaseModel):
+    invited: List[int]
+    already_invited: List[int]
+    not_found: List[int]
+    funnel: InvitationFunnel
+
+class TransitionRequest(BaseModel):
+    creator_ids: List[int] = Field(..., min_length=1, max_length=MAX_INVITATION_BATCH)
+    status: InvitationStatus
+    # Only invitations currently in this status change
+    from_status: InvitationStatus = "invited"
+
+class TransitionResponse(BaseModel):
+    updated: int
+    funnel: InvitationFunnel
+
+class InvitationResponse(BaseModel):
+    creator_id: int
+    status: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True  # Updated for Pydantic v2
+    }
+
+# Helper function to 404 unless the campaign is live and owned by the user
+def require_campaign(db: Session, campaign_id: int, user_id: int) -> None:
+    campaign = (
+        db.query(Campaign.id)
+        .join(Project)
+        .filter(Campaign.id == campaign_id, Project.user_id == user_id, Project.deleted_at.is_(None))
+        .first()
+    )
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+# Endpoint to invite creators to a campaign. Creators already on the campaign
+# (in any status) are skipped and reported, not re-invited
+@router.post("/campaigns/{campaign_id}/invitations", response_model=InviteResponse, tags=["campaigns", "invitations"])
+def create_invitations(
+    campaign_id: int,
+    invite: InviteRequest,
+    db: Session = Depends(get_tenant_db),
+    primary: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    require_campaign(db, campaign_id, current_user.id)
+    # Creators live on the primary, the campaign on the tenant's shard
+    requested = list(dict.fromkeys(invite.creator_ids))
+    found = {creator_id for (creator_id,) in primary.query(Creator.id).filter(Creator.id.in_(requested))}
+
+    for attempt in range(2):
+        try:
+            result = invite_creators(db, campaign_id, [creator_id for creator_id in requested if creator_id in found])
+            db.commit()
+            break
+        except IntegrityError as error:
+            db.rollback()
+            # A concurrent request invited some of the same creators - the retry
+            # skips them. Any other integrity error isn't one a retry resolves
+            if not is_unique_violation(error, CampaignCreator.__table__, "uq_campaign_creator"):
+                raise
+    else:
+        raise HTTPException(status_code=409, detail="Invitations were changed concurrently, please retry")
+
+    return InviteResponse(
+        invited=result["invited"],
+        already_invited=result["already_invited"],
+        not_found=[creator_id for creator_id in requested if creator_id not in found],
+        funnel=get_funnel(db, campaign_id),
+    )
+
+# Endpoint to move many invitations to a new status in one statement, e.g.
+# {"creator_ids": [...], "status": "accepted"} accepts those still "invited"
+@router.post(
+    "/campaigns/{campaign_id}/invitations/status",
+    response_model=TransitionResponse,
+    tags=["campaigns", "invitations"]
+)
+def update_invitation_status(
+    campaign_id: int,
+    transition: TransitionRequest,
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    if transition.status == transition.from_status:
+        raise HTTPException(status_code=400, detail="status and from_status must differ")
+    require_campaign(db, campaign_id, current_user.id)
+
+    updated = transition_invitations(
+        db, campaign_id, set(transition.creator_ids), transition.from_status, transition.status
+    )
+    db.commit()
+    return TransitionResponse(updated=updated, funnel=get_funnel(db, campaign_id))
+
+# Endpoint to get the invitations of a campaign, by creator id
+# (pass the last creator_id of a page as after_id for the next one)
+@router.get(
+    "/campaigns/{campaign_id}/invitations",
+    response_model=List[InvitationResponse],
+    tags=["campaigns", "invitations"]
+)
+def read_invitations(
+    campaign_id: int,
+    status: Optional[InvitationStatus] = None,
+    after_id: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=MAX_INVITATION_PAGE),
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    require_campaign(db, campaign_id, current_user.id)
+    query = db.query(CampaignCreator).filter(CampaignCreator.campaign_id == campaign_id)
+    if status is not None:
+        query = query.filter(CampaignCreator.status == status)
+    if after_id is not None:
+        query = query.filter(CampaignCreator.creator_id > after_id)
+    return query.order_by(CampaignCreator.creator_id).limit(limit).all()
+
+# Endpoint to get a campaign's invitation funnel from its maintained counters
+@router.get(
+    "/campaigns/{campaign_id}/invitations/funnel",
+    response_model=InvitationFunnel,
+    tags=["campaigns", "invitations"]
+)
+def read_invitation_funnel(
+    campaign_id: int,
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    require_campaign(db, campaign_id, current_user.id)
+    return get_funnel(db, campaign_id)
@@ -1,15 +1,29 @@
 # routes/projects.py
 
-from datetime import date
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from ..models import Project, User, Campaign
-from ..database import get_db
-from .auth import get_current_user
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import and_, func, or_
+from ..models import Project, ProjectDeletion, User, Campaign
+from ..deletion import deletion_worker, start_project_deletion
+from ..timeline import timeline_cache
+from ..dashboard import dashboard_cache
+from ..leaderboard import leaderboards
+from .auth import get_current_user, get_tenant_db
 from pydantic import BaseModel
-from .campaigns import CampaignResponse, compute_campaign_status
+from .campaigns import (
+    CampaignResponse,
+    campaign_status_counts,
+    campaign_status_filter,
+    campaign_to_response,
+    set_status_count_headers,
+    validate_batch_ids,
+    parse_fields,
+    campaign_load_options,
+    CAMPAIGN_FIELDS,
+    CAMPAIGN_LIST_FIELDS,
+)
 
 router = APIRouter()
 
@@ -19,13 +33,14 @@ class ProjectCreate(BaseModel):
     name: str
     description: str
 
+# Fields other than id are optional so endpoints can return sparse fieldsets
 class ProjectResponse(BaseModel):
     id: int
-    name: str
-    description: str
-    status: str  # Computed status based on campaign dates
-    user_id: int
-    campaign_count: int
+    name: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None  # Computed status based on campaign dates
+    user_id: Optional[int] = None
+    campaign_count: Optional[int] = None
     earliest_campaign_start: Optional[date] = None
     latest_campaign_end: Optional[date] = None
 
@@ -33,12 +48,42 @@ class ProjectResponse(BaseModel):
         "from_attributes": True  # Updated for Pydantic v2
     }
 
+# Response model for batch reads - missing/foreign ids map to null
+class ProjectBatchResponse(BaseModel):
+    results: Dict[int, Optional[ProjectResponse]]
+    not_found: List[int]
+
+# Progress of an asynchronous project delete
+class ProjectDeletionResponse(BaseModel):
+    project_id: int
+    status: str
+    campaigns_total: int
+    campaigns_deleted: int
+    rows_deleted: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+# Sparse fieldsets - the description Text column is left out of list views by default
+PROJECT_FIELDS = tuple(ProjectResponse.model_fields)
+PROJECT_LIST_FIELDS = tuple(field for field in PROJECT_FIELDS if field != "description")
+
+# Helper function to load only the Project columns a fieldset needs
+def project_load_options(fields: set):
+    columns = {"id"} | {field for field in fields if field in Project.__table__.columns}
+    return load_only(*[getattr(Project, column) for column in sorted(columns)])
+
 # Helper function to convert Project to ProjectResponse
 def project_to_response(
     project: Project,
     campaign_count: int,
     earliest_campaign_start: Optional[date],
-    latest_campaign_end: Optional[date]
+    latest_campaign_end: Optional[date],
+    fields: Optional[set] = None
 ) -> ProjectResponse:
     current_date = date.today()
     
@@ -54,22 +99,54 @@ def project_to_response(
         # Define default status when there are no campaigns
         computed_status = "Not Started"  # Adjust based on your business logic
     
-    return ProjectResponse(
-        id=project.id,
-        name=project.name,
-        description=project.description,
-        status=computed_status,
-        user_id=project.user_id,
-        campaign_count=campaign_count,
-        earliest_campaign_start=earliest_campaign_start,
-        latest_campaign_end=latest_campaign_end
+    if fields is None:
+        return ProjectResponse(
+            id=project.id,
+            name=project.name,
+            description=project.description,
+            status=computed_status,
+            user_id=project.user_id,
+            campaign_count=campaign_count,
+            earliest_campaign_start=earliest_campaign_start,
+            latest_campaign_end=latest_campaign_end
+        )
+
+    values = {
+        "status": computed_status,
+        "campaign_count": campaign_count,
+        "earliest_campaign_start": earliest_campaign_start,
+        "latest_campaign_end": latest_campaign_end,
+    }
+    # Only touch requested columns - anything else was deferred by load_only
+    values = {field: values[field] if field in values else getattr(project, field) for field in fields}
+    return ProjectResponse(**values)
+
+PROJECT_STATUSES = ("Active", "Pending", "Ended", "Not Started")
+
+# Helper function to express the status computed by project_to_response as a
+# HAVING clause over the campaign date aggregates
+def project_status_filter(status: str, current_date: Optional[date] = None):
+    current_date = current_date or date.today()
+    earliest_campaign_start = func.min(Campaign.start_date)
+    latest_campaign_end = func.max(Campaign.end_date)
+    if status == "Active":
+        return and_(earliest_campaign_start <= current_date, latest_campaign_end >= current_date)
+    elif status == "Pending":
+        return and_(earliest_campaign_start > current_date, latest_campaign_end.isnot(None))
+    elif status == "Ended":
+        return and_(earliest_campaign_start <= current_date, latest_campaign_end < current_date)
+    elif status == "Not Started":
+        return or_(earliest_campaign_start.is_(None), latest_campaign_end.is_(None))
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid status. Expected one of: {', '.join(PROJECT_STATUSES)}"
     )
 
 # Endpoint to create a new project
 @router.post("/projects", response_model=ProjectResponse, tags=["projects"])
 def create_project(
     project: ProjectCreate, 
-    db: Session = Depends(get_db), 
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
     new_project = Project(
@@ -80,6 +157,7 @@ def create_project(
     db.add(new_project)
     db.commit()
     db.refresh(new_project)
+    dashboard_cache.invalidate(current_user.id)
     
     return project_to_response(
         new_project, 
@@ -89,14 +167,23 @@ def create_project(
     )
 
 # Endpoint to get a list of all projects
-@router.get("/projects", response_model=List[ProjectResponse], tags=["projects"])
+@router.get(
+    "/projects",
+    response_model=List[ProjectResponse],
+    response_model_exclude_unset=True,
+    tags=["projects"]
+)
 def read_projects(
     skip: int = 0, 
     limit: int = 10, 
-    db: Session = Depends(get_db), 
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
-    projects = (
+    selected_fields = parse_fields(fields, PROJECT_FIELDS, PROJECT_LIST_FIELDS)
+    status_filter = project_status_filter(status) if status is not None else None
+    query = (
         db.query(
             Project,
             func.count(Campaign.id).label('campaign_count'),
@@ -104,8 +191,15 @@ def read_projects(
             func.max(Campaign.end_date).label('latest_campaign_end')
         )
         .outerjoin(Campaign, Campaign.project_id == Project.id)
-        .filter(Project.user_id == current_user.id)
+        .filter(Project.user_id == current_user.id, Project.deleted_at.is_(None))
         .group_by(Project.id)
+    )
+    if status_filter is not None:
+        query = query.having(status_filter)
+
+    projects = (
+        query
+        .options(project_load_options(selected_fields))
         .offset(skip)
         .limit(limit)
         .all()
@@ -116,18 +210,55 @@ def read_projects(
             project, 
             campaign_count, 
             earliest_campaign_start, 
-            latest_campaign_end
+            latest_campaign_end,
+            selected_fields
         )
         for project, campaign_count, earliest_campaign_start, latest_campaign_end in projects
     ]
 
+# Endpoint to get many projects by ID in one query (?ids=1&ids=2...)
+@router.get("/projects/batch", response_model=ProjectBatchResponse, tags=["projects"])
+def read_projects_batch(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    project_ids = validate_batch_ids(ids)
+    rows = (
+        db.query(
+            Project,
+            func.count(Campaign.id).label('campaign_count'),
+            func.min(Campaign.start_date).label('earliest_campaign_start'),
+            func.max(Campaign.end_date).label('latest_campaign_end')
+        )
+        .outerjoin(Campaign, Campaign.project_id == Project.id)
+        .filter(Project.id.in_(project_ids), Project.user_id == current_user.id, Project.deleted_at.is_(None))
+        .group_by(Project.id)
+        .all()
+    )
+    found = {
+        project.id: project_to_response(project, campaign_count, earliest_campaign_start, latest_campaign_end)
+        for project, campaign_count, earliest_campaign_start, latest_campaign_end in rows
+    }
+    return ProjectBatchResponse(
+        results={project_id: found.get(project_id) for project_id in project_ids},
+        not_found=[project_id for project_id in project_ids if project_id not in found]
+    )
+
 # Endpoint to get a specific project by ID
-@router.get("/projects/{project_id}", response_model=ProjectResponse, tags=["projects"])
+@router.get(
+    "/projects/{project_id}",
+    response_model=ProjectResponse,
+    response_model_exclude_unset=True,
+    tags=["projects"]
+)
 def read_project(
     project_id: int, 
-    db: Session = Depends(get_db), 
+    fields: Optional[str] = None,
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
+    selected_fields = parse_fields(fields, PROJECT_FIELDS, PROJECT_FIELDS)
     project_data = (
         db.query(
             Project,
@@ -136,8 +267,9 @@ def read_project(
             func.max(Campaign.end_date).label('latest_campaign_end')
         )
         .outerjoin(Campaign, Campaign.project_id == Project.id)
-        .filter(Project.id == project_id, Project.user_id == current_user.id)
+        .filter(Project.id == project_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
         .group_by(Project.id)
+        .options(project_load_options(selected_fields))
         .first()
     )
     
@@ -150,74 +282,93 @@ def read_project(
         project, 
         campaign_count, 
         earliest_campaign_start, 
-        latest_campaign_end
+        latest_campaign_end,
+        selected_fields
     )
 
 # Endpoint to delete a project
-@router.delete("/projects/{project_id}", response_model=ProjectResponse, tags=["projects"])
+@router.delete(
+    "/projects/{project_id}",
+    response_model=ProjectDeletionResponse,
+    status_code=202,
+    tags=["projects"]
+)
 def delete_project(
     project_id: int, 
-    db: Session = Depends(get_db), 
+    response: Response,
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
-    project_data = (
-        db.query(
-            Project,
-            func.count(Campaign.id).label('campaign_count'),
-            func.min(Campaign.start_date).label('earliest_campaign_start'),
-            func.max(Campaign.end_date).label('latest_campaign_end')
-        )
-        .outerjoin(Campaign, Campaign.project_id == Project.id)
-        .filter(Project.id == project_id, Project.user_id == current_user.id)
-        .group_by(Project.id)
+    project = (
+        db.query(Project)
+        .filter(Project.id == project_id, Project.user_id == current_user.id, Project.deleted_at.is_(None))
         .first()
     )
-    
-    if not project_data:
+    if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    project, campaign_count, earliest_campaign_start, latest_campaign_end = project_data
 
-    # Compute status before deletion
-    response = project_to_response(
-        project, 
-        campaign_count, 
-        earliest_campaign_start, 
-        latest_campaign_end
+    # Hide the project now; its rows are removed in batches after the response
+    deletion = start_project_deletion(db, project)
+    timeline_cache.invalidate(current_user.id)
+    dashboard_cache.invalidate(current_user.id)
+    leaderboards.invalidate(current_user.id)
+    deletion_worker.submit(current_user.id, deletion.id)
+
+    response.headers["Location"] = f"/projects/{project_id}/deletion"
+    return deletion
+
+# Endpoint to poll the progress of an asynchronous project delete
+@router.get("/projects/{project_id}/deletion", response_model=ProjectDeletionResponse, tags=["projects"])
+def read_project_deletion(
+    project_id: int,
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    deletion = (
+        db.query(ProjectDeletion)
+        .filter(ProjectDeletion.project_id == project_id, ProjectDeletion.user_id == current_user.id)
+        .order_by(ProjectDeletion.id.desc())
+        .first()
     )
-    
-    db.delete(project)
-    db.commit()
-    
-    return response
+    if not deletion:
+        raise HTTPException(status_code=404, detail="Project deletion not found")
+    return deletion
 
 # Endpoint to get a list of campaigns by project
-@router.get("/projects/{project_id}/campaigns", response_model=List[CampaignResponse], tags=["projects"])
+@router.get(
+    "/projects/{project_id}/campaigns",
+    response_model=List[CampaignResponse],
+    response_model_exclude_unset=True,
+    tags=["projects"]
+)
 def read_campaigns_by_project(
     project_id: int, 
-    db: Session = Depends(get_db), 
+    response: Response,
+    status: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_tenant_db), 
     current_user: User = Depends(get_current_user)
 ):
+    selected_fields = parse_fields(fields, CAMPAIGN_FIELDS, CAMPAIGN_LIST_FIELDS)
+    current_date = date.today()
+    # Built first so an invalid status is a 400 before any query runs
+    status_filter = campaign_status_filter(status, current_date) if status is not None else None
+
     # Verify that the project exists and belongs to the current user
-    project = db.query(Project).filter(Project.id == project_id, Project.user_id == current_user.id).first()
+    project = db.query(Project).filter(Project.id == project_id, Project.user_id == current_user.id, Project.deleted_at.is_(None)).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found or not authorized")
     
+    base_query = db.query(Campaign).filter(Campaign.project_id == project_id)
+
+    # Per-status counts for the project, returned as headers
+    set_status_count_headers(response, campaign_status_counts(base_query, current_date))
+
     # Fetch campaigns associated with the project
-    campaigns = db.query(Campaign).filter(Campaign.project_id == project_id).all()
+    query = base_query
+    if status_filter is not None:
+        query = query.filter(status_filter)
+    campaigns = query.options(campaign_load_options(selected_fields)).all()
     
     # Compute status for each campaign and include project_name
-    return [
-        CampaignResponse(
-            id=campaign.id,
-            name=campaign.name,
-            description=campaign.description,
-            project_id=campaign.project_id,
-            project_name=project.name,  # Assign Project Name
-            requirements=campaign.requirements,
-            start_date=campaign.start_date,
-            end_date=campaign.end_date,
-            computed_status=compute_campaign_status(campaign)
-        )
-        for campaign in campaigns
-    ]
+    return [campaign_to_response(campaign, project.name, selected_fields) for campaign in campaigns]
@@ -0,0 +1,64 @@
+# routes/timeline.py
+
+from datetime import date
+from typing import List
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+from ..models import Campaign, User, Project
+from ..timeline import timeline_cache
+from .auth import get_current_user, get_tenant_db
+from .campaigns import CampaignResponse, campaign_to_response
+
+router = APIRouter()
+
+# Loader used to (re)build a user's interval index
+def load_campaign_intervals(db: Session, user_id: int):
+    return (
+        db.query(Campaign.start_date, Campaign.end_date, Campaign.id)
+        .join(Project)
+        .filter(Project.user_id == user_id, Project.deleted_at.is_(None))
+        .all()
+    )
+
+# Endpoint to get the campaigns overlapping a date range (calendar view)
+@router.get("/timeline", response_model=List[CampaignResponse], tags=["campaigns"])
+def read_timeline(
+    start: date,
+    end: date,
+    db: Session = Depends(get_tenant_db),
+    current_user: User = Depends(get_current_user)
+):
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date must not be after end date")
+
+    intervals = timeline_cache.overlapping(
+        current_user.id, start, end,
+        loader=lambda: load_campaign_intervals(db, current_user.id)
+    )
+    if not intervals:
+        return []
+
+    # Fetch the matching campaigns by primary key, keeping the ownership filter.
+    # The index may be stale (another worker changed the dates), so the range is
+    # checked again: a stale index can miss a campaign but never add a wrong one
+    campaign_ids = [campaign_id for _, _, campaign_id in intervals]
+    rows = (
+        db.query(Campaign, Project.name)
+        .join(Project)
+        .filter(
+            Campaign.id.in_(campaign_ids),
+            Campaign.start_date <= end,
+            Campaign.end_date >= start,
+            Project.user_id == current_user.id,
+            Project.deleted_at.is_(None),
+        )
+        .all()
+    )
+    by_id = {campaign.id: (campaign, project_name) for campaign, project_name in rows}
+
+    # Preserve the index order (by start date)
+    return [
+        campaign_to_response(*by_id[campaign_id])
+        for campaign_id in campaign_ids
+        if campaign_id in by_id
+    ]
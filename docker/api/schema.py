@@ -0,0 +1,213 @@
+# schema.py
+#
+# Schema tooling around api/models.py, which is the source of truth for the
+# database schema (migrations live in docker/migrations and are generated from
+# the models with "alembic revision --autogenerate").
+#
+#   python -m api.schema ddl        print CREATE TABLE/INDEX statements for the
+#                                   models (regenerates scripts/create_tables.txt)
+#   python -m api.schema explain    drive every projects/campaigns endpoint once,
+#                                   EXPLAIN each statement they ran and exit 1 if
+#                                   any of them scans a whole table
+#
+# "explain" writes fixture rows, so point DATABASE_URL at a scratch database
+# that has been migrated to head (or pass --create-all on an empty one).
+
+import os
+import re
+import sys
+import uuid
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateIndex, CreateTable
+from .models import Base
+
+EXPLAINED_PREFIXES = ("SELECT", "UPDATE", "DELETE")
+
+
+def model_indexes(table):
+    # index=True on a primary key column is redundant (see migrations/env.py)
+    for index in sorted(table.indexes, key=lambda index: index.name):
+        columns = list(index.columns)
+        if len(columns) == 1 and columns[0].primary_key:
+            continue
+        yield index
+
+
+def _format(compiled) -> str:
+    lines = str(compiled).strip().replace("\t", "    ").splitlines()
+    return "\n".join(line.rstrip() for line in lines) + ";"
+
+
+def render_ddl(dialect=None) -> str:
+    dialect = dialect or mysql.dialect()
+    statements = []
+    for table in Base.metadata.sorted_tables:
+        statements.append(_format(CreateTable(table).compile(dialect=dialect)))
+        for index in model_indexes(table):
+            statements.append(_format(CreateIndex(index).compile(dialect=dialect)))
+    header = "-- Generated from api/models.py by `python -m api.schema ddl` - do not edit.\n" \
+             "-- Schema changes go through docker/migrations (alembic revision --autogenerate).\n"
+    return header + "\n" + "\n\n".join(statements) + "\n"
+
+
+# EXPLAIN check
+
+def explain_workload(client, headers):
+    """Call every projects/campaigns endpoint (plus history, the dashboard, analytics,
+    categories and invitations) once."""
+    from .audit import audit_writer
+    from .routes.campaigns import CAMPAIGN_STATUSES
+    from .routes.projects import PROJECT_STATUSES
+
+    def ok(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.method} {response.request.url}: {response.status_code} {response.text}")
+        return response.json()
+
+    project_ids = [
+        ok(client.post("/projects", json={"name": f"Explain {n}", "description": "explain check"}, headers=headers))["id"]
+        for n in range(2)
+    ]
+    campaign_ids = [
+        ok(client.post("/campaigns", json={
+            "name": f"Explain {n}",
+            "description": "explain check",
+            "requirements": "none",
+            "project_id": project_ids[n % 2],
+            "start_date": start,
+            "end_date": end,
+        }, headers=headers))["id"]
+        for n, (start, end) in enumerate([("2020-01-01", "2020-02-01"), ("2024-01-01", "2099-01-01"), ("2099-01-01", "2099-02-01")])
+    ]
+    ok(client.get("/projects", headers=headers))
+    ok(client.get("/projects", params={"fields": "name,description,status"}, headers=headers))
+    for status in PROJECT_STATUSES:
+        ok(client.get("/projects", params={"status": status}, headers=headers))
+    ok(client.get("/projects/batch", params={"ids": project_ids}, headers=headers))
+    ok(client.get(f"/projects/{project_ids[0]}", headers=headers))
+    ok(client.get(f"/projects/{project_ids[0]}/campaigns", headers=headers))
+    ok(client.get(f"/projects/{project_ids[0]}/campaigns", params={"status": "Completed"}, headers=headers))
+    ok(client.post("/analytics", json={"events": [
+        {"campaign_id": campaign_id, "metric_type": metric_type, "value": 10}
+        for campaign_id in campaign_ids for metric_type in ("views", "clicks")
+    ]}, headers=headers))
+    ok(client.get("/leaderboard", params={"metric": "views"}, headers=headers))
+    ok(client.get("/dashboard", headers=headers))
+
+    ok(client.get("/campaigns", headers=headers))
+    ok(client.get("/campaigns", params={"fields": "name,requirements,project_name"}, headers=headers))
+    for status in CAMPAIGN_STATUSES:
+        ok(client.get("/campaigns", params={"status": status}, headers=headers))
+    ok(client.get("/campaigns/batch", params={"ids": campaign_ids}, headers=headers))
+    ok(client.get(f"/campaigns/{campaign_ids[0]}", headers=headers))
+    ok(client.get("/campaigns/search", params={"q": "Explain", "category_id": [1, 2]}, headers=headers))
+    ok(client.put(f"/campaigns/{campaign_ids[0]}/categories", json={"category_ids": []}, headers=headers))
+    ok(client.post(f"/campaigns/{campaign_ids[0]}/invitations", json={"creator_ids": [1, 2]}, headers=headers))
+    ok(client.post(f"/campaigns/{campaign_ids[0]}/invitations/status", json={"creator_ids": [1], "status": "accepted"}, headers=headers))
+    ok(client.get(f"/campaigns/{campaign_ids[0]}/invitations", params={"status": "invited", "after_id": 1}, headers=headers))
+    ok(client.get(f"/campaigns/{campaign_ids[0]}/invitations/funnel", headers=headers))
+    ok(client.put(f"/campaigns/{campaign_ids[0]}", json={"name": "Explain renamed", "project_id": project_ids[1]}, headers=headers))
+    ok(client.delete(f"/campaigns/{campaign_ids[0]}", headers=headers))
+    # The deleted campaign's owner comes from its "create" entry - write the queue first
+    audit_writer.stop()
+    ok(client.get(f"/campaigns/{campaign_ids[0]}/history", headers=headers))
+    ok(client.get(f"/projects/{project_ids[0]}/history", params={"before_id": 10, "limit": 10}, headers=headers))
+
+    ok(client.delete(f"/projects/{project_ids[1]}", headers=headers))
+    ok(client.get(f"/projects/{project_ids[1]}/deletion", headers=headers))
+
+
+def capture_statements(engines):
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINED_PREFIXES):
+            statements.setdefault((conn.engine.url, statement), parameters)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    return statements, record
+
+
+def full_scans(connection, statement, parameters):
+    """Return a description of every full table scan in the statement's plan."""
+    tables = Base.metadata.tables
+    problems = []
+    if connection.dialect.name == "sqlite":
+        for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+            match = re.match(r"SCAN (\w+)", row[3])
+            # SEARCH is an index lookup; SCAN walks the whole table (or index)
+            if match and match.group(1) in tables:
+                problems.append(row[3])
+    else:
+        for row in connection.exec_driver_sql("EXPLAIN " + statement, parameters).mappings():
+            table = row["table"] or ""
+            if table.startswith("<"):
+                continue  # derived table / subquery result
+            # ALL reads the whole table, index a whole index. Both count even
+            # when possible_keys is set - the optimizer chose the scan anyway
+            if row["type"] in ("ALL", "index"):
+                problems.append(
+                    f"{table}: type={row['type']} possible_keys={row['possible_keys']} "
+                    f"rows={row['rows']} {row['Extra'] or ''}".strip()
+                )
+    return problems
+
+
+def explain(create_all=False, log=print) -> int:
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from fastapi.testclient import TestClient
+    from .database import engine
+    from .main import app
+    from .sharding import shard_engines
+
+    if create_all:
+        Base.metadata.create_all(engine)
+
+    with TestClient(app) as client:
+        email = f"explain-{uuid.uuid4().hex[:12]}@example.com"
+        password = uuid.uuid4().hex
+        client.post("/register", json={"email": email, "password": password, "first_name": "Explain", "last_name": "Check"})
+        token = client.post("/token", data={"username": email, "password": password}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        statements, listener = capture_statements(shard_engines.values())
+        try:
+            explain_workload(client, headers)
+        finally:
+            for shard_engine in shard_engines.values():
+                event.remove(shard_engine, "before_cursor_execute", listener)
+
+    failures = 0
+    engines_by_url = {shard_engine.url: shard_engine for shard_engine in shard_engines.values()}
+    for (url, statement), parameters in statements.items():
+        with engines_by_url[url].connect() as connection:
+            problems = full_scans(connection, statement, parameters)
+        summary = " ".join(statement.split())
+        if problems:
+            failures += 1
+            log(f"FULL SCAN  {summary}")
+            for problem in problems:
+                log(f"    {problem}")
+        else:
+            log(f"ok         {summary[:150]}")
+    log(f"{len(statements)} statements explained, {failures} with full scans")
+    return failures
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Schema tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("ddl", help="Print the DDL generated from api/models.py")
+    explain_parser = subparsers.add_parser("explain", help="Fail if a projects/campaigns query does a full scan")
+    explain_parser.add_argument("--create-all", action="store_true",
+                                help="Create the tables from the models first (empty scratch database)")
+    args = parser.parse_args()
+
+    if args.command == "ddl":
+        sys.stdout.write(render_ddl())
+    else:
+        sys.exit(1 if explain(create_all=args.create_all) else 0)
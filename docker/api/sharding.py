@@ -0,0 +1,361 @@
+# sharding.py
+#
+# Tenant sharding of project/campaign data by user_id.
+#
+# Shard 0 is the primary database (DATABASE_URL); SHARD_DATABASE_URLS adds
+# shards 1..N. The tenant_shards table on the primary maps user_id -> shard;
+# users without a row live on shard 0. Users, sessions, creators, categories,
+# messages and notifications stay on the primary - only the tables in
+# TENANT_TABLES are sharded. Every shard is migrated with the same revisions
+# (alembic -x shard=N upgrade head), but shard schemas leave out the foreign
+# keys from tenant tables to the primary-only ones (see migrations/env.py).
+#
+# Ids: rows keep their primary keys when a tenant moves, so ids must be unique
+# across shards. With more than one shard, every connection to shard N uses
+# auto_increment_increment = SHARD_ID_STRIDE and auto_increment_offset = N+1,
+# so each shard hands out ids from its own residue class. Ids handed out
+# before sharding (all residues, all on shard 0) are below the floor that
+#
+#   python -m api.sharding prepare <shard_id>
+#
+# sets on a new shard (above the largest id on any shard), which has to run
+# once before the first tenant moves there.
+#
+# Moving a tenant (python -m api.sharding move <user_id> <shard_id>):
+#   1. mark the tenant as migrating; wait one directory TTL so every worker
+#      sees it and starts rejecting the tenant's writes with 503
+#   2. copy the tenant's rows to the target shard, preserving primary keys
+#      (refused if any of those ids is already taken there)
+#   3. point the directory at the target shard and clear the migrating flag
+#   4. wait one more TTL so no worker still reads the old shard, then delete
+#      the rows from the source shard
+
+import threading
+import time
+from dataclasses import dataclass
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session, sessionmaker
+from .config.settings import SHARD_DATABASE_URLS, SHARD_DIRECTORY_TTL_SECONDS, SHARD_ID_STRIDE
+from .database import engine, is_sqlite_memory, make_engine, SessionLocal
+from .models import (
+    TenantShard,
+    Project,
+    ProjectDeletion,
+    Campaign,
+    CampaignCreator,
+    CampaignInvitationCount,
+    CampaignAnalytics,
+    CampaignMetricTotal,
+    CampaignCategory,
+    CampaignCategoryCount,
+    Rating,
+)
+
+shard_engines = {0: engine}
+for _shard_id, _url in enumerate(SHARD_DATABASE_URLS, start=1):
+    # Users live on the primary. MariaDB shards are migrated without those
+    # foreign keys; SQLite shards get the full schema, so don't enforce it
+    shard_engines[_shard_id] = make_engine(_url, foreign_keys=False, pool_pre_ping=True)
+
+if len(shard_engines) > SHARD_ID_STRIDE:
+    raise RuntimeError(f"{len(shard_engines)} shards configured but SHARD_ID_STRIDE is {SHARD_ID_STRIDE}")
+
+
+def _interleave_ids(shard_id: int):
+    def set_increment(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(
+            f"SET SESSION auto_increment_increment = {SHARD_ID_STRIDE}, auto_increment_offset = {shard_id + 1}"
+        )
+        cursor.close()
+    return set_increment
+
+
+def _is_mariadb(shard_engine) -> bool:
+    return shard_engine.dialect.name in ("mysql", "mariadb")
+
+
+if len(shard_engines) > 1:
+    for _shard_id, _shard_engine in shard_engines.items():
+        # SQLite (the embedded profile) has no such setting; moves onto it are
+        # still checked for id collisions
+        if _is_mariadb(_shard_engine):
+            event.listen(_shard_engine, "connect", _interleave_ids(_shard_id))
+
+shard_sessions = {
+    shard_id: SessionLocal if shard_id == 0 else sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+    for shard_id, shard_engine in shard_engines.items()
+}
+
+# Tenant-owned tables, parents first
+TENANT_TABLES = [
+    Project,
+    ProjectDeletion,
+    Campaign,
+    CampaignCreator,
+    CampaignInvitationCount,
+    CampaignAnalytics,
+    CampaignMetricTotal,
+    CampaignCategory,
+    CampaignCategoryCount,
+    Rating,
+]
+
+# Tenant tables keyed by user_id rather than by a project or campaign
+USER_KEYED_TABLES = (Project, ProjectDeletion, CampaignCategoryCount)
+
+COPY_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class ShardAssignment:
+    shard_id: int
+    migrating: bool = False
+
+
+class ShardDirectory:
+    """Cached user_id -> ShardAssignment lookups against tenant_shards."""
+
+    def __init__(self, ttl_seconds: float = SHARD_DIRECTORY_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, db: Session, user_id: int) -> ShardAssignment:
+        if len(shard_engines) == 1:
+            return ShardAssignment(0)  # Not sharded - skip the directory entirely
+
+        entry = self._cache.get(user_id)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+        row = db.query(TenantShard.shard_id, TenantShard.migrating).filter(TenantShard.user_id == user_id).first()
+        assignment = ShardAssignment(row.shard_id, bool(row.migrating)) if row else ShardAssignment(0)
+        if assignment.shard_id not in shard_engines:
+            raise RuntimeError(f"User {user_id} is assigned to unknown shard {assignment.shard_id}")
+        with self._lock:
+            self._cache[user_id] = (now + self.ttl_seconds, assignment)
+        return assignment
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(user_id, None)
+
+
+shard_directory = ShardDirectory()
+
+
+def tenant_session(db: Session, user_id: int) -> Session:
+    """Open a session on the shard holding user_id (caller closes it)."""
+    return shard_sessions[shard_directory.lookup(db, user_id).shard_id]()
+
+
+def dispose_shard_engines(close=True):
+    for shard_id, shard_engine in shard_engines.items():
+        # Shard 0 is the primary engine, disposed by database.py
+        if shard_id != 0 and not is_sqlite_memory(shard_engine.url):
+            shard_engine.dispose(close=close)
+
+
+# Shard rebalancing / tenant migration
+
+def _tenant_filter(model, ids_by_table):
+    if model in USER_KEYED_TABLES:
+        return model.user_id == ids_by_table["user_id"]
+    if model is Campaign:
+        return Campaign.project_id.in_(ids_by_table["projects"])
+    return model.campaign_id.in_(ids_by_table["campaigns"])
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _tenant_ids(source: Session, user_id: int):
+    project_ids = [project_id for (project_id,) in source.query(Project.id).filter(Project.user_id == user_id)]
+    campaign_ids = []
+    for chunk in _chunks(project_ids, COPY_BATCH_SIZE):
+        campaign_ids.extend(
+            campaign_id for (campaign_id,) in source.query(Campaign.id).filter(Campaign.project_id.in_(chunk))
+        )
+    return {"user_id": user_id, "projects": project_ids, "campaigns": campaign_ids}
+
+
+def _tenant_batches(model, ids_by_table):
+    """Split a tenant's filter for one table into IN-lists of bounded size."""
+    if model in USER_KEYED_TABLES:
+        return [ids_by_table]
+    parent_key = "projects" if model is Campaign else "campaigns"
+    return [
+        dict(ids_by_table, **{parent_key: chunk})
+        for chunk in _chunks(ids_by_table[parent_key], COPY_BATCH_SIZE)
+    ]
+
+
+def _autoincrement_models():
+    """Tenant models whose single-column primary key the database numbers."""
+    return [
+        model for model in TENANT_TABLES
+        if len(model.__table__.primary_key.columns) == 1
+        and model.__table__.autoincrement_column is not None
+    ]
+
+
+def _taken_ids(target: Session, model, rows):
+    (key,) = model.__table__.primary_key.columns
+    ids = [row[key.name] for row in rows]
+    return [taken for (taken,) in target.query(key).filter(key.in_(ids)).limit(10)]
+
+
+def prepare_shard(shard_id: int, log=print):
+    """Start shard_id's auto-increment counters above every id on any shard."""
+    if shard_id not in shard_engines:
+        raise ValueError(f"Unknown shard {shard_id}")
+    target_engine = shard_engines[shard_id]
+    if not _is_mariadb(target_engine):
+        log(f"shard {shard_id}: {target_engine.dialect.name} has no per-table AUTO_INCREMENT, skipped")
+        return
+
+    with target_engine.begin() as target:
+        for model in _autoincrement_models():
+            (key,) = model.__table__.primary_key.columns
+            highest = 0
+            for session_factory in shard_sessions.values():
+                session = session_factory()
+                try:
+                    highest = max(highest, session.query(func.max(key)).scalar() or 0)
+                finally:
+                    session.close()
+            # Round up into this shard's residue class so the floor is the first id it hands out
+            floor = highest + 1 + (shard_id - highest) % SHARD_ID_STRIDE
+            target.execute(text(f"ALTER TABLE {model.__tablename__} AUTO_INCREMENT = {floor}"))
+            log(f"  {model.__tablename__}: next id {floor}")
+
+
+def _set_directory(primary: Session, user_id: int, shard_id: int, migrating: bool):
+    row = primary.get(TenantShard, user_id)
+    if row is None:
+        row = TenantShard(user_id=user_id)
+        primary.add(row)
+    row.shard_id = shard_id
+    row.migrating = migrating
+    primary.commit()
+    shard_directory.invalidate(user_id)
+
+
+def move_tenant(user_id: int, target_shard: int, wait_seconds: float = SHARD_DIRECTORY_TTL_SECONDS, log=print):
+    """Move one tenant's projects/campaigns to target_shard. Returns rows copied per table."""
+    if target_shard not in shard_engines:
+        raise ValueError(f"Unknown shard {target_shard}")
+
+    primary = SessionLocal()
+    try:
+        source_shard = shard_directory.lookup(primary, user_id).shard_id
+        if source_shard == target_shard:
+            log(f"User {user_id} is already on shard {target_shard}")
+            return {}
+
+        # 1. Freeze writes for the tenant
+        _set_directory(primary, user_id, source_shard, migrating=True)
+        log(f"User {user_id}: writes frozen, waiting {wait_seconds}s for workers to notice")
+        time.sleep(wait_seconds)
+
+        source = shard_sessions[source_shard]()
+        target = shard_sessions[target_shard]()
+        copied = {}
+        try:
+            ids_by_table = _tenant_ids(source, user_id)
+            id_checked = set(_autoincrement_models())
+
+            # 2. Copy, parents first, in one target transaction
+            try:
+                for model in TENANT_TABLES:
+                    started = time.monotonic()
+                    count = 0
+                    for batch in _tenant_batches(model, ids_by_table):
+                        rows = [
+                            dict(row._mapping)
+                            for row in source.query(model.__table__).filter(_tenant_filter(model, batch))
+                        ]
+                        if rows:
+                            if model in id_checked:
+                                taken = _taken_ids(target, model, rows)
+                                if taken:
+                                    raise RuntimeError(
+                                        f"{model.__tablename__} ids {taken} already exist on shard {target_shard}; "
+                                        f"run python -m api.sharding prepare {target_shard} first"
+                                    )
+                            target.execute(model.__table__.insert(), rows)
+                            count += len(rows)
+                    copied[model.__tablename__] = count
+                    log(f"  {model.__tablename__}: {count} rows in {time.monotonic() - started:.2f}s")
+                target.commit()
+            except Exception:
+                target.rollback()
+                # Leave the tenant on the source shard and writable again
+                _set_directory(primary, user_id, source_shard, migrating=False)
+                raise
+
+            # 3. Flip the directory
+            _set_directory(primary, user_id, target_shard, migrating=False)
+            log(f"User {user_id}: now on shard {target_shard}, waiting {wait_seconds}s before cleanup")
+            time.sleep(wait_seconds)
+
+            # 4. Remove the tenant from the source shard, children first
+            for model in reversed(TENANT_TABLES):
+                for batch in _tenant_batches(model, ids_by_table):
+                    source.query(model).filter(_tenant_filter(model, batch)).delete(synchronize_session=False)
+                    source.commit()
+        finally:
+            target.close()
+            source.close()
+        return copied
+    finally:
+        primary.close()
+
+
+def shard_status(log=print):
+    primary = SessionLocal()
+    try:
+        counts = {shard_id: 0 for shard_id in shard_engines}
+        migrating = []
+        for shard_id, is_migrating, user_id in primary.query(
+            TenantShard.shard_id, TenantShard.migrating, TenantShard.user_id
+        ):
+            counts[shard_id] = counts.get(shard_id, 0) + 1
+            if is_migrating:
+                migrating.append(user_id)
+        for shard_id, count in sorted(counts.items()):
+            log(f"shard {shard_id}: {count} tenants with directory entries")
+        if migrating:
+            log(f"migrating: {migrating}")
+    finally:
+        primary.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tenant shard tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    move_parser = subparsers.add_parser("move", help="Move one tenant to another shard")
+    move_parser.add_argument("user_id", type=int)
+    move_parser.add_argument("shard_id", type=int)
+    move_parser.add_argument("--wait", type=float, default=SHARD_DIRECTORY_TTL_SECONDS,
+                             help="Seconds to wait for worker directory caches to expire")
+    prepare_parser = subparsers.add_parser("prepare", help="Start a new shard's ids above every existing id")
+    prepare_parser.add_argument("shard_id", type=int)
+    subparsers.add_parser("status", help="Show tenants per shard")
+    args = parser.parse_args()
+
+    if args.command == "move":
+        move_tenant(args.user_id, args.shard_id, wait_seconds=args.wait)
+    elif args.command == "prepare":
+        prepare_shard(args.shard_id)
+    else:
+        shard_status()
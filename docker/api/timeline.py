@@ -0,0 +1,233 @@
+# timeline.py
+#
+# In-memory interval index over campaign start/end dates, one per tenant
+# (user_id). Answers "which campaigns overlap [start, end]" in O(log n + k)
+# instead of scanning every campaign the user owns.
+#
+# Each index is an AVL tree keyed by (start_date, end_date, campaign_id)
+# where every node also stores the maximum end date of its subtree. Adding or
+# removing a campaign is O(log n): only the nodes on the changed path (and the
+# rotations that rebalance it) recompute their max end. Indexes are loaded from
+# the database on first use and reloaded after TIMELINE_TTL_SECONDS so writes
+# made by other worker processes show up.
+
+import threading
+import time
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+TIMELINE_TTL_SECONDS = 60
+
+Interval = Tuple[date, date, int]  # (start_date, end_date, campaign_id)
+
+
+class _Node:
+    __slots__ = ("interval", "max_end", "height", "left", "right")
+
+    def __init__(self, interval: Interval):
+        self.interval = interval
+        self.max_end = interval[1]
+        self.height = 1
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+
+def _height(node: Optional[_Node]) -> int:
+    return node.height if node is not None else 0
+
+
+def _update(node: _Node) -> None:
+    node.height = 1 + max(_height(node.left), _height(node.right))
+    node.max_end = node.interval[1]
+    for child in (node.left, node.right):
+        if child is not None and child.max_end > node.max_end:
+            node.max_end = child.max_end
+
+
+def _rotate_right(node: _Node) -> _Node:
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rotate_left(node: _Node) -> _Node:
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rebalance(node: _Node) -> _Node:
+    _update(node)
+    balance = _height(node.left) - _height(node.right)
+    if balance > 1:
+        if _height(node.left.left) < _height(node.left.right):
+            node.left = _rotate_left(node.left)
+        return _rotate_right(node)
+    if balance < -1:
+        if _height(node.right.right) < _height(node.right.left):
+            node.right = _rotate_right(node.right)
+        return _rotate_left(node)
+    return node
+
+
+def _insert(node: Optional[_Node], interval: Interval) -> _Node:
+    if node is None:
+        return _Node(interval)
+    if interval < node.interval:
+        node.left = _insert(node.left, interval)
+    else:
+        node.right = _insert(node.right, interval)
+    return _rebalance(node)
+
+
+def _pop_min(node: _Node) -> Tuple[Optional[_Node], _Node]:
+    """Detach the leftmost node; returns (new subtree, detached node)."""
+    if node.left is None:
+        return node.right, node
+    node.left, smallest = _pop_min(node.left)
+    return _rebalance(node), smallest
+
+
+def _delete(node: Optional[_Node], interval: Interval) -> Optional[_Node]:
+    if node is None:
+        return None
+    if interval < node.interval:
+        node.left = _delete(node.left, interval)
+    elif interval > node.interval:
+        node.right = _delete(node.right, interval)
+    else:
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        right, successor = _pop_min(node.right)
+        successor.left, successor.right = node.left, right
+        node = successor
+    return _rebalance(node)
+
+
+def _build(intervals: List[Interval], lo: int, hi: int) -> Optional[_Node]:
+    # Balanced tree straight from a sorted list, O(n)
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    node = _Node(intervals[mid])
+    node.left = _build(intervals, lo, mid)
+    node.right = _build(intervals, mid + 1, hi)
+    _update(node)
+    return node
+
+
+class IntervalIndex:
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        ordered = sorted(
+            interval for interval in intervals if interval[0] is not None and interval[1] is not None
+        )
+        # campaign_id -> its interval, to find the node to remove
+        self._by_campaign: Dict[int, Interval] = {interval[2]: interval for interval in ordered}
+        self._root = _build(ordered, 0, len(ordered))
+
+    def __len__(self):
+        return len(self._by_campaign)
+
+    def add(self, start_date: date, end_date: date, campaign_id: int) -> None:
+        if start_date is None or end_date is None:
+            return
+        self.remove(campaign_id)
+        interval = (start_date, end_date, campaign_id)
+        self._root = _insert(self._root, interval)
+        self._by_campaign[campaign_id] = interval
+
+    def remove(self, campaign_id: int) -> None:
+        interval = self._by_campaign.pop(campaign_id, None)
+        if interval is not None:
+            self._root = _delete(self._root, interval)
+
+    def overlapping(self, range_start: date, range_end: date) -> List[Interval]:
+        """Return the intervals with start <= range_end and end >= range_start, by start."""
+        results: List[Interval] = []
+
+        def visit(node: Optional[_Node]) -> None:
+            # Nothing in this subtree ends late enough to overlap
+            if node is None or node.max_end < range_start:
+                return
+            visit(node.left)
+            # Sorted by start: if this one starts after the range, so does
+            # everything in the right subtree
+            if node.interval[0] > range_end:
+                return
+            if node.interval[1] >= range_start:
+                results.append(node.interval)
+            visit(node.right)
+
+        visit(self._root)
+        return results
+
+
+class TimelineCache:
+    """Per-tenant IntervalIndex registry with incremental updates on writes."""
+
+    def __init__(self, ttl_seconds: float = TIMELINE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._indexes: Dict[int, Tuple[float, IntervalIndex]] = {}
+        # Bumped on every write, so a load that raced with one is used but not kept
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0  # Bumped by invalidate() without a user
+        self._lock = threading.Lock()
+
+    def _generation(self, user_id: int) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def _bump(self, user_id: int) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def get(self, user_id: int, loader: Callable[[], Iterable[Interval]]) -> IntervalIndex:
+        with self._lock:
+            entry = self._indexes.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+                return entry[1]
+            generation = self._generation(user_id)
+        index = IntervalIndex(loader())
+        with self._lock:
+            if self._generation(user_id) == generation:
+                self._indexes[user_id] = (time.monotonic(), index)
+        return index
+
+    def upsert(self, user_id: int, campaign_id: int, start_date: date, end_date: date) -> None:
+        with self._lock:
+            self._bump(user_id)
+            entry = self._indexes.get(user_id)
+            if entry is None:
+                return
+            entry[1].remove(campaign_id)
+            entry[1].add(start_date, end_date, campaign_id)
+
+    def remove(self, user_id: int, campaign_id: int) -> None:
+        with self._lock:
+            self._bump(user_id)
+            entry = self._indexes.get(user_id)
+            if entry is not None:
+                entry[1].remove(campaign_id)
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+                self._epoch += 1
+            else:
+                self._indexes.pop(user_id, None)
+                self._bump(user_id)
+
+    def overlapping(self, user_id: int, range_start: date, range_end: date, loader) -> List[Interval]:
+        index = self.get(user_id, loader)
+        with self._lock:
+            return index.overlapping(range_start, range_end)
+
+
+timeline_cache = TimelineCache()
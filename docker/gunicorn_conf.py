@@ -0,0 +1,48 @@
+# gunicorn_conf.py
+#
+# Production entry point: gunicorn -c gunicorn_conf.py api.main:app
+#
+# Runs several Uvicorn workers with the app preloaded in the master, so the
+# import cost is paid once and workers share memory copy-on-write. Anything
+# that must not be shared across a fork (DB connections, caches) is reset in
+# post_fork via api.main.reset_after_fork().
+#
+# Signals:
+#   TERM / INT  graceful shutdown - workers stop accepting connections and get
+#               GRACEFUL_TIMEOUT seconds to drain in-flight requests
+#   HUP         graceful worker restart (picks up config changes; with
+#               preload_app, new *code* needs USR2 followed by QUIT to the old
+#               master)
+#   TTIN / TTOU add / remove one worker
+
+import multiprocessing
+
+from api.config.settings import (
+    WEB_CONCURRENCY,
+    GRACEFUL_TIMEOUT,
+    WORKER_TIMEOUT,
+    KEEPALIVE,
+    MAX_REQUESTS,
+)
+
+bind = "0.0.0.0:80"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = WEB_CONCURRENCY or multiprocessing.cpu_count()
+preload_app = True
+
+graceful_timeout = GRACEFUL_TIMEOUT
+timeout = WORKER_TIMEOUT
+keepalive = KEEPALIVE
+
+if MAX_REQUESTS:
+    max_requests = MAX_REQUESTS
+    max_requests_jitter = max(1, MAX_REQUESTS // 10)
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    from api.main import reset_after_fork
+
+    reset_after_fork()
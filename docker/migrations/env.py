@@ -0,0 +1,114 @@
+# migrations/env.py
+#
+# Alembic environment. The target schema is api/models.py, so
+# "alembic revision --autogenerate" diffs the models against the database
+# and "alembic check" fails when they have drifted apart.
+#
+# The database is DATABASE_URL, or tenant shard N with "-x shard=N" (every
+# shard carries the same tables and has to be migrated separately). Shards
+# 1..N only hold the tenant tables' rows (api/sharding.py); users, creators,
+# categories etc. stay on the primary, so foreign keys from a tenant table to
+# one of those are left out of shard schemas - the application checks them
+# against the primary instead.
+
+from logging.config import fileConfig
+
+from alembic import context
+from alembic.operations import Operations, ops, toimpl
+import sqlalchemy as sa
+from sqlalchemy import create_engine, pool
+
+from api.config.settings import DATABASE_URL, SHARD_DATABASE_URLS
+from api.models import Base
+from api.sharding import TENANT_TABLES
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+SHARD = int(context.get_x_argument(as_dictionary=True).get("shard", 0))
+# Revisions that need to know (e.g. to skip dropping a foreign key that a
+# shard never had) read config.attributes["shard"]
+config.attributes["shard"] = SHARD
+
+TENANT_TABLE_NAMES = {model.__tablename__ for model in TENANT_TABLES}
+
+
+def database_url() -> str:
+    if SHARD == 0:
+        return DATABASE_URL
+    return list(SHARD_DATABASE_URLS)[SHARD - 1]
+
+
+def crosses_shards(table_name: str, referred_table_name: str) -> bool:
+    return SHARD != 0 and table_name in TENANT_TABLE_NAMES and referred_table_name not in TENANT_TABLE_NAMES
+
+
+def _referred_table_name(constraint: sa.ForeignKeyConstraint) -> str:
+    return constraint.elements[0].target_fullname.split(".")[0]
+
+
+if SHARD != 0:
+    @Operations.implementation_for(ops.CreateTableOp, replace=True)
+    def create_shard_table(operations, operation):
+        operation.columns = [
+            item for item in operation.columns
+            if not (
+                isinstance(item, sa.ForeignKeyConstraint)
+                and crosses_shards(operation.table_name, _referred_table_name(item))
+            )
+        ]
+        return toimpl.create_table(operations, operation)
+
+    @Operations.implementation_for(ops.CreateForeignKeyOp)
+    def create_shard_foreign_key(operations, operation):
+        if not crosses_shards(operation.source_table, operation.referent_table):
+            toimpl.create_constraint(operations, operation)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Shards don't have the foreign keys to primary-only tables (see above)
+    if type_ == "foreign_key_constraint" and crosses_shards(object.table.name, object.referred_table.name):
+        return False
+    # The models put index=True on primary keys; MariaDB indexes them anyway,
+    # so those single-column indexes are never created or compared
+    if type_ == "index" and not reflected:
+        columns = list(object.columns)
+        if len(columns) == 1 and columns[0].primary_key:
+            return False
+    return True
+
+
+CONTEXT_OPTIONS = {
+    "target_metadata": target_metadata,
+    "include_object": include_object,
+    "compare_type": True,
+}
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL instead of running it (alembic upgrade --sql)."""
+    context.configure(
+        url=database_url(),
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        **CONTEXT_OPTIONS,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connectable = create_engine(database_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, **CONTEXT_OPTIONS)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
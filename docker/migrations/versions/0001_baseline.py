@@ -0,0 +1,198 @@
+"""Baseline: the schema from scripts/create_tables.txt
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 09:00:00.000000
+
+Existing databases were created by hand from that file and already match
+this revision exactly - mark them with "alembic stamp 0001" instead of running
+it, then "alembic upgrade head" adds everything since. New databases get the
+same tables from here, drift included; 0007 brings them in line with
+api/models.py.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def created_at():
+    return sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP'))
+
+
+def updated_at():
+    return sa.Column(
+        'updated_at', sa.TIMESTAMP(),
+        server_default=sa.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'),
+    )
+
+
+def user_fk(column='user_id'):
+    return sa.ForeignKeyConstraint([column], ['users.id'], ondelete='CASCADE')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('email', sa.String(255), nullable=False, unique=True),
+        sa.Column('password_hash', sa.String(255), nullable=False),
+        sa.Column('first_name', sa.String(100), nullable=False),
+        sa.Column('last_name', sa.String(100), nullable=False),
+        sa.Column('profile_picture_url', sa.String(255)),
+        sa.Column('registration_date', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('last_login', sa.TIMESTAMP(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), server_default=sa.true()),
+        sa.Column('auth_provider', sa.Enum('local', 'google', 'facebook', 'twitter'), server_default='local'),
+        sa.Column('social_id', sa.String(255)),
+        sa.UniqueConstraint('auth_provider', 'social_id', name='unique_social_provider'),
+    )
+
+    op.create_table(
+        'users_sessions',
+        sa.Column('session_id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('session_token', sa.String(255), nullable=False, unique=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('platform', sa.String(50), nullable=False),
+        sa.Column('is_active', sa.Boolean(), server_default=sa.true()),
+        sa.Index('idx_user_id', 'user_id'),
+        user_fk(),
+    )
+
+    op.create_table(
+        'projects',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(255), nullable=False),
+        sa.Column('description', sa.Text()),
+        sa.Column('status', sa.Enum('active', 'inactive', 'completed'), server_default='active'),
+        created_at(),
+        updated_at(),
+        sa.Index('idx_user_id', 'user_id'),
+        user_fk(),
+    )
+
+    # Unnamed foreign keys: MariaDB names these campaigns_ibfk_1 (project_id)
+    # and campaigns_ibfk_2 (brand_id)
+    op.create_table(
+        'campaigns',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(255), nullable=False),
+        sa.Column('brand_id', sa.Integer(), nullable=False),
+        sa.Column('description', sa.Text()),
+        sa.Column('requirements', sa.Text()),
+        sa.Column('start_date', sa.Date()),
+        sa.Column('end_date', sa.Date()),
+        sa.Column('status', sa.Enum('pending', 'live', 'completed'), server_default='pending'),
+        created_at(),
+        updated_at(),
+        sa.Index('idx_project_id', 'project_id'),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+        user_fk('brand_id'),
+    )
+
+    op.create_table(
+        'creators',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('bio', sa.Text()),
+        sa.Column('social_links', sa.JSON()),
+        sa.Column('rating', sa.Float(), server_default='0'),
+        created_at(),
+        updated_at(),
+        sa.Index('idx_user_id', 'user_id'),
+        user_fk(),
+    )
+
+    op.create_table(
+        'campaign_creators',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=False),
+        sa.Column('creator_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('invited', 'accepted', 'rejected'), server_default='invited'),
+        created_at(),
+        updated_at(),
+        sa.Index('idx_campaign_id', 'campaign_id'),
+        sa.Index('idx_creator_id', 'creator_id'),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['creator_id'], ['creators.id'], ondelete='CASCADE'),
+    )
+
+    op.create_table(
+        'campaign_analytics',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=False),
+        sa.Column('metric_type', sa.String(255), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.Column('recorded_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Index('idx_campaign_id', 'campaign_id'),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    )
+
+    op.create_table(
+        'messages',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('sender_id', sa.Integer(), nullable=False),
+        sa.Column('receiver_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('read', 'unread'), server_default='unread'),
+        created_at(),
+        sa.Index('idx_sender_id', 'sender_id'),
+        sa.Index('idx_receiver_id', 'receiver_id'),
+        user_fk('sender_id'),
+        user_fk('receiver_id'),
+    )
+
+    op.create_table(
+        'notifications',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('read', 'unread'), server_default='unread'),
+        created_at(),
+        sa.Index('idx_user_id', 'user_id'),
+        user_fk(),
+    )
+
+    op.create_table(
+        'ratings',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=False),
+        sa.Column('creator_id', sa.Integer(), nullable=False),
+        sa.Column('rating', sa.Float(), nullable=False),
+        sa.Column('comment', sa.Text()),
+        created_at(),
+        sa.Index('idx_campaign_id', 'campaign_id'),
+        sa.Index('idx_creator_id', 'creator_id'),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['creator_id'], ['creators.id'], ondelete='CASCADE'),
+    )
+
+    op.create_table(
+        'categories',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('name', sa.String(255), nullable=False),
+        sa.Column('description', sa.Text()),
+        created_at(),
+        updated_at(),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in (
+        'categories', 'ratings', 'notifications', 'messages', 'campaign_analytics',
+        'campaign_creators', 'creators', 'campaigns', 'projects', 'users_sessions', 'users',
+    ):
+        op.drop_table(table)
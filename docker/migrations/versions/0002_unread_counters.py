@@ -0,0 +1,53 @@
+"""Maintained unread counters for messages and notifications
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:05:00.000000
+
+user_counters holds each user's unread message/notification counts, kept in
+step by api/counters.py and backfilled here. The (receiver/user, status)
+indexes serve the unread lookups and "mark all read".
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_receiver_status', 'messages', ['receiver_id', 'status'])
+    op.create_index('idx_user_status', 'notifications', ['user_id', 'status'])
+
+    op.create_table(
+        'user_counters',
+        sa.Column('user_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('unread_messages', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('unread_notifications', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column(
+            'updated_at', sa.TIMESTAMP(),
+            server_default=sa.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'),
+        ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+    op.execute(
+        "INSERT INTO user_counters (user_id, unread_messages, unread_notifications) "
+        "SELECT users.id, "
+        "(SELECT COUNT(*) FROM messages WHERE receiver_id = users.id AND status = 'unread'), "
+        "(SELECT COUNT(*) FROM notifications WHERE user_id = users.id AND status = 'unread') "
+        "FROM users"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_counters')
+    op.drop_index('idx_user_status', table_name='notifications')
+    op.drop_index('idx_receiver_status', table_name='messages')
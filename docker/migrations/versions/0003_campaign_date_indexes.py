@@ -0,0 +1,32 @@
+"""Campaign date indexes for the computed-status filters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:10:00.000000
+
+Campaign status is computed from start/end dates, so the status filters and
+the timeline are date-range predicates per project.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_project_dates', 'campaigns', ['project_id', 'start_date', 'end_date'])
+    op.create_index('idx_project_end_date', 'campaigns', ['project_id', 'end_date'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_project_end_date', table_name='campaigns')
+    op.drop_index('idx_project_dates', table_name='campaigns')
@@ -0,0 +1,40 @@
+"""Tenant shard directory
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:15:00.000000
+
+tenant_shards maps user_id -> shard for api/sharding.py. Users without a row
+live on shard 0, so nothing is backfilled.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'tenant_shards',
+        sa.Column('user_id', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('shard_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('migrating', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column(
+            'updated_at', sa.TIMESTAMP(),
+            server_default=sa.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'),
+        ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('tenant_shards')
@@ -0,0 +1,51 @@
+"""Asynchronous project deletion
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 09:25:00.000000
+
+projects.deleted_at hides a project as soon as its delete starts;
+project_deletions tracks api/deletion.py removing its children in batches.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('projects', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('idx_user_deleted', 'projects', ['user_id', 'deleted_at'])
+
+    op.create_table(
+        'project_deletions',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('pending', 'running', 'done', 'failed'), nullable=False, server_default='pending'),
+        sa.Column('campaigns_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('campaigns_deleted', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('rows_deleted', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text()),
+        sa.Column('created_at', sa.DateTime()),
+        sa.Column('updated_at', sa.DateTime()),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Index('idx_project_id', 'project_id'),
+        sa.Index('idx_user_id', 'user_id'),
+        sa.Index('idx_status', 'status'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('project_deletions')
+    op.drop_index('idx_user_deleted', table_name='projects')
+    op.drop_column('projects', 'deleted_at')
@@ -0,0 +1,116 @@
+"""Match api/models.py and cover the hot project/campaign queries
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 09:30:00.000000
+
+- campaigns.brand_id and campaigns.status / projects.status were dropped from
+  the models long ago (status is computed from campaign dates, the brand is
+  the project owner) but stayed NOT NULL / defaulted in the database
+- campaign_analytics gets (campaign_id, metric_type, recorded_at) for metric
+  series reads
+- single-column indexes that are the leftmost prefix of a composite index are
+  dropped; (user_id, deleted_at) on projects already ends in the primary key,
+  so it doubles as (user_id, id)
+- the remaining per-table "idx_<column>" names are renamed to the models'
+  ix_<table>_<column> convention so autogenerate sees no difference
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, old name, new name)
+RENAMED_INDEXES = [
+    ('users_sessions', 'idx_user_id', 'ix_users_sessions_user_id'),
+    ('refresh_tokens', 'idx_user_id', 'ix_refresh_tokens_user_id'),
+    ('refresh_tokens', 'idx_family_id', 'ix_refresh_tokens_family_id'),
+    ('project_deletions', 'idx_project_id', 'ix_project_deletions_project_id'),
+    ('project_deletions', 'idx_user_id', 'ix_project_deletions_user_id'),
+    ('project_deletions', 'idx_status', 'ix_project_deletions_status'),
+    ('creators', 'idx_user_id', 'ix_creators_user_id'),
+    ('campaign_creators', 'idx_campaign_id', 'ix_campaign_creators_campaign_id'),
+    ('campaign_creators', 'idx_creator_id', 'ix_campaign_creators_creator_id'),
+    ('messages', 'idx_sender_id', 'ix_messages_sender_id'),
+    ('ratings', 'idx_campaign_id', 'ix_ratings_campaign_id'),
+    ('ratings', 'idx_creator_id', 'ix_ratings_creator_id'),
+]
+
+# (table, index, columns) made redundant by a composite index with the same prefix
+REDUNDANT_INDEXES = [
+    ('projects', 'idx_user_id', ['user_id']),           # idx_user_deleted
+    ('campaigns', 'idx_project_id', ['project_id']),    # idx_project_dates
+    ('messages', 'idx_receiver_id', ['receiver_id']),   # idx_receiver_status
+    ('notifications', 'idx_user_id', ['user_id']),      # idx_user_status
+]
+
+
+def brand_foreign_key_name() -> Optional[str]:
+    if context.config.attributes.get("shard"):
+        return None  # Shards are created without foreign keys to users (see env.py)
+    if context.is_offline_mode():
+        return 'campaigns_ibfk_2'  # MariaDB's name for the baseline's second FK
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys('campaigns'):
+        if foreign_key['constrained_columns'] == ['brand_id']:
+            return foreign_key['name']
+    raise RuntimeError("No foreign key on campaigns.brand_id")
+
+
+def rename_index(table: str, old: str, new: str) -> None:
+    # Metadata-only on MariaDB >= 10.5.2 - no index rebuild
+    op.execute(f"ALTER TABLE {table} RENAME INDEX {old} TO {new}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    brand_foreign_key = brand_foreign_key_name()
+    if brand_foreign_key:
+        op.drop_constraint(brand_foreign_key, 'campaigns', type_='foreignkey')
+    op.drop_column('campaigns', 'brand_id')
+    op.drop_column('campaigns', 'status')
+    op.drop_column('projects', 'status')
+
+    # Create the composite first so campaign_id's foreign key keeps an index
+    op.create_index(
+        'idx_campaign_metric_time', 'campaign_analytics', ['campaign_id', 'metric_type', 'recorded_at']
+    )
+    op.drop_index('idx_campaign_id', table_name='campaign_analytics')
+
+    for table, name, _columns in REDUNDANT_INDEXES:
+        op.drop_index(name, table_name=table)
+
+    for table, old, new in RENAMED_INDEXES:
+        rename_index(table, old, new)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, old, new in RENAMED_INDEXES:
+        rename_index(table, new, old)
+
+    for table, name, columns in REDUNDANT_INDEXES:
+        op.create_index(name, table, columns)
+
+    op.create_index('idx_campaign_id', 'campaign_analytics', ['campaign_id'])
+    op.drop_index('idx_campaign_metric_time', table_name='campaign_analytics')
+
+    op.add_column(
+        'projects',
+        sa.Column('status', sa.Enum('active', 'inactive', 'completed'), server_default='active'),
+    )
+    op.add_column(
+        'campaigns',
+        sa.Column('status', sa.Enum('pending', 'live', 'completed'), server_default='pending'),
+    )
+    # The brand was always the project owner - rebuild it from projects
+    op.add_column('campaigns', sa.Column('brand_id', sa.Integer(), nullable=True))
+    op.execute("UPDATE campaigns JOIN projects ON projects.id = campaigns.project_id SET campaigns.brand_id = projects.user_id")
+    op.alter_column('campaigns', 'brand_id', existing_type=sa.Integer(), nullable=False)
+    op.create_foreign_key(None, 'campaigns', 'users', ['brand_id'], ['id'], ondelete='CASCADE')
@@ -0,0 +1,51 @@
+"""Append-only audit_log for campaign and project changes
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 11:00:00.000000
+
+Written in batches by api/audit.py. Triggers reject UPDATE and DELETE so the
+table stays append-only for the application user too; dropping old history
+is a DBA job (DROP TRIGGER, purge, re-create).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+APPEND_ONLY_TRIGGERS = [('audit_log_no_update', 'UPDATE'), ('audit_log_no_delete', 'DELETE')]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'audit_log',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('resource_type', sa.Enum('campaign', 'project'), nullable=False),
+        sa.Column('resource_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.Enum('create', 'update', 'delete'), nullable=False),
+        sa.Column('changes', sa.JSON(), nullable=False),
+        sa.Column('reason', sa.Text()),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Index('idx_audit_resource', 'resource_type', 'resource_id', 'id'),
+    )
+    for name, operation in APPEND_ONLY_TRIGGERS:
+        op.execute(
+            f"CREATE TRIGGER {name} BEFORE {operation} ON audit_log FOR EACH ROW "
+            f"SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'audit_log is append-only'"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _operation in APPEND_ONLY_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table('audit_log')
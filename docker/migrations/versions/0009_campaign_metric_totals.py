@@ -0,0 +1,50 @@
+"""campaign_metric_totals rollup for the campaign leaderboard
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 14:00:00.000000
+
+One row per (campaign, metric) holding SUM(campaign_analytics.value), kept in
+step by POST /analytics (api/leaderboard.py). Backfilled here from the
+existing events; python -m api.leaderboard rebuild-rollups recomputes it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'campaign_metric_totals',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=False),
+        sa.Column('metric_type', sa.String(255), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.UniqueConstraint('campaign_id', 'metric_type', name='uq_campaign_metric'),
+        sa.Index('idx_user_metric_total', 'user_id', 'metric_type', 'total'),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    )
+    op.execute(
+        "INSERT INTO campaign_metric_totals (campaign_id, metric_type, user_id, total) "
+        "SELECT a.campaign_id, a.metric_type, p.user_id, SUM(a.value) "
+        "FROM campaign_analytics a "
+        "JOIN campaigns c ON c.id = a.campaign_id "
+        "JOIN projects p ON p.id = c.project_id "
+        "GROUP BY a.campaign_id, a.metric_type, p.user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('campaign_metric_totals')
@@ -0,0 +1,69 @@
+"""Category tagging for campaigns and creators, with maintained facet counts
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 16:00:00.000000
+
+campaign_categories / creator_categories link categories to campaigns and
+creators. campaign_category_counts (per tenant) and categories.creator_count
+are the facet counts, kept in step by api/categories.py; nothing is tagged
+yet, so they start at zero.
+
+The tenant tables (campaign_categories, campaign_category_counts) have no
+foreign key to categories: they are sharded, categories are not.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('categories', sa.Column('creator_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'campaign_categories',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.UniqueConstraint('campaign_id', 'category_id', name='uq_campaign_category'),
+        sa.Index('idx_category_campaign', 'category_id', 'campaign_id'),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    )
+
+    op.create_table(
+        'creator_categories',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('creator_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.UniqueConstraint('creator_id', 'category_id', name='uq_creator_category'),
+        sa.Index('idx_category_creator', 'category_id', 'creator_id'),
+        sa.ForeignKeyConstraint(['creator_id'], ['creators.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ondelete='CASCADE'),
+    )
+
+    op.create_table(
+        'campaign_category_counts',
+        sa.Column('user_id', sa.Integer(), primary_key=True),
+        sa.Column('category_id', sa.Integer(), primary_key=True),
+        sa.Column('campaign_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('campaign_category_counts')
+    op.drop_table('creator_categories')
+    op.drop_table('campaign_categories')
+    op.drop_column('categories', 'creator_count')
@@ -0,0 +1,56 @@
+"""Unique campaign invitations and maintained invitation funnels
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 18:00:00.000000
+
+campaign_creators gets a unique key on (campaign_id, creator_id) so bulk
+invites can skip creators that are already invited; duplicates from before
+are removed first, keeping the oldest row. campaign_invitation_counts holds
+each campaign's invited/accepted/rejected counts, kept in step by
+api/invitations.py and backfilled here.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        "DELETE duplicate FROM campaign_creators duplicate "
+        "JOIN campaign_creators original ON original.campaign_id = duplicate.campaign_id "
+        "AND original.creator_id = duplicate.creator_id AND original.id < duplicate.id"
+    )
+    op.create_unique_constraint('uq_campaign_creator', 'campaign_creators', ['campaign_id', 'creator_id'])
+
+    op.create_table(
+        'campaign_invitation_counts',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('campaign_id', sa.Integer(), nullable=False, unique=True),
+        sa.Column('invited', sa.Integer(), nullable=False),
+        sa.Column('accepted', sa.Integer(), nullable=False),
+        sa.Column('rejected', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.ForeignKeyConstraint(['campaign_id'], ['campaigns.id'], ondelete='CASCADE'),
+    )
+    op.execute(
+        "INSERT INTO campaign_invitation_counts (campaign_id, invited, accepted, rejected) "
+        "SELECT campaign_id, "
+        "SUM(status = 'invited'), SUM(status = 'accepted'), SUM(status = 'rejected') "
+        "FROM campaign_creators GROUP BY campaign_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('campaign_invitation_counts')
+    op.drop_constraint('uq_campaign_creator', 'campaign_creators', type_='unique')
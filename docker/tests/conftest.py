@@ -0,0 +1,14 @@
+# tests/conftest.py
+#
+# The suite runs against the embedded SQLite profile (see api/embedded.py), so
+# no MariaDB is needed. Settings are read when api is first imported, hence
+# the environment is set up here, before any test module imports it.
+
+import os
+
+os.environ.setdefault("DATABASE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+for provider in ("GOOGLE", "FACEBOOK"):
+    os.environ.setdefault(f"{provider}_CLIENT_ID", f"test-{provider.lower()}-client")
+    os.environ.setdefault(f"{provider}_CLIENT_SECRET", f"test-{provider.lower()}-secret")
@@ -0,0 +1,54 @@
+# tests/test_dashboard.py
+#
+# GET /dashboard is built with a fixed number of queries (build_dashboard in
+# routes/dashboard.py), counted with embedded.count_queries. Runs in its own
+# process: SEED_FIXTURES is read when api is first imported, and the rest of
+# the suite (and its subprocesses) must keep starting from an empty database.
+
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Projects, campaign status counts, upcoming starts, upcoming ends, top metrics
+DASHBOARD_QUERIES = 5
+
+COUNT_DASHBOARD_QUERIES = """
+import json
+from fastapi.testclient import TestClient
+from api.embedded import FIXTURE_PASSWORD, count_queries
+from api.main import app
+
+with TestClient(app) as client:
+    token = client.post(
+        "/token", data={"username": "user1@example.com", "password": FIXTURE_PASSWORD}
+    ).json()["access_token"]
+    headers = {"Authorization": "Bearer " + token}
+    results = []
+    for _ in range(2):
+        with count_queries() as queries:
+            response = client.get("/dashboard", headers=headers)
+        results.append({
+            "status": response.status_code,
+            "cache": response.headers["X-Cache"],
+            "projects": len(response.json()["projects"]),
+            "queries": queries.count,
+        })
+print(json.dumps(results))
+"""
+
+
+def test_dashboard_query_count():
+    env = {**os.environ, "DATABASE_BACKEND": "sqlite", "SQLITE_PATH": ":memory:", "SEED_FIXTURES": "true"}
+    result = subprocess.run(
+        [sys.executable, "-c", COUNT_DASHBOARD_QUERIES],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, timeout=120, check=True,
+    )
+    miss, hit = json.loads(result.stdout.splitlines()[-1])
+
+    assert miss["status"] == 200 and miss["cache"] == "miss"
+    assert miss["projects"] > 0, "fixtures were not seeded"
+    assert miss["queries"] == DASHBOARD_QUERIES, f"/dashboard ran {miss['queries']} queries"
+    assert hit["cache"] == "hit" and hit["queries"] == 0
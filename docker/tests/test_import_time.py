@@ -0,0 +1,58 @@
+# tests/test_import_time.py
+#
+# Cold-start budget: importing api.main (what every gunicorn/uvicorn worker
+# does before serving) must stay fast and must not pull in the OAuth/JWT/
+# password-hashing stacks, which are imported on first use (see
+# routes/auth.get_oauth and config/settings.get_oauth_providers).
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of api.main, in seconds. About 1s on a laptop; the
+# headroom absorbs slow CI machines, not new eager imports
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "2.5"))
+
+# Imported lazily by the first request that needs them. (bcrypt itself is not
+# listed: the MySQL driver loads it through cryptography's ssh key support)
+LAZY_MODULES = ("authlib", "httpx", "jose", "passlib")
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=APP_DIR, capture_output=True, text=True, timeout=120, check=True,
+    )
+
+
+def cumulative_import_seconds(importtime_output: str, module: str) -> float:
+    # Lines look like "import time:  self [us] | cumulative | module"
+    for line in importtime_output.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1]) / 1_000_000
+    raise AssertionError(f"{module} not found in -X importtime output")
+
+
+def test_import_main_within_budget():
+    # Best of three so one cold page cache doesn't fail the run
+    timings = [
+        cumulative_import_seconds(run_python("-X", "importtime", "-c", "import api.main").stderr, "api.main")
+        for _ in range(3)
+    ]
+    assert min(timings) < IMPORT_BUDGET_SECONDS, (
+        f"import api.main took {min(timings):.2f}s, budget is {IMPORT_BUDGET_SECONDS}s"
+    )
+
+
+@pytest.mark.parametrize("module", LAZY_MODULES)
+def test_import_main_defers_heavy_modules(module):
+    result = run_python(
+        "-c",
+        "import sys, api.main; "
+        f"print(any(name == {module!r} or name.startswith({module!r} + '.') for name in sys.modules))",
+    )
+    assert result.stdout.strip() == "False", f"import api.main imported {module} eagerly"
@@ -0,0 +1,110 @@
+# tests/test_oauth.py
+#
+# OAuth login against a fake provider: an httpx.MockTransport plugged in as
+# the shared outbound pool (api/outbound.py), so the token exchange and the
+# userinfo call go through the same code path as in production.
+
+import threading
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from api import outbound
+from api.config.settings import get_oauth_providers
+from api.main import app
+from api.routes import auth
+
+GOOGLE = get_oauth_providers()["google"]
+
+
+class FakeProvider:
+    """Answers the token and userinfo endpoints of the google provider."""
+
+    def __init__(self, user_info: dict):
+        self.user_info = user_info
+        self.requests = []
+        self.loop_threads = set()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.loop_threads.add(threading.get_ident())
+        url = str(request.url)
+        if url == GOOGLE["access_token_url"]:
+            assert request.method == "POST"
+            assert parse_qs(request.content.decode())["code"] == ["fake-code"]
+            return httpx.Response(200, json={"access_token": "fake-access", "token_type": "Bearer"})
+        if url == GOOGLE["userinfo_endpoint"]:
+            assert request.headers["authorization"] == "Bearer fake-access"
+            return httpx.Response(200, json=self.user_info)
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def provider(request):
+    fake = FakeProvider(request.param)
+    auth.reset_oauth()
+    outbound.reset_outbound_transport()
+    # get_oauth() hands this transport to every provider client it registers
+    outbound._transport = outbound.SharedAsyncTransport(httpx.MockTransport(fake))
+    yield fake
+    auth.reset_oauth()
+    outbound.reset_outbound_transport()
+
+
+@pytest.fixture
+def db_threads(monkeypatch):
+    threads = set()
+    create_user = auth.get_or_create_social_user
+
+    def recording(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return create_user(*args, **kwargs)
+
+    monkeypatch.setattr(auth, "get_or_create_social_user", recording)
+    return threads
+
+
+def oauth_login(client: TestClient) -> httpx.Response:
+    redirect = client.get("/auth/google", follow_redirects=False)
+    assert redirect.status_code == 302
+    state = parse_qs(urlparse(redirect.headers["location"]).query)["state"][0]
+    return client.get(
+        "/auth/google/callback", params={"code": "fake-code", "state": state}, follow_redirects=False
+    )
+
+
+@pytest.mark.parametrize(
+    "provider", [{"sub": "google-1", "email": "oauth@example.com", "given_name": "Oauth"}], indirect=True
+)
+def test_oauth_callback_logs_in_through_shared_pool(provider, db_threads):
+    with TestClient(app) as client:
+        for _ in range(2):
+            response = oauth_login(client)
+            assert response.status_code == 307
+            # Tokens travel in the fragment, never in the query string
+            location = urlparse(response.headers["location"])
+            assert not location.query
+            tokens = {key: values[0] for key, values in parse_qs(location.fragment).items()}
+            greeting = client.get(
+                "/some_protected_route", headers={"Authorization": f"Bearer {tokens['access_token']}"}
+            )
+            assert greeting.json() == {"message": "Hello, Oauth"}
+            # The refresh token belongs to a family like one from /token
+            refreshed = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+            assert refreshed.status_code == 200
+            assert refreshed.json()["refresh_token"] != tokens["refresh_token"]
+
+    # Two logins, each one token exchange and one userinfo call, all through
+    # the one shared transport (closing a client must not close it)
+    assert [request.method for request in provider.requests] == ["POST", "GET", "POST", "GET"]
+    # The database work ran in the threadpool, not on the event loop
+    assert db_threads and not db_threads & provider.loop_threads
+
+
+@pytest.mark.parametrize("provider", [{"email": "anonymous@example.com"}], indirect=True)
+def test_oauth_callback_rejects_userinfo_without_account_id(provider):
+    with TestClient(app) as client:
+        response = oauth_login(client)
+    assert response.status_code == 400
@@ -0,0 +1,158 @@
+# tests/test_replica.py
+#
+# Read-replica routing (api/database.py). The SQLite tests stand in a second
+# database for the replica; the primary is the suite's in-memory database.
+#
+# test_mariadb_replication runs against a real primary/replica pair and is
+# skipped unless both URLs are set. Two local instances, e.g.:
+#
+#   docker run -d --name rp -p 3307:3306 -e MARIADB_ROOT_PASSWORD=pw \
+#       -e MARIADB_DATABASE=streamseed mariadb:11 --server-id=1 --log-bin
+#   docker run -d --name rr -p 3308:3306 -e MARIADB_ROOT_PASSWORD=pw \
+#       -e MARIADB_DATABASE=streamseed mariadb:11 --server-id=2 --read-only
+#   docker exec rr mariadb -uroot -ppw -e "CHANGE MASTER TO
+#       MASTER_HOST='host.docker.internal', MASTER_PORT=3307, MASTER_USER='root',
+#       MASTER_PASSWORD='pw', MASTER_USE_GTID=slave_pos; START SLAVE"
+#
+#   REPLICA_TEST_PRIMARY_URL=mysql+pymysql://root:pw@127.0.0.1:3307/streamseed \
+#   REPLICA_TEST_REPLICA_URL=mysql+pymysql://root:pw@127.0.0.1:3308/streamseed \
+#       python -m pytest tests/test_replica.py
+#
+# (on Linux add --add-host=host.docker.internal:host-gateway to the replica)
+
+import os
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from api import database, models
+from api.main import app
+
+PRIMARY_URL = os.environ.get("REPLICA_TEST_PRIMARY_URL")
+REPLICA_URL = os.environ.get("REPLICA_TEST_REPLICA_URL")
+
+
+class FixedLagMonitor(database.ReplicaMonitor):
+    """A monitor whose replica reports the given lag (None: not replicating)."""
+
+    def __init__(self, replica_engine, lag, max_lag_seconds=5):
+        super().__init__(replica_engine, max_lag_seconds, check_interval=60)
+        self.lag = lag
+
+    def replication_lag(self, connection):
+        return self.lag
+
+
+def use_replica(monkeypatch, replica_engine, lag=0):
+    monitor = FixedLagMonitor(replica_engine, lag)
+    monkeypatch.setattr(database, "replica_monitor", monitor)
+    monkeypatch.setattr(
+        database, "ReplicaSessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    )
+    return monitor
+
+
+def headers_for(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def headers(client):
+    email = f"replica-{uuid.uuid4().hex}@example.com"
+    client.post("/register", json={"email": email, "password": "pw", "first_name": "R", "last_name": "R"})
+    token = client.post("/token", data={"username": email, "password": "pw"}).json()["access_token"]
+    client.post("/projects", json={"name": "On the primary", "description": "d"}, headers=headers_for(token))
+    return headers_for(token)
+
+
+@pytest.fixture
+def replica_engine():
+    engine = database.make_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_reads_go_to_the_replica_unless_the_client_just_wrote(client, headers, replica_engine, monkeypatch):
+    use_replica(monkeypatch, replica_engine)
+    # The replica has not seen the project yet
+    assert client.get("/projects", headers=headers).json() == []
+    marked = {**headers, database.LAST_WRITE_HEADER: f"{time.time():.3f}"}
+    assert [project["name"] for project in client.get("/projects", headers=marked).json()] == ["On the primary"]
+    stale = {**headers, database.LAST_WRITE_HEADER: f"{time.time() - 3600:.3f}"}
+    assert client.get("/projects", headers=stale).json() == []
+
+
+@pytest.mark.parametrize("lag", [None, 30])
+def test_lagging_or_stopped_replica_is_skipped(client, headers, replica_engine, monkeypatch, lag):
+    monitor = use_replica(monkeypatch, replica_engine, lag=lag)
+    assert len(client.get("/projects", headers=headers).json()) == 1
+    assert not monitor.healthy and monitor.lag_seconds == lag
+
+
+def test_unreachable_replica_falls_back_to_the_primary(client, headers, monkeypatch):
+    unreachable = database.make_engine("sqlite:////nonexistent-dir/replica.db")
+    monitor = use_replica(monkeypatch, unreachable)
+    monitor.check()  # Fails, but stamps the check time so requests don't re-check
+    monitor.healthy = True  # As if it was healthy at that check and went away since
+    response = client.get("/projects", headers=headers)
+    assert response.status_code == 200 and len(response.json()) == 1
+    assert not monitor.healthy
+
+
+def test_replica_failing_mid_request_asks_for_a_retry(client, headers, monkeypatch):
+    # Connects fine, but every query fails (no tables)
+    broken = database.make_engine("sqlite://")
+    monitor = use_replica(monkeypatch, broken)
+    response = client.get("/projects", headers=headers)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert not monitor.healthy
+    # The retry reads from the primary
+    assert len(client.get("/projects", headers=headers).json()) == 1
+
+
+def test_sqlite_replica_reports_no_replication():
+    engine = database.make_engine("sqlite://")
+    monitor = database.ReplicaMonitor(engine, max_lag_seconds=5, check_interval=60)
+    assert not monitor.is_usable()
+    assert monitor.lag_seconds is None
+
+
+@pytest.mark.skipif(not (PRIMARY_URL and REPLICA_URL), reason="needs REPLICA_TEST_PRIMARY_URL and REPLICA_TEST_REPLICA_URL")
+def test_mariadb_replication():
+    primary = database.make_engine(PRIMARY_URL)
+    replica = database.make_engine(REPLICA_URL)
+    monitor = database.ReplicaMonitor(replica, max_lag_seconds=5, check_interval=60)
+    assert monitor.is_usable(), f"replica not usable, lag {monitor.lag_seconds}"
+
+    marker = uuid.uuid4().hex
+    with primary.begin() as connection:
+        connection.execute(text("CREATE TABLE IF NOT EXISTS replica_probe (marker CHAR(32) PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO replica_probe VALUES (:marker)"), {"marker": marker})
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            with replica.connect() as connection:
+                seen = connection.execute(
+                    text("SELECT 1 FROM replica_probe WHERE marker = :marker"), {"marker": marker}
+                ).first()
+            if seen or time.monotonic() > deadline:
+                break
+            time.sleep(0.2)
+        assert seen, "row written on the primary never reached the replica"
+    finally:
+        with primary.begin() as connection:
+            connection.execute(text("DELETE FROM replica_probe WHERE marker = :marker"), {"marker": marker})
+        primary.dispose()
+        replica.dispose()
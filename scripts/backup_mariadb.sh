@@ -1,16 +1,20 @@
 #!/bin/bash
 
-# Define backup directory
-BACKUP_DIR="/home/ubuntu/backups/mariadb"
-TIMESTAMP=$(date +"%Y%m%d%H%M%S")
+# Online backup of the MariaDB database - the stack keeps running.
+#
+# Usage: backup_mariadb.sh [full|incremental]   (default: full)
+#
+# Runs api/backup.py inside the fastapi container: "full" takes a consistent
+# snapshot dump streamed by parallel workers and gzip-compressed, "incremental"
+# saves the binlog written since the previous backup. Suggested cron: a nightly
+# full backup plus hourly incrementals. Restore with
+#   docker compose exec fastapi python -m api.backup restore [name]
 
-# Create backup directory if not exists
-mkdir -p $BACKUP_DIR
+# Define variables
+COMPOSE_FILE="/home/ubuntu/streamseed/docker/docker-compose.yml"
+BACKUP_DIR="/home/ubuntu/streamseed/docker/backups"  # mounted at /backups in the container
+MODE=${1:-full}
 
-# Stop the MariaDB container
-docker compose -f /home/ubuntu/streamseed/docker/docker-compose.yml down
+docker compose -f $COMPOSE_FILE exec -T fastapi python -m api.backup $MODE || exit 1
 
-# Backup current data
-cp -r /home/ubuntu/streamseed/docker/mariadb_data $BACKUP_DIR/mariadb_data_backup_$TIMESTAMP
-
-echo "Backup completed at $BACKUP_DIR/mariadb_data_backup_$TIMESTAMP"
+echo "Backup completed in $BACKUP_DIR/$(docker compose -f $COMPOSE_FILE exec -T fastapi python -m api.backup latest)"
@@ -1,28 +1,41 @@
 #!/bin/bash
 
+# Copy the local database to the VPS without stopping either stack: take an
+# online backup of both sides, ship the local dump and restore it remotely in
+# parallel (see api/backup.py).
+
 # Define variables
-LOCAL_DATA_DIR="/home/sramsay/streamseed/docker/mariadb_data"
-REMOTE_DATA_DIR="/home/ubuntu/streamseed/docker/mariadb_data"
+LOCAL_COMPOSE_FILE="/home/sramsay/streamseed/docker/docker-compose.yml"
+LOCAL_BACKUP_DIR="/home/sramsay/streamseed/docker/backups"
 REMOTE_COMPOSE_FILE="/home/ubuntu/streamseed/docker/docker-compose.yml"
+REMOTE_SYNC_DIR="/home/ubuntu/streamseed/docker/backups/sync"  # /backups/sync in the container
 REMOTE_BACKUP_SCRIPT="/home/ubuntu/streamseed/scripts/backup_mariadb.sh"
 SSH_KEY="/home/sramsay/streamseed/StreamSeedKey.pem"
 REMOTE_USER="ubuntu"
 REMOTE_HOST="18.130.243.125"
 
-# Run the backup script on the AWS instance
-echo "Running backup script on the AWS instance..."
-ssh -i $SSH_KEY $REMOTE_USER@$REMOTE_HOST "bash $REMOTE_BACKUP_SCRIPT"
+set -e
 
-# Stop the MariaDB container on the VPS
-ssh -i $SSH_KEY $REMOTE_USER@$REMOTE_HOST "docker compose -f $REMOTE_COMPOSE_FILE down"
+# Safety backup of the live database on the AWS instance
+echo "Running backup script on the AWS instance..."
+ssh -i $SSH_KEY $REMOTE_USER@$REMOTE_HOST "bash $REMOTE_BACKUP_SCRIPT full"
 
-# Use rsync to sync the MariaDB data directory to the VPS
-rsync -avz -e "ssh -i $SSH_KEY" $LOCAL_DATA_DIR/ $REMOTE_USER@$REMOTE_HOST:$REMOTE_DATA_DIR
+# Online dump of the local database
+echo "Dumping the local database..."
+docker compose -f $LOCAL_COMPOSE_FILE exec -T fastapi python -m api.backup full
+BACKUP_NAME=$(docker compose -f $LOCAL_COMPOSE_FILE exec -T fastapi python -m api.backup latest | tr -d '\r')
 
-# Copy the docker-compose.yml file to the VPS
-scp -i $SSH_KEY /home/sramsay/streamseed/docker/docker-compose.yml $REMOTE_USER@$REMOTE_HOST:$REMOTE_COMPOSE_FILE
+# Ship it - kept apart from the VPS's own backups, whose binlog chain it is not part of
+ssh -i $SSH_KEY $REMOTE_USER@$REMOTE_HOST "mkdir -p $REMOTE_SYNC_DIR"
+rsync -av -e "ssh -i $SSH_KEY" $LOCAL_BACKUP_DIR/$BACKUP_NAME $REMOTE_USER@$REMOTE_HOST:$REMOTE_SYNC_DIR/
 
-# Start the MariaDB container on the VPS
+# Copy the docker-compose.yml file to the VPS and apply it (only changed services restart)
+scp -i $SSH_KEY $LOCAL_COMPOSE_FILE $REMOTE_USER@$REMOTE_HOST:$REMOTE_COMPOSE_FILE
 ssh -i $SSH_KEY $REMOTE_USER@$REMOTE_HOST "docker compose -f $REMOTE_COMPOSE_FILE up -d"
 
+# Restore into the running database on the VPS
+echo "Restoring $BACKUP_NAME on the VPS..."
+ssh -i $SSH_KEY $REMOTE_USER@$REMOTE_HOST \
+    "docker compose -f $REMOTE_COMPOSE_FILE exec -T fastapi python -m api.backup --backup-dir /backups/sync restore $BACKUP_NAME"
+
 echo "Sync completed successfully."